@@ -0,0 +1,107 @@
+# vectorized numpy evaluation of many positions at once, e.g. for analysis jobs and evaluation tuning
+import numpy as np
+from evaluation import (PST_MG, PST_EG, PHASE_WEIGHTS, MAX_PHASE, DOUBLED_PAWN, ISOLATED_PAWN, BACKWARD_PAWN,
+                        PASSED_PAWN_MG, PASSED_PAWN_EG, PAWN_SHIELD)
+
+_PST_MG = np.array(PST_MG, dtype=np.int64)  # [color, piece, square]
+_PST_EG = np.array(PST_EG, dtype=np.int64)
+_PHASE_WEIGHTS = np.array(PHASE_WEIGHTS, dtype=np.int64)
+_SQUARES = np.arange(64)
+_ROWS = np.arange(8).reshape(1, 8, 1)  # board row of the (N, 8 rows, 8 files) pawn masks, 0 = 8th rank
+# passed pawn (midgame, endgame) bonus by board row, white counts the ranks from row 7 and black from row 0
+_PASSED_WHITE = np.array([PASSED_PAWN_MG[::-1], PASSED_PAWN_EG[::-1]], dtype=np.int64).T
+_PASSED_BLACK = np.array([PASSED_PAWN_MG, PASSED_PAWN_EG], dtype=np.int64).T
+_SHIELD_CENTER = np.clip(np.arange(8), 1, 6)  # king file -> middle of the three shield files
+
+
+def _neighbour_files(values, fill, reduce, own_file=True):
+    # reduce of each file with its left and right neighbour file (and itself), fill outside the board
+    padded = np.pad(values, ((0, 0), (1, 1)), constant_values=fill)
+    neighbours = reduce(padded[:, :-2], padded[:, 2:])
+    return reduce(neighbours, padded[:, 1:-1]) if own_file else neighbours
+
+
+def _pawn_terms(pawns, enemy_pawns, kings, white):
+    # midgame and endgame pawn structure score of one color (N,), positive for the color
+    file_counts = pawns.sum(axis=1)
+    doubled = np.maximum(file_counts - 1, 0).sum(axis=1)
+    has_pawn = file_counts > 0
+    neighbours = np.pad(has_pawn, ((0, 0), (1, 1)))
+    supported_file = neighbours[:, :-2] | neighbours[:, 2:]
+    isolated = (file_counts * ~supported_file).sum(axis=1)
+    # enemy pawns guarding the square in front of a pawn sit two rows ahead on a neighbour file
+    enemy_files = np.pad(enemy_pawns, ((0, 0), (0, 0), (1, 1)))
+    enemy_neighbours = enemy_files[:, :, :-2] | enemy_files[:, :, 2:]
+    stop_guarded = np.zeros_like(pawns)
+    if white:
+        # passed if no black pawn on a smaller row (in front) of the same or a neighbour file
+        front = _neighbour_files(np.where(enemy_pawns, _ROWS, 8).min(axis=1), 8, np.minimum)
+        passed = pawns & (_ROWS <= front[:, None, :])
+        passed_bonus = _PASSED_WHITE
+        # backward if the last neighbour pawn is in front (smaller row)
+        last = _neighbour_files(np.where(pawns, _ROWS, -1).max(axis=1), -1, np.maximum, own_file=False)
+        behind = _ROWS > last[:, None, :]
+        stop_guarded[:, 2:, :] = enemy_neighbours[:, :-2, :]
+        home, king_rows = 6, kings >= 48
+    else:
+        front = _neighbour_files(np.where(enemy_pawns, _ROWS, -1).max(axis=1), -1, np.maximum)
+        passed = pawns & (_ROWS >= front[:, None, :])
+        passed_bonus = _PASSED_BLACK
+        last = _neighbour_files(np.where(pawns, _ROWS, 8).min(axis=1), 8, np.minimum, own_file=False)
+        behind = _ROWS < last[:, None, :]
+        stop_guarded[:, :-2, :] = enemy_neighbours[:, 2:, :]
+        home, king_rows = 1, kings < 16
+    backward = (pawns & behind & supported_file[:, None, :] & stop_guarded).sum(axis=(1, 2))
+    passed = passed.sum(axis=2) @ passed_bonus  # passed pawns per row -> (N, 2) midgame, endgame bonus
+    # pawn shield of the king on its first two ranks
+    file_shield = np.pad(PAWN_SHIELD[0]*pawns[:, home, :] + PAWN_SHIELD[1]*pawns[:, home - 1 if white else home + 1, :],
+                         ((0, 0), (1, 1)))
+    shield_files = file_shield[:, :-2] + file_shield[:, 1:-1] + file_shield[:, 2:]
+    shield = np.where(king_rows, shield_files[np.arange(len(kings)), _SHIELD_CENTER[kings % 8]], 0)
+    mg = (DOUBLED_PAWN[0]*doubled + ISOLATED_PAWN[0]*isolated + BACKWARD_PAWN[0]*backward + passed[:, 0] +
+          shield)
+    eg = DOUBLED_PAWN[1]*doubled + ISOLATED_PAWN[1]*isolated + BACKWARD_PAWN[1]*backward + passed[:, 1]
+    return mg, eg
+
+
+def evaluate_batch(pieces, colors, player_turn=None):
+    """Tapered material, piece-square and pawn structure scores of many positions, equal to
+        evaluation.evaluate_position per row. Every position needs both kings.
+
+    Args:
+        pieces (npt.ArrayLike): (N, 64) piece formations in the Model._pieces layout
+        colors (npt.ArrayLike): (N, 64) color formations in the Model._colors layout
+        player_turn (npt.ArrayLike, optional): (N,) color to move, scores are then from its view.
+            Defaults to None (white view).
+
+    Raises:
+        ValueError: pieces and colors are no matching (N, 64) arrays
+
+    Returns:
+        np.ndarray: (N,) int64 scores in centipawns
+    """
+    pieces = np.asarray(pieces)
+    colors = np.asarray(colors)
+    if pieces.ndim != 2 or pieces.shape[1] != 64 or pieces.shape != colors.shape:
+        raise ValueError(f"expected two (N, 64) arrays, got {pieces.shape} and {colors.shape}")
+    occupied = pieces > 0
+    # empty squares index piece 0, whose table rows are zero
+    piece_idx = np.where(occupied, pieces, 0)
+    color_idx = np.where(occupied, colors, 0)
+    mg = _PST_MG[color_idx, piece_idx, _SQUARES].sum(axis=1)
+    eg = _PST_EG[color_idx, piece_idx, _SQUARES].sum(axis=1)
+
+    pawns = (pieces == 1).reshape(-1, 8, 8)
+    white_pawns = pawns & (colors == 0).reshape(-1, 8, 8)
+    black_pawns = pawns & (colors == 1).reshape(-1, 8, 8)
+    kings = pieces == 6
+    white_mg, white_eg = _pawn_terms(white_pawns, black_pawns, (kings & (colors == 0)).argmax(axis=1), True)
+    black_mg, black_eg = _pawn_terms(black_pawns, white_pawns, (kings & (colors == 1)).argmax(axis=1), False)
+    mg += white_mg - black_mg
+    eg += white_eg - black_eg
+
+    phase = np.minimum(_PHASE_WEIGHTS[piece_idx].sum(axis=1), MAX_PHASE)
+    scores = (mg*phase + eg*(MAX_PHASE - phase)) // MAX_PHASE
+    if player_turn is not None:
+        scores = np.where(np.asarray(player_turn) == 1, -scores, scores)
+    return scores
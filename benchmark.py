@@ -0,0 +1,588 @@
+# performance benchmarks of the engine, run e.g.: python benchmark.py move_gen
+import os
+import sys
+import time
+from misc import *
+from model import Model
+from testcases import perft_testcases
+
+
+def perft_nodes(model: Model, depth: int):
+    """Plain perft node count of the position in model (no Stockfish comparison)."""
+    if depth == 0:
+        return 1
+    nodes = 0
+    legal_moves = model.generate_legal_moves()
+    for orig, all_dest in list(legal_moves.items()):
+        if model.player_turn != model._colors[orig]:
+            continue
+        for dest in all_dest:
+            model.move_piece(orig, dest, silent=True)
+            nodes += perft_nodes(model, depth - 1)
+            model.unmove_piece()
+    return nodes
+
+
+def perft_nodes_packed(model: Model, depth: int, ply=0):
+    """Perft node count iterating the packed move lists of Model.generate_move_list."""
+    if depth == 0:
+        return 1
+    nodes = 0
+    move_list, nr_moves = model.generate_move_list(ply)
+    for i in range(nr_moves):
+        if not model.try_move_piece(move_list[i]):
+            continue
+        nodes += perft_nodes_packed(model, depth - 1, ply + 1)
+        model.unmove_piece()
+    return nodes
+
+
+def perft_nodes_copy_make(model: Model, depth: int, ply=0):
+    """Perft node count like perft_nodes_packed, moves are taken back by restoring a snapshot (copy-make)."""
+    if depth == 0:
+        return 1
+    nodes = 0
+    state = model.snapshot()
+    move_list, nr_moves = model.generate_move_list(ply)
+    for i in range(nr_moves):
+        if not model.try_move_piece(move_list[i]):
+            continue
+        nodes += perft_nodes_copy_make(model, depth - 1, ply + 1)
+        model.restore(state)
+    return nodes
+
+
+def run_perft_suite(max_nodes=100000, perft_func=perft_nodes, **model_kwargs):
+    """Run all perft test cases up to max_nodes expected nodes, all of them for max_nodes None.
+
+    Returns:
+        Tuple[int, float]: total nodes searched, total time in seconds
+    """
+    total_nodes, total_time = 0, 0.0
+    for test_idx, test in enumerate(perft_testcases):
+        if max_nodes is not None and test["nodes"] > max_nodes:
+            continue
+        model = Model(None, sounds=False, fen_init=test["fen"], **model_kwargs)
+        start = time.perf_counter()
+        nodes = perft_func(model, test["depth"])
+        total_time += time.perf_counter() - start
+        total_nodes += nodes
+        if nodes != test["nodes"]:
+            print(f"\t{bcolors.WARNING}TC {test_idx}: {nodes}/{test['nodes']}{bcolors.ENDC}")
+    return total_nodes, total_time
+
+
+def generation_fens():
+    """FEN strings of the perft positions and all positions one legal move away from them."""
+    fens = []
+    for test in perft_testcases:
+        model = Model(None, sounds=False, fen_init=test["fen"])
+        fens.append(model.get_fen_string())
+        move_list, nr_moves = model.generate_move_list(0)
+        for move in list(move_list[:nr_moves]):
+            model.make_move(move, silent=True)
+            fens.append(model.get_fen_string())
+            model.unmove_piece()
+    return fens
+
+
+def time_generation(fens, calls=20, **model_kwargs):
+    """Packed moves generated per second by generate_move_list on the positions of fens, without making moves.
+
+    Returns:
+        Tuple[int, float]: total moves generated, total time in seconds
+    """
+    total_moves = 0
+    total_seconds = 0.0
+    for fen in fens:
+        model = Model(None, sounds=False, fen_init=fen, **model_kwargs)
+        start = time.perf_counter()
+        for _ in range(calls):
+            nr_moves = model.generate_move_list(0)[1]
+        total_seconds += time.perf_counter() - start
+        total_moves += nr_moves * calls
+    return total_moves, total_seconds
+
+
+def bench_move_gen(max_nodes=100000, repeat=3):
+    """Compare the mailbox and bitboard move generators: nodes per second on the perft suite through the legal
+        moves dict and the packed move lists, and generated moves per second of generate_move_list alone (perft
+        also times make/unmake, which both generators share). Both generators run alternately, best of repeat
+        runs."""
+    results = {}
+    for perft_func in [perft_nodes, perft_nodes_packed]:
+        path = "move list" if perft_func == perft_nodes_packed else "dict"
+        for _ in range(repeat):
+            for move_gen in ["mailbox", "bitboard"]:
+                nodes, seconds = run_perft_suite(max_nodes, perft_func, move_gen=move_gen)
+                name = f"{move_gen} {path}"
+                results[name] = max(results.get(name, 0), nodes / seconds)
+        for move_gen in ["mailbox", "bitboard"]:
+            print(f"{f'{move_gen} {path}':>20}: {nodes} nodes -> {results[f'{move_gen} {path}']:.0f} nodes/s "
+                  f"(best of {repeat})")
+        print(f"{'speedup':>20}: {results[f'bitboard {path}'] / results[f'mailbox {path}']:.2f}x")
+    fens = generation_fens()
+    for _ in range(repeat):
+        for move_gen in ["mailbox", "bitboard"]:
+            moves, seconds = time_generation(fens, move_gen=move_gen)
+            name = f"{move_gen} generation"
+            results[name] = max(results.get(name, 0), moves / seconds)
+    for move_gen in ["mailbox", "bitboard"]:
+        print(f"{f'{move_gen} generation':>20}: {len(fens)} positions -> {results[f'{move_gen} generation']:.0f} "
+              f"moves/s (best of {repeat})")
+    print(f"{'speedup':>20}: {results['bitboard generation'] / results['mailbox generation']:.2f}x")
+    return results
+
+
+def bench_move_list(max_nodes=100000):
+    """Compare the legal moves dict with packed 16 bit move lists for both move generators."""
+    results = {}
+    for move_gen in ["mailbox", "bitboard"]:
+        for perft_func in [perft_nodes, perft_nodes_packed]:
+            nodes, seconds = run_perft_suite(max_nodes, perft_func, move_gen=move_gen)
+            name = f"{move_gen} {'move list' if perft_func == perft_nodes_packed else 'dict'}"
+            results[name] = nodes / seconds
+            print(f"{name:>20}: {nodes} nodes in {seconds:.2f}s -> {results[name]:.0f} nodes/s")
+    return results
+
+
+def bench_side_to_move(max_nodes=100000):
+    """Compare move lists with opponent mobility against side to move only generation for both move generators."""
+    results = {}
+    for move_gen in ["mailbox", "bitboard"]:
+        for mobility in [True, False]:
+            nodes, seconds = run_perft_suite(max_nodes, perft_nodes_packed, move_gen=move_gen, eval_mobility=mobility)
+            name = f"{move_gen} {'both colors' if mobility else 'side to move'}"
+            results[name] = nodes / seconds
+            print(f"{name:>22}: {nodes} nodes in {seconds:.2f}s -> {results[name]:.0f} nodes/s")
+    return results
+
+
+def bench_pseudo_legal(max_nodes=100000, depth=3):
+    """Compare legal against pseudo legal move lists on the perft suite and in an alpha-beta search,
+        where the cutoffs skip the legality check of most generated moves."""
+    from search import TreeSearch
+    results = {}
+    for move_gen in ["mailbox", "bitboard"]:
+        for pseudo_legal in [False, True]:
+            name = f"{move_gen} {'pseudo legal' if pseudo_legal else 'legal'}"
+            nodes, seconds = run_perft_suite(max_nodes, perft_nodes_packed, move_gen=move_gen,
+                                             eval_mobility=False, pseudo_legal=pseudo_legal)
+            start = time.perf_counter()
+            for fen in [fen_string["start"]] + [test["fen"] for test in perft_testcases[11:13]]:
+                model = Model(None, sounds=False, fen_init=fen, move_gen=move_gen)
+                TreeSearch(model, depth, mobility=False, pseudo_legal=pseudo_legal).search()
+            search_seconds = time.perf_counter() - start
+            results[name] = (nodes / seconds, search_seconds)
+            print(f"{name:>22}: perft {nodes / seconds:.0f} nodes/s, search depth {depth} in {search_seconds:.2f}s")
+    return results
+
+
+def bench_staged_moves(depth=3):
+    """Compare alpha-beta search over the plain move list with staged moves (captures and promotions first)."""
+    from search import TreeSearch
+    results = {}
+    fens = [fen_string["start"]] + [test["fen"] for test in perft_testcases[11:13]]
+    for move_gen in ["mailbox", "bitboard"]:
+        for pseudo_legal in [False, True]:
+            for staged in [False, True]:
+                name = f"{move_gen} {'pseudo legal' if pseudo_legal else 'legal'} {'staged' if staged else 'plain'}"
+                start = time.perf_counter()
+                for fen in fens:
+                    model = Model(None, sounds=False, fen_init=fen, move_gen=move_gen)
+                    TreeSearch(model, depth, mobility=False, pseudo_legal=pseudo_legal, staged=staged).search()
+                results[name] = time.perf_counter() - start
+                print(f"{name:>30}: search depth {depth} in {results[name]:.2f}s")
+    return results
+
+
+def bench_endgames(max_nodes=200000, max_pieces=6):
+    """Nodes per second of the deep perfts of the sparse endgame positions (piece lists instead of board scans)."""
+    results = {}
+    tests = [test for test in perft_testcases if test["nodes"] <= max_nodes and
+             sum(char.isalpha() for char in test["fen"].split(" ")[0]) <= max_pieces]
+    for move_gen in ["mailbox", "bitboard"]:
+        for pseudo_legal in [False, True]:
+            total_nodes, total_time = 0, 0.0
+            for test in tests:
+                model = Model(None, sounds=False, fen_init=test["fen"], move_gen=move_gen,
+                              eval_mobility=False, pseudo_legal=pseudo_legal)
+                start = time.perf_counter()
+                total_nodes += perft_nodes_packed(model, test["depth"])
+                total_time += time.perf_counter() - start
+            name = f"{move_gen} {'pseudo legal' if pseudo_legal else 'legal'}"
+            results[name] = total_nodes / total_time
+            print(f"{name:>22}: {total_nodes} nodes in {total_time:.2f}s -> {results[name]:.0f} nodes/s")
+    return results
+
+
+def bench_board_storage(max_nodes=100000):
+    """Compare numpy board arrays with signed byte arrays (array('b')) on the perft cases up to max_nodes expected
+        nodes, by default the 16 cases of 100000 nodes or less (274341 nodes), max_nodes=None runs the full suite."""
+    results = {}
+    for move_gen in ["mailbox", "bitboard"]:
+        for board_storage in ["numpy", "array"]:
+            nodes, seconds = run_perft_suite(max_nodes, perft_nodes_packed, move_gen=move_gen,
+                                             board_storage=board_storage)
+            name = f"{move_gen} {board_storage}"
+            results[name] = nodes / seconds
+            print(f"{name:>16}: {nodes} nodes in {seconds:.2f}s -> {results[name]:.0f} nodes/s")
+        print(f"{'speedup':>16}: {results[f'{move_gen} array'] / results[f'{move_gen} numpy']:.2f}x")
+    return results
+
+
+def bench_copy_make(max_nodes=100000, depth=3):
+    """Compare make/unmake with copy-make (snapshot and restore) on the perft suite and in an alpha-beta search."""
+    from search import TreeSearch
+    results = {}
+    fens = [fen_string["start"]] + [test["fen"] for test in perft_testcases[11:13]]
+    for move_gen in ["mailbox", "bitboard"]:
+        for copy_make in [False, True]:
+            name = f"{move_gen} {'copy-make' if copy_make else 'unmake'}"
+            nodes, seconds = run_perft_suite(max_nodes, perft_nodes_copy_make if copy_make else perft_nodes_packed,
+                                             move_gen=move_gen, eval_mobility=False)
+            start = time.perf_counter()
+            for fen in fens:
+                model = Model(None, sounds=False, fen_init=fen, move_gen=move_gen)
+                TreeSearch(model, depth, mobility=False, copy_make=copy_make).search()
+            search_seconds = time.perf_counter() - start
+            results[name] = (nodes / seconds, search_seconds)
+            print(f"{name:>18}: perft {nodes / seconds:.0f} nodes/s, search depth {depth} in {search_seconds:.2f}s")
+    return results
+
+
+def bench_epd(nr_positions=100000):
+    """Positions per second of the streaming EPD reader, the EPD writer and of FEN loading into a Model."""
+    import tempfile
+    from epd import read_epd, write_epd
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # perft suite as EPD with D<depth> node counts, repeated to nr_positions lines
+        path = os.path.join(tmp_dir, "perft.epd")
+        with open(path, "w") as file:
+            for i in range(nr_positions):
+                test = perft_testcases[i % len(perft_testcases)]
+                file.write(f"{test['fen']} ;D{test['depth']} {test['nodes']}\n")
+
+        start = time.perf_counter()
+        records = list(read_epd(path))
+        results["read"] = len(records) / (time.perf_counter() - start)
+        start = time.perf_counter()
+        write_epd(os.path.join(tmp_dir, "out.epd"), records)
+        results["write"] = len(records) / (time.perf_counter() - start)
+
+    fens = [test["fen"] for test in perft_testcases] * max(1, nr_positions // (10*len(perft_testcases)))
+    model = Model(None, sounds=False)
+    start = time.perf_counter()
+    for fen in fens:
+        model.set_fen_string(fen)
+        model.get_fen_string()
+    results["model fen roundtrip"] = len(fens) / (time.perf_counter() - start)
+    for name, rate in results.items():
+        print(f"{name:>20}: {rate:.0f} positions/s")
+    return results
+
+
+def bench_pgn(path="mat/games/sample.pgn", repeat=10):
+    """Games per second of reading and replaying (SAN to move resolution) the bundled sample PGN file."""
+    from pgn import read_pgn, replay_game
+    results = {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        games = list(read_pgn(path))
+    read_seconds = time.perf_counter() - start
+    print(f"{'read':>22}: {repeat*len(games) / read_seconds:.0f} games/s")
+    for move_gen in ["mailbox", "bitboard"]:
+        for pseudo_legal in [False, True]:
+            model = Model(None, sounds=False, move_gen=move_gen, eval_mobility=False, pseudo_legal=pseudo_legal)
+            plies = 0
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for game in games:
+                    for _ in replay_game(game, model):
+                        plies += 1
+            seconds = time.perf_counter() - start
+            name = f"{move_gen} {'pseudo legal' if pseudo_legal else 'legal'}"
+            results[name] = repeat*len(games) / seconds
+            print(f"{name:>22}: {results[name]:.1f} games/s, {plies / seconds:.0f} plies/s")
+    return results
+
+
+def bench_startup(repeat=5):
+    """Startup time of a fresh interpreter for "import model" and the construction of a headless Model(None)."""
+    import subprocess
+    script = ("import sys, time; start = time.perf_counter(); import model; imported = time.perf_counter(); "
+              "model.Model(None, sounds=False); constructed = time.perf_counter(); "
+              "print(imported - start, constructed - imported, 'pygame' in sys.modules, 'numpy' in sys.modules)")
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.splitlines()[-1].split()
+        runs.append((float(output[0]), float(output[1])))
+    results = {"import model": min(run[0] for run in runs), "Model(None)": min(run[1] for run in runs)}
+    for name, seconds in results.items():
+        print(f"{name:>14}: {seconds*1000:.1f} ms (best of {repeat})")
+    print(f"{'pygame loaded':>14}: {output[2]}, numpy loaded: {output[3]}")
+    return results
+
+
+def bench_evaluation(depth=3, nr_evals=100000):
+    """Compare the shannon evaluation (material + mobility of both colors) with the incremental
+        material + piece-square evaluation: leaf evaluations per second and alpha-beta search time."""
+    from search import TreeSearch
+    results = {}
+    fens = [fen_string["start"]] + [test["fen"] for test in perft_testcases[11:13]]
+    for move_gen in ["mailbox", "bitboard"]:
+        for evaluation, mobility in [("shannon", True), ("shannon", False), ("pst", False)]:
+            name = f"{move_gen} {evaluation}{' + mobility' if mobility else ''}"
+            model = Model(None, sounds=False, fen_init=fens[1], move_gen=move_gen, evaluation=evaluation,
+                          eval_mobility=mobility)
+            start = time.perf_counter()
+            for _ in range(nr_evals):
+                model.evaluate()
+            eval_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            for fen in fens:
+                model = Model(None, sounds=False, fen_init=fen, move_gen=move_gen, evaluation=evaluation,
+                              eval_mobility=mobility)
+                TreeSearch(model, depth).search()
+            search_seconds = time.perf_counter() - start
+            results[name] = (nr_evals / eval_seconds, search_seconds)
+            print(f"{name:>28}: {nr_evals / eval_seconds:.0f} evals/s, search depth {depth} in {search_seconds:.2f}s")
+    return results
+
+
+def bench_batch_evaluation(nr_positions=20000, plies=40):
+    """Positions per second of the vectorized numpy batch evaluator against a loop over the scalar evaluator."""
+    import random
+    import numpy as np
+    from evaluation import evaluate_position
+    from batch_evaluation import evaluate_batch
+    rng = random.Random(0)
+    pieces, colors = [], []
+    for test in perft_testcases:
+        # random games from the test positions, tiled up to nr_positions
+        model = Model(None, sounds=False, fen_init=test["fen"])
+        for ply in range(plies):
+            move_list, nr_moves = model.generate_move_list(ply)
+            moves = list(move_list[:nr_moves])
+            rng.shuffle(moves)
+            if not any(model.try_move_piece(move) for move in moves):
+                break
+            pieces.append(list(model._pieces))
+            colors.append(list(model._colors))
+    repeats = -(-nr_positions // len(pieces))
+    pieces = np.array(pieces*repeats, dtype=np.int8)[:nr_positions]
+    colors = np.array(colors*repeats, dtype=np.int8)[:nr_positions]
+
+    start = time.perf_counter()
+    scalar_scores = [evaluate_position(board_pieces, board_colors) for board_pieces, board_colors in
+                     zip(pieces.tolist(), colors.tolist())]
+    scalar_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    batch_scores = evaluate_batch(pieces, colors)
+    batch_seconds = time.perf_counter() - start
+    assert batch_scores.tolist() == scalar_scores, "batch and scalar evaluation differ"
+    results = {"scalar": nr_positions / scalar_seconds, "batch": nr_positions / batch_seconds}
+    for name, positions_per_second in results.items():
+        print(f"{name:>8}: {positions_per_second:.0f} positions/s")
+    print(f"{'speedup':>8}: {results['batch'] / results['scalar']:.1f}x")
+    return results
+
+
+def bench_pawn_hash(depth=3):
+    """Alpha-beta search with the pawn structure evaluation computed at every leaf against the pawn hash table
+        with different sizes and replacement policies."""
+    from search import TreeSearch
+    results = {}
+    fens = [fen_string["start"]] + [test["fen"] for test in perft_testcases[11:13]]
+    for entries, policy in [(0, "always"), (2**8, "always"), (2**8, "two_way"), (2**14, "always"), (2**14, "two_way")]:
+        name = f"{entries} entries {policy}" if entries else "no pawn hash"
+        probes = hits = 0
+        start = time.perf_counter()
+        for fen in fens:
+            model = Model(None, sounds=False, fen_init=fen, pawn_hash_entries=entries, pawn_hash_policy=policy)
+            TreeSearch(model, depth).search()
+            if model.pawn_hash is not None:
+                probes += model.pawn_hash.probes
+                hits += model.pawn_hash.hits
+        results[name] = (time.perf_counter() - start, hits / probes if probes else 0.0)
+        print(f"{name:>22}: search depth {depth} in {results[name][0]:.2f}s, hit rate {results[name][1]:.1%}")
+    return results
+
+
+def bench_transposition(depth=4, tt_size_mb=16):
+    """Alpha-beta search without and with the transposition table, a second search of the same position
+        shows what survives between searches (e.g. Controller turns)."""
+    from search import TreeSearch
+    results = {}
+    fens = [fen_string["start"]] + [test["fen"] for test in perft_testcases[11:13]]
+    for size in [0, tt_size_mb]:
+        name = f"tt {size} MB" if size else "no tt"
+        first = second = 0.0
+        probes = hits = collisions = overwrites = 0
+        for fen in fens:
+            model = Model(None, sounds=False, fen_init=fen)
+            tree_search = TreeSearch(model, depth, tt_size_mb=size)
+            start = time.perf_counter()
+            tree_search.search()
+            first += time.perf_counter() - start
+            start = time.perf_counter()
+            tree_search.search()
+            second += time.perf_counter() - start
+            if tree_search.tt is not None:
+                probes += tree_search.tt.probes
+                hits += tree_search.tt.hits
+                collisions += tree_search.tt.collisions
+                overwrites += tree_search.tt.overwrites
+        results[name] = (first, second)
+        print(f"{name:>10}: search depth {depth} in {first:.2f}s, repeated search in {second:.2f}s")
+        if probes:
+            print(f"{'':>10}  hit rate {hits / probes:.1%}, collisions {collisions}, overwrites {overwrites}")
+    return results
+
+
+# position set of the search benchmarks: start position and the middle game perft test positions
+SEARCH_FENS = [fen_string["start"]] + [test["fen"] for test in perft_testcases[8:14]]
+
+
+def timed_searches(fens=SEARCH_FENS, limits=None, warm_up=False, **search_kwargs):
+    """Search each position with a new Model and TreeSearch, the search is closed after the caller read its results.
+
+    Args:
+        fens (List[str], optional): FEN strings of the positions. Defaults to SEARCH_FENS.
+        limits (dict, optional): TreeSearch.search arguments, e.g. {"movetime": 100}. Defaults to None.
+        warm_up (bool, optional): untimed depth 1 search before, e.g. to start the worker processes.
+            Defaults to False.
+        **search_kwargs: TreeSearch arguments, e.g. depth=4, tt_size_mb=0
+
+    Yields:
+        Tuple[TreeSearch, float]: finished search, seconds of the timed search
+    """
+    from search import TreeSearch
+    for fen in fens:
+        tree_search = TreeSearch(Model(None, sounds=False, fen_init=fen), **search_kwargs)
+        if warm_up:
+            tree_search.search(depth=1)
+        start = time.perf_counter()
+        tree_search.search(**(limits or {}))
+        seconds = time.perf_counter() - start
+        yield tree_search, seconds
+        tree_search.close()
+
+
+def bench_iterative_deepening(movetimes=(100, 500, 1000)):
+    """Latency per move of the iterative deepening search under a movetime limit, against the fixed depth search."""
+    results = {}
+    for limit in [{"depth": 3}] + [{"movetime": movetime} for movetime in movetimes]:
+        name = " ".join(f"{key} {value}" for key, value in limit.items())
+        latencies, depths = [], []
+        for tree_search, seconds in timed_searches(limits=limit):
+            latencies.append(seconds)
+            depths.append(tree_search.completed_depth)
+        results[name] = (min(latencies), max(latencies))
+        print(f"{name:>14}: {min(latencies)*1000:.0f}..{max(latencies)*1000:.0f} ms per move, "
+              f"depth {min(depths)}..{max(depths)}")
+    return results
+
+
+def bench_move_ordering(depth=4):
+    """Nodes of the alpha-beta search on a fixed position set without move ordering (board scan order and
+        captures first) and with MVV-LVA captures, killer moves and history ordered quiet moves.
+        All rows search without transposition table, so its hash moves do not order the baseline."""
+    results = {}
+    for name, staged, ordering in [("board scan order", False, False), ("captures first", True, False),
+                                   ("mvv-lva killers history", True, True)]:
+        total_nodes, total_seconds = 0, 0.0
+        for tree_search, seconds in timed_searches(depth=depth, staged=staged, ordering=ordering, tt_size_mb=0):
+            total_nodes += tree_search.nodes
+            total_seconds += seconds
+        # effective branching factor of the average search
+        results[name] = (total_nodes, (total_nodes / len(SEARCH_FENS))**(1 / depth), total_seconds)
+        print(f"{name:>24}: {total_nodes} nodes, effective branching factor {results[name][1]:.2f}, "
+              f"{total_seconds:.2f}s")
+    return results
+
+
+def bench_quiescence(reference_depth=4):
+    """Nodes, time and best move agreement with a deeper reference search (with quiescence), for searches
+        without quiescence search and shallower ones with it."""
+    results = {}
+    reference = [tree_search.best_move for tree_search, _ in timed_searches(depth=reference_depth)]
+    for depth, quiescence in [(2, False), (3, False), (4, False), (2, True), (3, True)]:
+        name = f"depth {depth} {'quiescence' if quiescence else 'static eval'}"
+        total_nodes, total_seconds, agree = 0, 0.0, 0
+        for (tree_search, seconds), reference_move in zip(timed_searches(depth=depth, quiescence=quiescence),
+                                                          reference):
+            total_nodes += tree_search.nodes
+            total_seconds += seconds
+            agree += tree_search.best_move == reference_move
+        results[name] = (total_nodes, total_seconds, agree)
+        print(f"{name:>24}: {total_nodes} nodes in {total_seconds:.2f}s, "
+              f"{agree}/{len(SEARCH_FENS)} best moves as depth {reference_depth} with quiescence")
+    return results
+
+
+def bench_selectivity(depth=5):
+    """Nodes and time of fixed depth searches with each selectivity feature of the search switched off alone,
+        against all on and all off, with the best move agreement to all on."""
+    features = ["null_move", "lmr", "check_extension", "aspiration"]
+    configs = [("all on", {}), ("all off", {feature: False for feature in features})]
+    configs += [(f"no {feature}", {feature: False}) for feature in features]
+    results, reference = {}, []
+    for name, switches in configs:
+        total_nodes, total_seconds, agree = 0, 0.0, 0
+        for i, (tree_search, seconds) in enumerate(timed_searches(depth=depth, **switches)):
+            total_nodes += tree_search.nodes
+            total_seconds += seconds
+            if len(reference) <= i:
+                reference.append(tree_search.best_move)
+            agree += tree_search.best_move == reference[i]
+        results[name] = (total_nodes, total_seconds, agree)
+        print(f"{name:>18}: {total_nodes} nodes in {total_seconds:.2f}s, "
+              f"{agree}/{len(SEARCH_FENS)} best moves as all on")
+    return results
+
+
+def bench_parallel(depth=5):
+    """Speedup and nodes per second of the root splitting parallel search at 1, 2, 4, 8 and all cores worth of
+        worker processes, fixed depth searches after a warm up search that starts the pool."""
+    results = {}
+    for workers in sorted({1, 2, 4, 8, os.cpu_count() or 1}):
+        total_nodes, total_seconds = 0, 0.0
+        for tree_search, seconds in timed_searches(SEARCH_FENS[:5], warm_up=True, depth=depth, workers=workers):
+            total_nodes += tree_search.nodes
+            total_seconds += seconds
+        results[workers] = (total_nodes, total_seconds)
+        print(f"{workers:>3} workers: {total_nodes} nodes in {total_seconds:.2f}s, "
+              f"speedup {results[1][1] / total_seconds:.2f}, {total_nodes / total_seconds:.0f} nodes/s")
+    return results
+
+
+BENCHMARKS = {
+    "move_gen": bench_move_gen,
+    "move_list": bench_move_list,
+    "side_to_move": bench_side_to_move,
+    "pseudo_legal": bench_pseudo_legal,
+    "staged_moves": bench_staged_moves,
+    "endgames": bench_endgames,
+    "board_storage": bench_board_storage,
+    "copy_make": bench_copy_make,
+    "epd": bench_epd,
+    "pgn": bench_pgn,
+    "startup": bench_startup,
+    "evaluation": bench_evaluation,
+    "batch_evaluation": bench_batch_evaluation,
+    "pawn_hash": bench_pawn_hash,
+    "transposition": bench_transposition,
+    "iterative_deepening": bench_iterative_deepening,
+    "move_ordering": bench_move_ordering,
+    "quiescence": bench_quiescence,
+    "selectivity": bench_selectivity,
+    "parallel": bench_parallel,
+}
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        print(f"\n### {name} ###")
+        BENCHMARKS[name]()
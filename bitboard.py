@@ -0,0 +1,569 @@
+from misc import *
+from moves import MoveGen
+from collections import defaultdict
+
+# Bit i of a bitboard corresponds to board index i of Model._pieces (0: a8, 63: h1)
+BOARD_MASK = (1 << 64) - 1
+
+# (row, col) steps, rows grow towards white (rank 1)
+KNIGHT_STEPS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_STEPS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+PAWN_CAPTURE_STEPS = [[(-1, -1), (-1, 1)], [(1, -1), (1, 1)]]  # w, b
+
+# ray directions: N, S, W, E, NW, NE, SW, SE
+RAY_STEPS = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+ORTHOGONAL_DIRS = (0, 1, 2, 3)
+DIAGONAL_DIRS = (4, 5, 6, 7)
+# rays running towards higher board indices find their closest blocker in the lowest bit
+RAY_POSITIVE = [dr*8 + dc > 0 for dr, dc in RAY_STEPS]
+
+
+def _on_board(row, col):
+    return 0 <= row < 8 and 0 <= col < 8
+
+
+def _step_table(steps):
+    table = []
+    for sq in range(64):
+        row, col = continous2grid(sq)
+        mask = 0
+        for dr, dc in steps:
+            if _on_board(row+dr, col+dc):
+                mask |= 1 << grid2continous(row+dr, col+dc)
+        table.append(mask)
+    return table
+
+
+def _ray_table(step):
+    table = []
+    for sq in range(64):
+        row, col = continous2grid(sq)
+        mask = 0
+        row, col = row+step[0], col+step[1]
+        while _on_board(row, col):
+            mask |= 1 << grid2continous(row, col)
+            row, col = row+step[0], col+step[1]
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _step_table(KNIGHT_STEPS)
+KING_ATTACKS = _step_table(KING_STEPS)
+PAWN_ATTACKS = [_step_table(PAWN_CAPTURE_STEPS[0]), _step_table(PAWN_CAPTURE_STEPS[1])]
+RAYS = [_ray_table(step) for step in RAY_STEPS]
+
+
+def _between_table():
+    # squares strictly between two aligned squares, 0 if not on a common ray
+    table = [[0]*64 for _ in range(64)]
+    for d in range(8):
+        for orig in range(64):
+            ray = RAYS[d][orig]
+            for dest in iter_bits(ray):
+                table[orig][dest] = ray & ~RAYS[d][dest] & ~(1 << dest)
+    return table
+
+
+def iter_bits(bb):
+    """Yield board indices of all set bits from low to high."""
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def lsb(bb):
+    return (bb & -bb).bit_length() - 1
+
+
+def popcount(bb):
+    return bin(bb).count("1")
+
+
+BETWEEN = _between_table()
+FILES = [sum(1 << (row*8 + col) for row in range(8)) for col in range(8)]  # a..h
+RANKS = [sum(1 << (row*8 + col) for col in range(8)) for row in range(8)]  # rows of the board, 0 is rank 8
+# squares a rook or bishop on an empty board reaches, sliders outside can not attack the square
+ROOK_REACH = [RAYS[0][sq] | RAYS[1][sq] | RAYS[2][sq] | RAYS[3][sq] for sq in range(64)]
+BISHOP_REACH = [RAYS[4][sq] | RAYS[5][sq] | RAYS[6][sq] | RAYS[7][sq] for sq in range(64)]
+
+
+def ray_attacks(sq, occupied, direction):
+    """Squares reached by a slider from sq in one direction up to and including the first blocker."""
+    ray = RAYS[direction][sq]
+    blockers = ray & occupied
+    if blockers:
+        if RAY_POSITIVE[direction]:
+            blocker = (blockers & -blockers).bit_length() - 1
+        else:
+            blocker = blockers.bit_length() - 1
+        ray ^= RAYS[direction][blocker]
+    return ray
+
+
+# per square the non empty rays of the rook and bishop directions: (ray, runs to higher indices, rays of the direction)
+_ROOK_RAYS = [tuple((RAYS[d][sq], RAY_POSITIVE[d], RAYS[d]) for d in ORTHOGONAL_DIRS if RAYS[d][sq]) for sq in range(64)]
+_BISHOP_RAYS = [tuple((RAYS[d][sq], RAY_POSITIVE[d], RAYS[d]) for d in DIAGONAL_DIRS if RAYS[d][sq]) for sq in range(64)]
+
+
+def _slider_attacks(rays, occupied):
+    # ray_attacks of all rays of a square, inlined as it runs for every slider of every generated position
+    attacks = 0
+    for ray, positive, direction_rays in rays:
+        blockers = ray & occupied
+        if blockers:
+            ray ^= direction_rays[(blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    return _slider_attacks(_ROOK_RAYS[sq], occupied)
+
+
+def bishop_attacks(sq, occupied):
+    return _slider_attacks(_BISHOP_RAYS[sq], occupied)
+
+
+class BitboardMoveGen(MoveGen):
+    """Legal move generation on 64 bit integer bitboards, one per piece type and color.
+        Drop-in replacement for the mailbox MoveGen: fills allowed_moves_piece in the same format
+        (destination index or (destination, move_type) tuple for promotions) and reuses the castling bookkeeping.
+        All move paths (packed lists, legal move dicts, single piece queries, move counts) work on the
+        destination bitboards of the piece_targets/pawn_targets/king_targets helpers.
+    """
+    def __init__(self):
+        super().__init__()
+        # bitboards[color][piece], index 0 is the occupancy of the color. Model._set_square updates them in place.
+        self.bitboards = [[0]*7, [0]*7]
+        self.castle_path_l_s = [[sum(1 << int(i) for i in self.king_rook_l_s[c][s]) for s in range(2)] for c in range(2)]
+        self.castle_safe_l_s = [[(1 << (self.king_idx[c]-1)) | (1 << (self.king_idx[c]-2)),
+                                 (1 << (self.king_idx[c]+1)) | (1 << (self.king_idx[c]+2))] for c in range(2)]
+        self.promotion_rows = [sum(1 << idx for idx in range(row[0], row[1] + 1)) for row in self.last_rows]
+
+    def set_board(self, pieces, colors):
+        """Rebuild all bitboards from the board arrays of the Model."""
+        for color_bbs in self.bitboards:
+            color_bbs[:] = [0]*7
+        for idx in range(64):
+            if pieces[idx] > 0:
+                self.update_square(idx, -1, -1, int(pieces[idx]), int(colors[idx]))
+
+    def update_square(self, idx, old_piece, old_color, piece, color):
+        """Keep bitboards in sync with a single square change of the Model board arrays."""
+        bit = 1 << int(idx)
+        if old_piece > 0:
+            self.bitboards[old_color][old_piece] &= ~bit
+            self.bitboards[old_color][0] &= ~bit
+        if piece > 0:
+            self.bitboards[color][piece] |= bit
+            self.bitboards[color][0] |= bit
+
+    def _attackers_bb(self, sq, by_color, occupied=None):
+        """Bitboard of all pieces of by_color attacking sq given the occupancy."""
+        bbs = self.bitboards[by_color]
+        if occupied is None:
+            occupied = bbs[0] | self.bitboards[by_color ^ 1][0]
+        queens = bbs[5]
+        return ((PAWN_ATTACKS[by_color ^ 1][sq] & bbs[1]) |
+                (KNIGHT_ATTACKS[sq] & bbs[2]) |
+                (KING_ATTACKS[sq] & bbs[6]) |
+                (bishop_attacks(sq, occupied) & (bbs[3] | queens)) |
+                (rook_attacks(sq, occupied) & (bbs[4] | queens)))
+
+    def is_attacked(self, sq, by_color, occupied=None):
+        """Check if sq is attacked by by_color given the occupancy. Cheaper than _attackers_bb: stops at the
+            first attacker and skips the slider rays without sliders of by_color."""
+        bbs = self.bitboards[by_color]
+        if (PAWN_ATTACKS[by_color ^ 1][sq] & bbs[1]) or (KNIGHT_ATTACKS[sq] & bbs[2]) or (KING_ATTACKS[sq] & bbs[6]):
+            return True
+        if occupied is None:
+            occupied = bbs[0] | self.bitboards[by_color ^ 1][0]
+        diagonal = bbs[3] | bbs[5]
+        if diagonal & BISHOP_REACH[sq] and bishop_attacks(sq, occupied) & diagonal:
+            return True
+        orthogonal = bbs[4] | bbs[5]
+        return bool(orthogonal & ROOK_REACH[sq] and rook_attacks(sq, occupied) & orthogonal)
+
+    def attackers_of(self, square, by_color, pieces=None, colors=None):
+        """MoveGen.attackers_of on the bitboards, the board arrays are not needed."""
+        return list(iter_bits(self._attackers_bb(square, by_color)))
+
+    def is_square_attacked(self, square, by_color, pieces=None, colors=None):
+        """MoveGen.is_square_attacked on the bitboards, the board arrays are not needed."""
+        return self.is_attacked(square, by_color)
+
+    def pinned_pieces(self, king_sq, color):
+        """Map pinned piece index -> bitboard of squares it may still move to (towards and incl. the pinner)."""
+        pinned = {}
+        own = self.bitboards[color][0]
+        enemy_bbs = self.bitboards[get_opponent_color(color)]
+        occupied = own | enemy_bbs[0]
+        for direction in range(8):
+            sliders = enemy_bbs[5] | (enemy_bbs[4] if direction in ORTHOGONAL_DIRS else enemy_bbs[3])
+            if not RAYS[direction][king_sq] & sliders:
+                continue
+            first = ray_attacks(king_sq, occupied, direction) & occupied
+            if not first & own:
+                continue
+            behind = ray_attacks(king_sq, occupied ^ first, direction) & occupied & ~first
+            if behind & sliders:
+                pinned[lsb(first)] = ray_attacks(king_sq, occupied ^ first, direction)
+        return pinned
+
+    def legal_masks(self, color):
+        """King safety state of color for legal move generation.
+
+        Returns:
+            Tuple[int, int, dict, int]: king square (None without king), bitboard of the pieces giving check,
+                pinned piece index -> bitboard of its allowed squares, destination mask of all other pieces
+                (every square, the check line or nothing in double check)
+        """
+        kings = self.bitboards[color][6]
+        if not kings:
+            return None, 0, {}, BOARD_MASK
+        king_sq = lsb(kings)
+        checkers = self._attackers_bb(king_sq, get_opponent_color(color))
+        if not checkers:
+            target = BOARD_MASK
+        elif checkers & (checkers - 1):
+            target = 0
+        else:
+            target = checkers | BETWEEN[king_sq][lsb(checkers)]
+        return king_sq, checkers, self.pinned_pieces(king_sq, color), target
+
+    def king_targets(self, color, king_sq, checkers, mask=BOARD_MASK):
+        """Bitboard of the legal king destinations within mask incl. the castling squares."""
+        enemy_color = get_opponent_color(color)
+        own = self.bitboards[color][0]
+        occupied = own | self.bitboards[enemy_color][0]
+        # king itself removed so it cannot hide behind itself along a ray
+        no_king = occupied ^ (1 << king_sq)
+        dests = 0
+        for dest in iter_bits(KING_ATTACKS[king_sq] & ~own & mask):
+            if not self.is_attacked(dest, enemy_color, no_king):
+                dests |= 1 << dest
+        if not checkers and mask & ~occupied:
+            for dest in self.castling_moves(color, king_sq, occupied):
+                dests |= 1 << dest
+        return dests
+
+    def piece_targets(self, orig, piece, occupied, own, mask):
+        """Bitboard of the destinations of the knight, bishop, rook or queen on orig within mask."""
+        if piece == 2:
+            dests = KNIGHT_ATTACKS[orig]
+        elif piece == 3:
+            dests = bishop_attacks(orig, occupied)
+        elif piece == 4:
+            dests = rook_attacks(orig, occupied)
+        else:
+            dests = bishop_attacks(orig, occupied) | rook_attacks(orig, occupied)
+        return dests & ~own & mask
+
+    def pawn_targets(self, orig, color, occupied, enemy, mask, ep_square=None, ep_pawn=None, king_sq=None):
+        """Bitboard of the pushes and captures of the pawn on orig within mask, plus the en passant square
+            (see ep_target) if the capture does not leave the king attacked."""
+        one = orig + self.pawn_moves[color][0]
+        dests = 0
+        if not occupied >> one & 1:
+            dests = 1 << one
+            two = one + self.pawn_moves[color][0]
+            if self.first_rows[color][0] <= orig <= self.first_rows[color][1] and not occupied >> two & 1:
+                dests |= 1 << two
+        dests = (dests | PAWN_ATTACKS[color][orig] & enemy) & mask
+        if ep_square is not None and PAWN_ATTACKS[color][orig] >> ep_square & 1 and \
+                self.ep_legal(color, orig, ep_square, ep_pawn, occupied, king_sq):
+            dests |= 1 << ep_square
+        return dests
+
+    def legal_targets(self, color, last_move, masks, origins=BOARD_MASK):
+        """Yield the legal destinations per piece of color.
+
+        Args:
+            color (int): color to generate moves for
+            last_move (tuple): last move performed, used for en passant
+            masks (tuple): legal_masks of color
+            origins (int, optional): bitboard of the pieces to generate. Defaults to BOARD_MASK (all).
+
+        Yields:
+            Tuple[int, int, int]: origin index, piece type, bitboard of the destinations
+        """
+        king_sq, checkers, pinned, target = masks
+        bbs = self.bitboards[color]
+        own = bbs[0]
+        enemy = self.bitboards[get_opponent_color(color)][0]
+        occupied = own | enemy
+        if king_sq is not None and origins >> king_sq & 1:
+            yield king_sq, 6, self.king_targets(color, king_sq, checkers)
+        if not target:  # double check: king moves only
+            return
+        for piece in range(2, 6):
+            for orig in iter_bits(bbs[piece] & origins):
+                yield orig, piece, self.piece_targets(orig, piece, occupied, own, target & pinned.get(orig, BOARD_MASK))
+        pawns = bbs[1] & origins
+        if pawns:
+            ep_square, ep_pawn = self.ep_target(color, last_move)
+            for orig in iter_bits(pawns):
+                yield orig, 1, self.pawn_targets(orig, color, occupied, enemy, target & pinned.get(orig, BOARD_MASK),
+                                                 ep_square, ep_pawn, king_sq)
+
+    def generate_moves(self, color, last_move, moves):
+        """Add legal moves of color into moves dict (orig -> set of moves).
+
+        Args:
+            color (int): color to generate moves for
+            last_move (tuple): last move performed, used for en passant
+            moves (dict): dict to fill with moves per origin
+
+        Returns:
+            Tuple[bool, int]: whether any legal move exists, bitboard of pieces giving check to color
+        """
+        masks = self.legal_masks(color)
+        enemy = self.bitboards[get_opponent_color(color)][0]
+        promotion_row = self.promotion_rows[color]
+        move_possible = False
+        for orig, piece, dests in self.legal_targets(color, last_move, masks, self.bitboards[color][0]):
+            move_possible |= dests != 0
+            if piece == 1 and dests & promotion_row:
+                moves[orig] = {(dest, promo_type | (0b0100 if enemy >> dest & 1 else 0))
+                               for dest in iter_bits(dests) for promo_type in range(8, 12)}
+            else:
+                moves[orig] = set(iter_bits(dests))
+        if not masks[3]:
+            # double check, the other pieces get an empty entry like with the mailbox MoveGen
+            for orig in iter_bits(self.bitboards[color][0] ^ self.bitboards[color][6]):
+                moves[orig] = set()
+        return move_possible, masks[1]
+
+    def count_moves(self, color, last_move):
+        """Number of legal moves of color, counted on the destination bitboards without writing moves."""
+        promotion_row = self.promotion_rows[color]
+        nr_moves = 0
+        for orig, piece, dests in self.legal_targets(color, last_move, self.legal_masks(color)):
+            nr_moves += popcount(dests)
+            if piece == 1 and dests & promotion_row:
+                nr_moves += 3*popcount(dests & promotion_row)
+        return nr_moves
+
+    def generate_packed(self, color, last_move, move_list, pseudo_legal=False, stage="all", start=0):
+        """Write legal moves of color as packed 16 bit moves (see misc.encode_move) into move_list.
+
+        Args:
+            color (int): color to generate moves for
+            last_move (tuple): last move performed, used for en passant
+            move_list (array): preallocated move list of at least MAX_MOVES entries
+            pseudo_legal (bool, optional): skip pin and check handling, moves may leave the own king
+                attacked (see Model.try_move_piece). Defaults to False.
+            stage (str, optional): "captures" (captures and promotions), "quiets" (all other moves) or "all".
+                Defaults to "all".
+            start (int, optional): index in move_list to write the first move to. Defaults to 0.
+
+        Returns:
+            Tuple[int, int]: index after the last move written, bitboard of pieces giving check to color
+                (0 if pseudo_legal)
+        """
+        enemy_color = get_opponent_color(color)
+        bbs = self.bitboards[color]
+        own = bbs[0]
+        enemy = self.bitboards[enemy_color][0]
+        occupied = own | enemy
+        n = start
+        # destination masks of the stage, promotions are handled with the pawns
+        capture_mask = enemy if stage != "quiets" else 0
+        quiet_mask = ~occupied if stage != "captures" else 0
+
+        if not bbs[6]:  # no king on board, nothing to keep safe
+            king_sq, checkers, pinned, target = None, 0, {}, BOARD_MASK
+        elif pseudo_legal:
+            king_sq = lsb(bbs[6])
+            base = king_sq << 6
+            for dest in iter_bits(KING_ATTACKS[king_sq] & (capture_mask | quiet_mask)):
+                move_list[n] = base | dest | (0x4000 if enemy >> dest & 1 else 0)
+                n += 1
+            castle_indices = self.castling_moves(color, king_sq, occupied) if quiet_mask else None
+            if castle_indices and not self.is_attacked(king_sq, enemy_color, occupied):
+                for dest in castle_indices:
+                    move_list[n] = base | dest | (move_types["castle_king"] << 12 if dest > king_sq
+                                                  else move_types["castle_queen"] << 12)
+                    n += 1
+            king_sq, checkers, pinned, target = None, 0, {}, BOARD_MASK  # no king safety for the remaining pieces
+        else:
+            king_sq, checkers, pinned, target = self.legal_masks(color)
+            base = king_sq << 6
+            for dest in iter_bits(self.king_targets(color, king_sq, checkers, capture_mask | quiet_mask)):
+                if abs(dest - king_sq) == 2:  # castling, the king only moves two squares then
+                    move_list[n] = base | dest | (move_types["castle_king"] << 12 if dest > king_sq
+                                                  else move_types["castle_queen"] << 12)
+                else:
+                    move_list[n] = base | dest | (0x4000 if enemy >> dest & 1 else 0)
+                n += 1
+            if not target:  # double check: king moves only
+                return n, checkers
+
+        for piece in range(2, 6):
+            for orig in iter_bits(bbs[piece]):
+                dests = self.piece_targets(orig, piece, occupied, own, target & pinned.get(orig, BOARD_MASK))
+                base = orig << 6
+                for dest in iter_bits(dests & capture_mask):
+                    move_list[n] = 0x4000 | base | dest
+                    n += 1
+                for dest in iter_bits(dests & quiet_mask):
+                    move_list[n] = base | dest
+                    n += 1
+
+        n = self.pawn_moves_packed(color, bbs[1], occupied, enemy, target, pinned, king_sq, last_move, move_list, n,
+                                   stage)
+        return n, checkers
+
+    def pawn_moves_packed(self, color, pawns, occupied, enemy, target, pinned, king_sq, last_move, move_list, n,
+                          stage="all"):
+        """Pawn moves of pawn_moves_packed: the pawns that are not pinned move set-wise with shifts of the whole
+            pawn bitboard, pinned pawns and en passant go through pawn_targets one by one."""
+        promotion_row = self.promotion_rows[color]
+        captures = stage != "quiets"
+        quiets = stage != "captures"
+        empty = ~occupied & BOARD_MASK
+        pinned_pawns = sum(1 << orig for orig in pinned if pawns >> orig & 1)
+        free = pawns & ~pinned_pawns
+        # (destination bitboard, orig - dest) of single pushes, double pushes and both capture directions
+        if color == 0:  # white moves towards lower indices
+            single = free >> 8 & empty
+            steps = [(single, 8), (((single & RANKS[5]) >> 8) & empty, 16),
+                     (((free & ~FILES[0]) >> 9) & enemy, 9), (((free & ~FILES[7]) >> 7) & enemy, 7)]
+        else:
+            single = free << 8 & empty
+            steps = [(single, -8), ((((single & RANKS[2]) << 8) & BOARD_MASK) & empty, -16),
+                     ((((free & ~FILES[0]) << 7) & BOARD_MASK) & enemy, -7),
+                     ((((free & ~FILES[7]) << 9) & BOARD_MASK) & enemy, -9)]
+        for i, (dests, delta) in enumerate(steps):
+            capture = i >= 2
+            dests &= target
+            if capture and not captures:
+                continue
+            promotions = dests & promotion_row
+            if promotions and captures:
+                first_type = 12 if capture else 8
+                for dest in iter_bits(promotions):
+                    base = (dest + delta) << 6 | dest
+                    for promo_type in range(first_type, first_type + 4):
+                        move_list[n] = (promo_type << 12) | base
+                        n += 1
+            if not capture and not quiets:
+                continue
+            flag = 0x4000 if capture else 0x1000 if i == 1 else 0
+            for dest in iter_bits(dests & ~promotion_row):
+                move_list[n] = flag | (dest + delta) << 6 | dest
+                n += 1
+
+        ep_square, ep_pawn = self.ep_target(color, last_move) if captures else (None, None)
+        for orig in iter_bits(pinned_pawns):
+            dests = self.pawn_targets(orig, color, occupied, enemy, target & pinned[orig], ep_square, ep_pawn, king_sq)
+            n = self.pawn_dests_packed(orig, dests, enemy, ep_square, promotion_row, captures, quiets, move_list, n)
+        if ep_square is not None:
+            for orig in iter_bits(PAWN_ATTACKS[get_opponent_color(color)][ep_square] & free):
+                if self.ep_legal(color, orig, ep_square, ep_pawn, occupied, king_sq):
+                    move_list[n] = 0x5000 | orig << 6 | ep_square
+                    n += 1
+        return n
+
+    def pawn_dests_packed(self, orig, dests, enemy, ep_square, promotion_row, captures, quiets, move_list, n):
+        # packed moves of the pawn_targets destinations of a single pawn
+        base = orig << 6
+        for dest in iter_bits(dests):
+            if enemy >> dest & 1:
+                if not captures:
+                    continue
+                if promotion_row >> dest & 1:
+                    for promo_type in range(12, 16):
+                        move_list[n] = (promo_type << 12) | base | dest
+                        n += 1
+                    continue
+                move_list[n] = 0x4000 | base | dest
+            elif dest == ep_square:
+                move_list[n] = 0x5000 | base | dest
+            elif promotion_row >> dest & 1:
+                if not captures:
+                    continue
+                for promo_type in range(8, 12):
+                    move_list[n] = (promo_type << 12) | base | dest
+                    n += 1
+                continue
+            elif not quiets:
+                continue
+            else:
+                move_list[n] = (0x1000 if abs(dest - orig) == 16 else 0) | base | dest
+            n += 1
+        return n
+
+    def ep_target(self, color, last_move):
+        """En passant square and captured pawn index available to color after last_move, else (None, None)."""
+        orig, dest, _, _, _ = last_move
+        if abs(dest - orig) == 16 and self.bitboards[get_opponent_color(color)][1] >> dest & 1:
+            return (orig + dest) // 2, dest
+        return None, None
+
+    def ep_legal(self, color, orig, ep_square, ep_pawn, occupied, king_sq):
+        # en passant removes two pieces from a rank, so check the resulting position directly
+        if king_sq is None:
+            return True
+        after = (occupied ^ (1 << orig) ^ (1 << ep_pawn)) | (1 << ep_square)
+        attackers = self._attackers_bb(king_sq, get_opponent_color(color), after) & ~(1 << ep_pawn)
+        return attackers == 0
+
+    def castling_moves(self, color, king_sq, occupied):
+        castle_indices = set()
+        if self.king_moved[color] or king_sq != self.king_idx[color]:
+            return castle_indices
+        enemy_color = get_opponent_color(color)
+        rooks = self.bitboards[color][4]
+        for i in range(2):
+            if self.rook_moved_l_s[color][i] or not rooks >> self.rook_idx_l_s[color][i] & 1:
+                continue
+            if occupied & self.castle_path_l_s[color][i]:
+                continue
+            if any(self.is_attacked(sq, enemy_color, occupied) for sq in iter_bits(self.castle_safe_l_s[color][i])):
+                continue
+            castle_indices.add(self.castle_idx_l_s[color][i])
+        return castle_indices
+
+    def generate_legal_moves(self, last_move, player_turn, color=None):
+        """Fill allowed_moves_piece for both colors like Model.calc_attacks does with the mailbox generator.
+
+        Args:
+            last_move (tuple): last move performed
+            player_turn (int): color to move
+            color (int, optional): only generate the moves of this color. Defaults to None (both colors).
+
+        Returns:
+            list: per color flag if any legal move exists
+        """
+        self.allowed_moves_piece = defaultdict(list)
+        move_possible = [False, False]
+        checkers = 0
+        for color in range(2) if color is None else [color]:
+            move_possible[color], color_checkers = self.generate_moves(color, last_move, self.allowed_moves_piece)
+            if color == player_turn:
+                checkers = color_checkers
+        self.checks = set(iter_bits(checkers))
+        return move_possible
+
+    def allowed_moves(self, orig, piece, pieces, colors, last_move, player_turn=None):
+        """Same interface as MoveGen.allowed_moves for single piece queries (e.g. GUI selection),
+            only the destinations of the piece on orig are generated."""
+        piece_color = colors[orig]
+        if player_turn != None and player_turn != piece_color:
+            return
+        enemy = self.bitboards[get_opponent_color(piece_color)][0]
+        capture_moves, other_moves = set(), set()
+        for _, piece, dests in self.legal_targets(piece_color, last_move, self.legal_masks(piece_color), 1 << orig):
+            promotion = piece == 1 and dests & self.promotion_rows[piece_color]
+            for dest in iter_bits(dests):
+                # pawn moves off the file are captures, also en passant onto the empty square
+                capture = enemy >> dest & 1 or piece == 1 and (dest - orig) % 8 != 0
+                if promotion:
+                    moves = {(dest, promo_type | (0b0100 if capture else 0)) for promo_type in range(8, 12)}
+                else:
+                    moves = {dest}
+                (capture_moves if capture else other_moves).update(moves)
+        self.allowed_moves_piece[orig] = capture_moves.union(other_moves)
+        return capture_moves, other_moves
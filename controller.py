@@ -14,7 +14,7 @@ class Controller:
         self.clock = pygame.time.Clock()
         self.GameBoard = Board(square_dim=64)
         self.GameModel = Model(self.GameBoard)
-        self.TreeSearch = TreeSearch(self.GameModel)
+        self.TreeSearch = TreeSearch(self.GameModel, movetime=1000)  # iterative deepening, 1 s per move
         self.mouse_piece, self.orig = None, None
         self.allowed_moves = set()
         self.user_color = 0 # np.randint(0, 2)
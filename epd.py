@@ -0,0 +1,135 @@
+# streaming EPD/FEN reader and writer, e.g. for test suites (bm, id) and perft files (D1..D6)
+import re
+from typing import NamedTuple, Dict, Iterator
+from position import PositionState, parse_fen, format_fen
+
+# opcode with operand up to the next ";" outside of quotes
+_OPERATION = re.compile(r'\s*([A-Za-z][A-Za-z0-9_]*)((?:\s*(?:"[^"]*"|[^;"\s]+))*)\s*(?:;|$)')
+_OPERAND = re.compile(r'"([^"]*)"|([^\s"]+)')
+_PERFT_OPCODE = re.compile(r"D[1-9]")
+
+
+class EpdRecord(NamedTuple):
+    """One parsed line of an EPD/FEN file."""
+    state: PositionState
+    ops: Dict[str, object]  # opcode -> operand, see parse_operations
+    line_nr: int = 0
+
+
+def parse_operations(operations):
+    """Parse the EPD operations after the position fields, e.g. 'bm Nf3 e4; id "WAC.001"; D1 20;'.
+
+    Args:
+        operations (str): opcode operand list, each operation terminated with ";"
+
+    Returns:
+        Dict[str, object]: opcode -> operand. D1..D9 perft counts and hmvc/fmvn clocks are ints,
+            bm/am move lists are lists of SAN strings, any other single operand is a string (quotes removed)
+            and operand lists are lists of strings.
+    """
+    ops = {}
+    for match in _OPERATION.finditer(operations):
+        opcode, operand = match.group(1), match.group(2)
+        if not opcode:
+            continue
+        values = [value.group(1) if value.group(1) is not None else value.group(2)
+                  for value in _OPERAND.finditer(operand)]
+        if _PERFT_OPCODE.fullmatch(opcode) or opcode in ("hmvc", "fmvn"):
+            ops[opcode] = int(values[0])
+        elif opcode in ("bm", "am"):
+            ops[opcode] = values
+        else:
+            ops[opcode] = values[0] if len(values) == 1 else values
+    return ops
+
+
+def parse_epd(line, line_nr=0):
+    """Parse an EPD line (4 position fields and operations) or a FEN line with optional ";"-separated
+        operations like the perft suites use ('<fen> ;D1 20 ;D2 400').
+
+    Args:
+        line (str): EPD or FEN line
+        line_nr (int, optional): line number stored in the record. Defaults to 0.
+
+    Raises:
+        ValueError: malformed position fields
+
+    Returns:
+        EpdRecord: position state and operations
+    """
+    fields = line.split(None, 4)
+    rest = fields[4] if len(fields) > 4 else ""
+    if rest.startswith(";"):
+        rest = rest[1:]
+    else:
+        # FEN clocks before the operations
+        clocks = rest.split(None, 2)
+        if len(clocks) >= 2 and clocks[0].isdigit() and clocks[1].rstrip(";").isdigit():
+            fields[4:] = [clocks[0], clocks[1].rstrip(";")]
+            rest = clocks[2] if len(clocks) > 2 else ""
+        else:
+            fields = fields[:4]
+    ops = parse_operations(rest) if rest else {}
+    if len(fields) == 4 and ("hmvc" in ops or "fmvn" in ops):
+        fields += [str(ops.get("hmvc", 0)), str(ops.get("fmvn", 1))]
+    return EpdRecord(parse_fen(" ".join(fields)), ops, line_nr)
+
+
+def format_epd(state, ops=None):
+    """EPD line of a position state and operations, the inverse of parse_epd.
+        EPD has no clock fields, pass hmvc/fmvn in ops to keep them.
+
+    Args:
+        state (PositionState): position state
+        ops (Dict[str, object], optional): opcode -> operand. Defaults to None.
+
+    Returns:
+        str: EPD line
+    """
+    line = format_fen(state, clocks=False)
+    for opcode, operand in (ops or {}).items():
+        values = operand if isinstance(operand, list) else [operand]
+        values = [f'"{value}"' if isinstance(value, str) and (not value or opcode == "id" or " " in value or ";" in value)
+                  else str(value) for value in values]
+        line += f" {opcode} {' '.join(values)};"
+    return line
+
+
+def read_epd(source) -> Iterator[EpdRecord]:
+    """Lazily yield the parsed positions of an EPD/FEN file, empty lines and "#" comments are skipped.
+
+    Args:
+        source (str or Iterable[str]): file path or already opened file / iterable of lines
+
+    Raises:
+        ValueError: malformed line, the message names the line number
+
+    Yields:
+        EpdRecord: position state and operations per line
+    """
+    if isinstance(source, str):
+        with open(source) as file:
+            yield from read_epd(file)
+        return
+    for line_nr, line in enumerate(source, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            yield parse_epd(line, line_nr)
+        except ValueError as error:
+            raise ValueError(f"line {line_nr}: {error}") from None
+
+
+def write_epd(path, records):
+    """Write (state, ops) pairs or EpdRecords as EPD lines.
+
+    Returns:
+        int: number of lines written
+    """
+    nr_lines = 0
+    with open(path, "w") as file:
+        for record in records:
+            file.write(format_epd(record[0], record[1]) + "\n")
+            nr_lines += 1
+    return nr_lines
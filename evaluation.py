@@ -0,0 +1,287 @@
+# tapered material, piece-square and pawn structure evaluation, the material + piece-square sums are kept
+# incrementally by Model._set_square
+from typing import NamedTuple
+from misc import *
+
+# midgame / endgame material in centipawns per piece type, index 0 unused (PeSTO values)
+MATERIAL_MG = (0, 82, 337, 365, 477, 1025, 0)
+MATERIAL_EG = (0, 94, 281, 297, 512, 936, 0)
+# game phase weight per piece type, the start position sums to MAX_PHASE (pure midgame)
+PHASE_WEIGHTS = (0, 0, 1, 1, 2, 4, 0)
+MAX_PHASE = 24
+
+# piece-square bonuses from white's view, board index order a8..h1 like Model._pieces
+_PAWN_MG = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+     98, 134,  61,  95,  68, 126,  34, -11,
+     -6,   7,  26,  31,  65,  56,  25, -20,
+    -14,  13,   6,  21,  23,  12,  17, -23,
+    -27,  -2,  -5,  12,  17,   6,  10, -25,
+    -26,  -4,  -4, -10,   3,   3,  33, -12,
+    -35,  -1, -20, -23, -15,  24,  38, -22,
+      0,   0,   0,   0,   0,   0,   0,   0)
+_PAWN_EG = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+    178, 173, 158, 134, 147, 132, 165, 187,
+     94, 100,  85,  67,  56,  53,  82,  84,
+     32,  24,  13,   5,  -2,   4,  17,  17,
+     13,   9,  -3,  -7,  -7,  -8,   3,  -1,
+      4,   7,  -6,   1,   0,  -5,  -1,  -8,
+     13,   8,   8,  10,  13,   0,   2,  -7,
+      0,   0,   0,   0,   0,   0,   0,   0)
+_KNIGHT_MG = (
+    -167, -89, -34, -49,  61, -97, -15, -107,
+     -73, -41,  72,  36,  23,  62,   7,  -17,
+     -47,  60,  37,  65,  84, 129,  73,   44,
+      -9,  17,  19,  53,  37,  69,  18,   22,
+     -13,   4,  16,  13,  28,  19,  21,   -8,
+     -23,  -9,  12,  10,  19,  17,  25,  -16,
+     -29, -53, -12,  -3,  -1,  18, -14,  -19,
+    -105, -21, -58, -33, -17, -28, -19,  -23)
+_KNIGHT_EG = (
+    -58, -38, -13, -28, -31, -27, -63, -99,
+    -25,  -8, -25,  -2,  -9, -25, -24, -52,
+    -24, -20,  10,   9,  -1,  -9, -19, -41,
+    -17,   3,  22,  22,  22,  11,   8, -18,
+    -18,  -6,  16,  25,  16,  17,   4, -18,
+    -23,  -3,  -1,  15,  10,  -3, -20, -22,
+    -42, -20, -10,  -5,  -2, -20, -23, -44,
+    -29, -51, -23, -15, -22, -18, -50, -64)
+_BISHOP_MG = (
+    -29,   4, -82, -37, -25, -42,   7,  -8,
+    -26,  16, -18, -13,  30,  59,  18, -47,
+    -16,  37,  43,  40,  35,  50,  37,  -2,
+     -4,   5,  19,  50,  37,  37,   7,  -2,
+     -6,  13,  13,  26,  34,  12,  10,   4,
+      0,  15,  15,  15,  14,  27,  18,  10,
+      4,  15,  16,   0,   7,  21,  33,   1,
+    -33,  -3, -14, -21, -13, -12, -39, -21)
+_BISHOP_EG = (
+    -14, -21, -11,  -8,  -7,  -9, -17, -24,
+     -8,  -4,   7, -12,  -3, -13,  -4, -14,
+      2,  -8,   0,  -1,  -2,   6,   0,   4,
+     -3,   9,  12,   9,  14,  10,   3,   2,
+     -6,   3,  13,  19,   7,  10,  -3,  -9,
+    -12,  -3,   8,  10,  13,   3,  -7, -15,
+    -14, -18,  -7,  -1,   4,  -9, -15, -27,
+    -23,  -9, -23,  -5,  -9, -16,  -5, -17)
+_ROOK_MG = (
+     32,  42,  32,  51,  63,   9,  31,  43,
+     27,  32,  58,  62,  80,  67,  26,  44,
+     -5,  19,  26,  36,  17,  45,  61,  16,
+    -24, -11,   7,  26,  24,  35,  -8, -20,
+    -36, -26, -12,  -1,   9,  -7,   6, -23,
+    -45, -25, -16, -17,   3,   0,  -5, -33,
+    -44, -16, -20,  -9,  -1,  11,  -6, -71,
+    -19, -13,   1,  17,  16,   7, -37, -26)
+_ROOK_EG = (
+     13,  10,  18,  15,  12,  12,   8,   5,
+     11,  13,  13,  11,  -3,   3,   8,   3,
+      7,   7,   7,   5,   4,  -3,  -5,  -3,
+      4,   3,  13,   1,   2,   1,  -1,   2,
+      3,   5,   8,   4,  -5,  -6,  -8, -11,
+     -4,   0,  -5,  -1,  -7, -12,  -8, -16,
+     -6,  -6,   0,   2,  -9,  -9, -11,  -3,
+     -9,   2,   3,  -1,  -5, -13,   4, -20)
+_QUEEN_MG = (
+    -28,   0,  29,  12,  59,  44,  43,  45,
+    -24, -39,  -5,   1, -16,  57,  28,  54,
+    -13, -17,   7,   8,  29,  56,  47,  57,
+    -27, -27, -16, -16,  -1,  17,  -2,   1,
+     -9, -26,  -9, -10,  -2,  -4,   3,  -3,
+    -14,   2, -11,  -2,  -5,   2,  14,   5,
+    -35,  -8,  11,   2,   8,  15,  -3,   1,
+     -1, -18,  -9,  10, -15, -25, -31, -50)
+_QUEEN_EG = (
+     -9,  22,  22,  27,  27,  19,  10,  20,
+    -17,  20,  32,  41,  58,  25,  30,   0,
+    -20,   6,   9,  49,  47,  35,  19,   9,
+      3,  22,  24,  45,  57,  40,  57,  36,
+    -18,  28,  19,  47,  31,  34,  39,  23,
+    -16, -27,  15,   6,   9,  17,  10,   5,
+    -22, -23, -30, -16, -16, -23, -36, -32,
+    -33, -28, -22, -43,  -5, -32, -20, -41)
+_KING_MG = (
+    -65,  23,  16, -15, -56, -34,   2,  13,
+     29,  -1, -20,  -7,  -8,  -4, -38, -29,
+     -9,  24,   2, -16, -20,   6,  22, -22,
+    -17, -20, -12, -27, -30, -25, -14, -36,
+    -49,  -1, -27, -39, -46, -44, -33, -51,
+    -14, -14, -22, -46, -44, -30, -15, -27,
+      1,   7,  -8, -64, -43, -16,   9,   8,
+    -15,  36,  12, -54,   8, -28,  24,  14)
+_KING_EG = (
+    -74, -35, -18, -18, -11,  15,   4, -17,
+    -12,  17,  14,  17,  17,  38,  23,  11,
+     10,  17,  23,  15,  20,  45,  44,  13,
+     -8,  22,  24,  27,  26,  33,  26,   3,
+    -18,  -4,  21,  24,  27,  23,   9, -11,
+    -19,  -3,  11,  21,  23,  16,   7,  -9,
+    -27, -11,   4,  13,  14,   4,  -5, -17,
+    -53, -34, -21, -11, -28, -14, -24, -43)
+
+# pawn structure terms (midgame, endgame) per pawn, passed pawn bonus by rank counted from the own side
+DOUBLED_PAWN = (-10, -20)  # per pawn beyond the first on a file
+ISOLATED_PAWN = (-15, -10)  # no own pawn on the neighbour files
+BACKWARD_PAWN = (-8, -10)  # neighbour pawns all in front and the stop square guarded by an enemy pawn
+PASSED_PAWN_MG = (0, 5, 10, 15, 25, 40, 60, 0)
+PASSED_PAWN_EG = (0, 10, 15, 25, 45, 70, 110, 0)
+PAWN_SHIELD = (10, 5)  # midgame bonus per pawn on the 2nd / 3rd rank in front of the king
+
+_SQUARE_TABLES_MG = (None, _PAWN_MG, _KNIGHT_MG, _BISHOP_MG, _ROOK_MG, _QUEEN_MG, _KING_MG)
+_SQUARE_TABLES_EG = (None, _PAWN_EG, _KNIGHT_EG, _BISHOP_EG, _ROOK_EG, _QUEEN_EG, _KING_EG)
+
+
+def _combine(material, square_tables):
+    # PST[color][piece][idx]: material + square bonus, positive for white and negative for black,
+    # black squares are mirrored vertically (idx ^ 56)
+    tables = [[(0,)*64 for _ in range(7)] for _ in range(2)]
+    for piece in range(1, 7):
+        tables[0][piece] = tuple(material[piece] + bonus for bonus in square_tables[piece])
+        tables[1][piece] = tuple(-material[piece] - square_tables[piece][idx ^ 56] for idx in range(64))
+    return tables
+
+
+PST_MG = _combine(MATERIAL_MG, _SQUARE_TABLES_MG)
+PST_EG = _combine(MATERIAL_EG, _SQUARE_TABLES_EG)
+
+
+def compute_scores(pieces, colors):
+    """Midgame and endgame material + piece-square sums of a position from scratch, white positive.
+
+    Args:
+        pieces (npt.ArrayLike): piece formation on board
+        colors (npt.ArrayLike): color formation on board
+
+    Returns:
+        Tuple[int, int]: midgame and endgame score in centipawns
+    """
+    mg = eg = 0
+    for idx, piece, color in zip(range(64), pieces, colors):
+        if piece > 0:
+            mg += PST_MG[color][piece][idx]
+            eg += PST_EG[color][piece][idx]
+    return mg, eg
+
+
+def game_phase(piece_counts):
+    """Game phase from the remaining minor and major pieces, MAX_PHASE is the midgame and 0 the endgame.
+
+    Args:
+        piece_counts (Dict[int, List[int]]): per piece type the (white, black) count, see Model.piece_counts
+
+    Returns:
+        int: phase 0..MAX_PHASE, capped for promoted pieces
+    """
+    phase = (piece_counts[2][0] + piece_counts[2][1] + piece_counts[3][0] + piece_counts[3][1] +
+             2*(piece_counts[4][0] + piece_counts[4][1]) + 4*(piece_counts[5][0] + piece_counts[5][1]))
+    return phase if phase < MAX_PHASE else MAX_PHASE
+
+
+def tapered_score(mg, eg, phase):
+    """Blend of the midgame and endgame score by game phase."""
+    return (mg*phase + eg*(MAX_PHASE - phase)) // MAX_PHASE
+
+
+class PawnEntry(NamedTuple):
+    """Pawn structure evaluation of one pawn formation, cached in the pawn hash table by pawn key."""
+    mg: int  # doubled, isolated, backward and passed pawns, white positive
+    eg: int
+    shelter: tuple  # per color and king file the midgame pawn shield bonus of a king on its first two ranks
+
+
+def pawn_structure(pieces, colors):
+    """Pawn structure evaluation from scratch: doubled, isolated, backward and passed pawns and the pawn shield
+        for every king file, so the result only depends on the pawns (see Model.pawn_key).
+
+    Args:
+        pieces (npt.ArrayLike): piece formation on board
+        colors (npt.ArrayLike): color formation on board
+
+    Returns:
+        PawnEntry: midgame and endgame score in centipawns (white positive) and pawn shield bonus per king file
+    """
+    # per color the board rows (0 = 8th rank) of the pawns on each file
+    pawn_rows = [[[] for _ in range(8)] for _ in range(2)]
+    for idx, piece, color in zip(range(64), pieces, colors):
+        if piece == 1:
+            pawn_rows[color][idx % 8].append(idx // 8)
+    mg = eg = 0
+    shelter = []
+    for color, sign, forward in ((0, 1, -1), (1, -1, 1)):
+        own, enemy = pawn_rows[color], pawn_rows[color ^ 1]
+        for file in range(8):
+            rows = own[file]
+            if not rows:
+                continue
+            neighbours = [neighbour for neighbour in (file - 1, file + 1) if 0 <= neighbour < 8]
+            if len(rows) > 1:
+                mg += sign*DOUBLED_PAWN[0]*(len(rows) - 1)
+                eg += sign*DOUBLED_PAWN[1]*(len(rows) - 1)
+            supporters = [row for neighbour in neighbours for row in own[neighbour]]
+            if not supporters:
+                mg += sign*ISOLATED_PAWN[0]*len(rows)
+                eg += sign*ISOLATED_PAWN[1]*len(rows)
+            blockers = [row for neighbour in neighbours + [file] for row in enemy[neighbour]]
+            attackers = [row for neighbour in neighbours for row in enemy[neighbour]]
+            for row in rows:
+                # row distance in moving direction, white moves to row 0
+                if all((blocker - row)*forward <= 0 for blocker in blockers):  # passed: no enemy pawn in front
+                    rank = 7 - row if color == 0 else row
+                    mg += sign*PASSED_PAWN_MG[rank]
+                    eg += sign*PASSED_PAWN_EG[rank]
+                # backward: all neighbour pawns are in front and an enemy pawn guards the stop square
+                if supporters and all((supporter - row)*forward > 0 for supporter in supporters) and \
+                        row + 2*forward in attackers:
+                    mg += sign*BACKWARD_PAWN[0]
+                    eg += sign*BACKWARD_PAWN[1]
+        # pawn shield on the second and third rank of the three files around the king, edge files use b/g
+        home = 6 if color == 0 else 1
+        file_shield = [PAWN_SHIELD[0]*own[file].count(home) + PAWN_SHIELD[1]*own[file].count(home + forward)
+                       for file in range(8)]
+        shelter.append(tuple(sum(file_shield[min(max(file, 1), 6) - 1:min(max(file, 1), 6) + 2])
+                             for file in range(8)))
+    return PawnEntry(mg, eg, tuple(shelter))
+
+
+def king_shelter(shelter, king_squares):
+    """Midgame pawn shield score of the kings (white positive), a king counts only on its first two ranks.
+
+    Args:
+        shelter (tuple): PawnEntry.shelter
+        king_squares (Tuple[int, int]): board index of the white and black king
+
+    Returns:
+        int: score in centipawns
+    """
+    score = 0
+    white_king, black_king = king_squares
+    if white_king >= 48:
+        score += shelter[0][white_king % 8]
+    if 0 <= black_king < 16:
+        score -= shelter[1][black_king % 8]
+    return score
+
+
+def evaluate_position(pieces, colors):
+    """Tapered material, piece-square and pawn structure score of a board from scratch, white positive.
+        Reference of the batch evaluator, see batch_evaluation.evaluate_batch.
+
+    Args:
+        pieces (npt.ArrayLike): piece formation on board
+        colors (npt.ArrayLike): color formation on board
+
+    Returns:
+        int: score in centipawns
+    """
+    mg, eg = compute_scores(pieces, colors)
+    pawns = pawn_structure(pieces, colors)
+    piece_counts = {piece: [0, 0] for piece in range(1, 7)}
+    king_squares = [-1, -1]
+    for idx, piece, color in zip(range(64), pieces, colors):
+        if piece > 0:
+            piece_counts[piece][color] += 1
+            if piece == 6:
+                king_squares[color] = idx
+    mg += pawns.mg + king_shelter(pawns.shelter, king_squares)
+    return tapered_score(mg, eg + pawns.eg, game_phase(piece_counts))
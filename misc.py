@@ -109,6 +109,38 @@ move_desc = {
 }
 move_types = {v: k for k, v in move_desc.items()}
 
+# packed 16 bit move: 4 bit move type code (see move_desc) | 6 bit origin | 6 bit destination
+def encode_move(orig, dest, move_type=0):
+    return (move_type << 12) | (orig << 6) | dest
+
+
+def decode_move(move):
+    return (move >> 6) & 63, move & 63, move >> 12
+
+
+MAX_MOVES = 256  # upper bound of legal moves in a position (218) for preallocated move lists
+
+
+def board_array(values, storage="array"):
+    """Board array of 64 piece or color codes (-1 empty) in the selected storage backend.
+
+    Args:
+        values (List[int]): square values, index 0 = a8
+        storage (str, optional): "array" for signed bytes (array('b')), "numpy" for a numpy int array.
+            Plain Python indexing of signed bytes returns ints and avoids the numpy scalar overhead
+            per square access. Defaults to "array".
+
+    Returns:
+        npt.ArrayLike: board array
+    """
+    if storage == "array":
+        from array import array
+        return array("b", values)
+    if storage == "numpy":
+        import numpy as np
+        return np.array(values)
+    raise ValueError(f"unknown board storage: {storage}")
+
 move_promo_to_piece = {
     8: 	piece_str_to_type["Knight"],
     9: 	piece_str_to_type["Bishop"],
@@ -122,6 +154,7 @@ move_promo_to_piece = {
 
 
 def print_board_string(orig, dest, pieces, colors, board_dim=8):
+    """Print the board to the console, orig and dest highlighted. pieces/colors may use any board storage."""
     for row in range(board_dim):
         print("  " + "-"*33)
         row_str = str(board_dim-row) + " "
@@ -1,16 +1,31 @@
-import numpy as np
 from misc import *
 import functools
-from moves import MoveGen
-from view import Board
+from random import choice, randrange
+from typing import TYPE_CHECKING
+from moves import MoveGen, PIECE_RAYS, PAWN_ATTACKS
+from bitboard import BitboardMoveGen, iter_bits
+from zobrist import ZOBRIST_PIECES, ZOBRIST_SIDE, ZOBRIST_CASTLING, ZOBRIST_EP_FILE, compute_key, compute_pawn_key
 from collections import defaultdict
+from array import array
+from position import PositionState, parse_fen, format_fen, castling_mask, en_passant_file
+from evaluation import PST_MG, PST_EG, compute_scores, game_phase, tapered_score, pawn_structure, king_shelter
+from pawn_hash import PawnHashTable
+if TYPE_CHECKING:
+    from view import Board  # the view imports pygame, the engine core runs headless without it
+
+# piece_values as tuple for the MVV-LVA move order, index 0 (empty square) unused
+_ORDER_VALUES = tuple(piece_values.get(piece, 0) for piece in range(7))
+# last move entry of a null move (Model.move_null), a quiet move from and to the same square
+_NULL_MOVE = (35, 35, move_types["quiet"], -1, -1)
 
 
 class Model:
     """Model according to MVC pattern representing internal board data states.
         Handles everything from board arrangment of pieces/colors, nr of moves, player turns, FEN string handling etc.
     """
-    def __init__(self, view : Board, board_dim=8, sounds=True, fen_init=""):
+    def __init__(self, view : "Board", board_dim=8, sounds=True, fen_init="", move_gen="mailbox",
+                 eval_mobility=None, pseudo_legal=False, debug_hash=False, board_storage="array", evaluation="pst",
+                 pawn_hash_entries=2**14, pawn_hash_policy="always"):
         #    Now we have the mailbox array, so called because it looks like a
         #    mailbox, at least according to Bob Hyatt. This is useful when we
         #    need to figure out what pieces can go where. Let's say we have a
@@ -24,41 +39,48 @@ class Model:
         #    in attack() in board.c. */
         self._view = view
         self._sounds = sounds
-        self._colors = np.array([1, 1, 1, 1, 1, 1, 1, 1,
-                                 1, 1, 1, 1, 1, 1, 1, 1,
-                                 -1, -1, -1, -1, -1, -1, -1, -1,
-                                 -1, -1, -1, -1, -1, -1, -1, -1,
-                                 -1, -1, -1, -1, -1, -1, -1, -1,
-                                 -1, -1, -1, -1, -1, -1, -1, -1,
-                                 0, 0, 0, 0, 0, 0, 0, 0,
-                                 0, 0, 0, 0, 0, 0, 0, 0])
+        # board arrays in the selected storage backend, see misc.board_array
+        self.board_storage = board_storage
+        self._colors = board_array([1, 1, 1, 1, 1, 1, 1, 1,
+                                    1, 1, 1, 1, 1, 1, 1, 1,
+                                    -1, -1, -1, -1, -1, -1, -1, -1,
+                                    -1, -1, -1, -1, -1, -1, -1, -1,
+                                    -1, -1, -1, -1, -1, -1, -1, -1,
+                                    -1, -1, -1, -1, -1, -1, -1, -1,
+                                    0, 0, 0, 0, 0, 0, 0, 0,
+                                    0, 0, 0, 0, 0, 0, 0, 0], board_storage)
 
         # 1: "Pawn", 2: "Knight", 3: "Bishop", 4: "Rook", 5: "Queen", 6: "King"
-        self._pieces = np.array([4, 2, 3, 5, 6, 3, 2, 4,
-                                 1, 1, 1, 1, 1, 1, 1, 1,
-                                 -1, -1, -1, -1, -1, -1, -1, -1,
-                                 -1, -1, -1, -1, -1, -1, -1, -1,
-                                 -1, -1, -1, -1, -1, -1, -1, -1,
-                                 -1, -1, -1, -1, -1, -1, -1, -1,
-                                 1, 1, 1, 1, 1, 1, 1, 1,
-                                 4, 2, 3, 5, 6, 3, 2, 4])
+        self._pieces = board_array([4, 2, 3, 5, 6, 3, 2, 4,
+                                    1, 1, 1, 1, 1, 1, 1, 1,
+                                    -1, -1, -1, -1, -1, -1, -1, -1,
+                                    -1, -1, -1, -1, -1, -1, -1, -1,
+                                    -1, -1, -1, -1, -1, -1, -1, -1,
+                                    -1, -1, -1, -1, -1, -1, -1, -1,
+                                    1, 1, 1, 1, 1, 1, 1, 1,
+                                    4, 2, 3, 5, 6, 3, 2, 4], board_storage)
 
         self.last_board_state_diff = {}  # tracks diff to last before state before last move
         self._board_dim = board_dim
-        self._attack_map = np.zeros(64)
+        self._attack_map = [0]*64
         self._old_pieces = self._pieces
         self._old_colors = self._colors
 
-        self.MoveGen = MoveGen()
+        self.move_gen = move_gen
+        self.MoveGen = BitboardMoveGen() if move_gen == "bitboard" else MoveGen()
+        self._bitboards = self.MoveGen.bitboards if move_gen == "bitboard" else None  # updated in _set_square
 
         # init turn indicator
         self.player_turn = 0  # 0: white, 1_ black
         self.checkmated_color = -1  # 0: white, 1_ black
         self.move_nr = 1
         self.half_moves_50_check = 0
+        self._half_move_clocks = []  # half_moves_50_check before each move of _last_moves, restored on unmove
 
         self.mouse_piece, self.orig = None, None
         self._last_moves = [(35, 35, False, -1, -1)] # Tuple of: orig, dest, move_type, old_piece, old_color
+        # owner token of the snapshots of this move history, replaced whenever restore starts a new one
+        self._history_token = object()
         self.allowed_moves = set()
 
         self.capture_moves = set()
@@ -67,13 +89,81 @@ class Model:
 
         self.piece_counts = {1: [8, 8], 2: [2, 2], 3: [2, 2], 4: [2, 2], 5: [1, 1], 6: [1, 1]}
         self.nr_allowed_moves = [0, 0]
+        # leaf evaluation "pst" (incremental material + piece-square tables) or "shannon" (material + mobility)
+        self.set_evaluation(evaluation)
+        # mobility term in eval needs the opponent moves as well, else only the player to move is generated,
+        # None: only for the shannon evaluation, the only one using it
+        self.eval_mobility = evaluation == "shannon" if eval_mobility is None else eval_mobility
+        # midgame/endgame material + piece-square sums (white positive), updated in _set_square
+        self.mg_score = 0
+        self.eg_score = 0
+        # pawn structure evaluation cached by the pawn-only zobrist key, pawn_hash_entries=0 disables the cache
+        self.pawn_key = 0
+        self.pawn_hash = PawnHashTable(pawn_hash_entries, pawn_hash_policy) if pawn_hash_entries else None
+        # pseudo legal move lists, legality is only checked for moves made via try_move_piece
+        self.pseudo_legal = pseudo_legal
+        # piece lists: piece_squares[color][piece] set of occupied board indices, index 0 unused
+        self.piece_squares = [[set() for _ in range(7)] for _ in range(2)]
+        # zobrist key of the position, debug_hash checks it against a recalculation after every (un)move
+        self.hash_key = 0
+        self.debug_hash = debug_hash
+        self._move_lists = []  # reusable packed move list per search ply
+        self.sync_move_gen()
 
         if len(fen_init) > 0:
             self.set_fen_string(fen_init)
 
     def draw(self):
         if self._view != None:
-            self._view.draw(self._pieces, self._colors, self._attack_map)
+            self._view.draw(self.piece_squares, self._attack_map)
+
+    def set_evaluation(self, evaluation):
+        """Select the leaf evaluation evaluate() calls.
+
+        Args:
+            evaluation (str): "pst" tapered material, piece-square and pawn structure score in centipawns or "shannon"
+                material + mobility score in pawns
+
+        Raises:
+            ValueError: unknown evaluation
+        """
+        if evaluation == "pst":
+            self.evaluate = self.eval_board_pst
+        elif evaluation == "shannon":
+            self.evaluate = self.eval_board_shannon
+        else:
+            raise ValueError(f"unknown evaluation: {evaluation}")
+        self.evaluation = evaluation
+
+    def eval_board_pst(self):
+        """Tapered material, piece-square and pawn structure score in centipawns from the view of the player to move.
+            The midgame/endgame sums are kept incrementally, the phase follows from piece_counts and the pawn
+            structure usually comes from the pawn hash table.
+        """
+        pawns = self.pawn_structure()
+        squares = self.piece_squares
+        kings = [-1, -1]
+        for color in range(2):
+            for king in squares[color][6]:
+                kings[color] = king
+        mg = self.mg_score + pawns.mg + king_shelter(pawns.shelter, kings)
+        score = tapered_score(mg, self.eg_score + pawns.eg, game_phase(self.piece_counts))
+        return score if self.player_turn == 0 else -score
+
+    def pawn_structure(self):
+        """Pawn structure evaluation of the current pawns, looked up in or added to the pawn hash table.
+
+        Returns:
+            PawnEntry: pawn structure score and pawn shield per king file
+        """
+        table = self.pawn_hash
+        if table is None:
+            return pawn_structure(self._pieces, self._colors)
+        entry = table.probe(self.pawn_key)
+        if entry is None:
+            entry = pawn_structure(self._pieces, self._colors)
+            table.store(self.pawn_key, entry)
+        return entry
 
     def eval_board_shannon(self):
         turn = self.player_turn
@@ -86,10 +176,11 @@ class Model:
         score += 3 * (self.piece_counts[piece_str_to_type["Bishop"]][turn] - self.piece_counts[piece_str_to_type["Bishop"]][enemy])
         score += 3 * (self.piece_counts[piece_str_to_type["Knight"]][turn] - self.piece_counts[piece_str_to_type["Knight"]][enemy])
         score += 1 * (self.piece_counts[piece_str_to_type["Pawn"]][turn] - self.piece_counts[piece_str_to_type["Pawn"]][enemy])
-        # TODO: double blocked and isolated pawn
+        # pawn structure terms see eval_board_pst
         #score -= 0.5 * (self.piece_counts[piece_str_to_type["Knight"]][turn] - self.piece_counts[piece_str_to_type["Knight"]][enemy])
 
-        score += 0.1 * (self.nr_allowed_moves[turn]-self.nr_allowed_moves[enemy])
+        if self.eval_mobility:
+            score += 0.1 * (self.nr_allowed_moves[turn]-self.nr_allowed_moves[enemy])
         return score
 
     def count_piece_changes(self, player_color, old_piece, move_type, move_dir="move"):
@@ -110,18 +201,16 @@ class Model:
 
     def set_piece_at_mouse(self, mouse_pos, orig, allowed_moves=None):
         board_idx = self._view.square_from_mouse(mouse_pos)
-        indices = np.array(
-            [i[0] if type(i) == tuple else i for i in allowed_moves])
-        types = np.array(
-            [i[1] if type(i) == tuple else i for i in allowed_moves])
-        board_idx_pos = np.where(indices == board_idx)
+        indices = [i[0] if type(i) == tuple else i for i in allowed_moves]
+        types = [i[1] if type(i) == tuple else i for i in allowed_moves]
+        board_idx_pos = [pos for pos, idx in enumerate(indices) if idx == board_idx]
         if orig != board_idx:
             if allowed_moves != None:
-                if len(board_idx_pos[0]) <= 0:
+                if len(board_idx_pos) <= 0:
                     return
                 else:
-                    selected_move_idx = np.random.choice(board_idx_pos[0])
-                if any(types != indices):
+                    selected_move_idx = choice(board_idx_pos)
+                if any(move_type != idx for move_type, idx in zip(types, indices)):
                     self.move_piece_checked(
                         orig, (indices[selected_move_idx], types[selected_move_idx]))
                 else:
@@ -135,97 +224,94 @@ class Model:
         return board_idx
 
     def get_fen_string(self):
-        fen_string = ""
-        empty_fields = 0
-        for row in range(self._board_dim):
-            for col in range(self._board_dim):
-                i = grid2continous(row, col)
-                if self._pieces[i] < 0:
-                    empty_fields += 1
-                    continue
-                else:
-                    if empty_fields > 0:
-                        fen_string += str(empty_fields)
-                        empty_fields = 0
-                    fen_letter = str(fen_codec_reverse[self._pieces[i]])
-                    if self._colors[i] == 0:
-                        fen_letter = fen_letter.upper()
-                    fen_string += fen_letter
-
-            fen_string += str(empty_fields) if empty_fields > 0 else ""
-            empty_fields = 0
-            fen_string += "/" if row != self._board_dim-1 else ""
-        fen_string += " w " if self.player_turn == 0 else " b "
-        castling_string = ""
-        for i in range(2):
-            if not self.MoveGen.king_moved[i]:
-                if not self.MoveGen.rook_moved_l_s[i][1]:
-                    castling_string += "K" if i == 0 else "k"
-                if not self.MoveGen.rook_moved_l_s[i][0]:
-                    castling_string += "Q" if i == 0 else "q"
-        fen_string += castling_string if len(castling_string) > 0 else "-"
-        en_passant_indices, _ = self.MoveGen.check_en_passant(
-            self._pieces, self._colors, self._last_moves[-1])
-        fen_string += " " + self.board2alphanum(next(iter(en_passant_indices))) if (
-            len(en_passant_indices)) > 0 else " -"
-        fen_string += " " + str(self.half_moves_50_check)
-        fen_string += " " + str(self.move_nr)
-        return fen_string
+        return format_fen(self.snapshot())
 
     def set_fen_string(self, fen_string):
-        str_parts = fen_string.split(" ")
-        self.piece_counts = {}
-        game_string = str_parts[0].replace("/", "")
-        empty_cnt = 0
-        i = 0
+        """Load a position from a FEN string, see position.parse_fen.
+
+        Args:
+            fen_string (str): FEN game notation string
+        """
+        self.restore(parse_fen(fen_string))
+
+    def set_move_gen(self, move_gen):
+        """Switch move generation backend ("mailbox" or "bitboard") keeping the castling bookkeeping."""
+        if move_gen == self.move_gen:
+            return
+        old_gen = self.MoveGen
+        self.MoveGen = BitboardMoveGen() if move_gen == "bitboard" else MoveGen()
+        self.MoveGen.king_moved = old_gen.king_moved
+        self.MoveGen.rook_moved_l_s = old_gen.rook_moved_l_s
+        self.MoveGen.allow_castling = old_gen.allow_castling
+        self.MoveGen.allow_castling_king = old_gen.allow_castling_king
+        self.move_gen = move_gen
+        self._bitboards = self.MoveGen.bitboards if move_gen == "bitboard" else None
+        self.sync_move_gen()
+
+    def sync_move_gen(self):
+        self.piece_squares = [[set() for _ in range(7)] for _ in range(2)]
         for idx in range(self._board_dim**2):
-            self._pieces[idx] = -1
-            self._colors[idx] = -1
-            if empty_cnt > 0:
-                empty_cnt -= 1
-                continue
-            if game_string[i].isnumeric():
-                empty_cnt = int(game_string[i])-1
-            else:
-                piece = fen_codec[game_string[i].lower(
-                )] if game_string[i].lower() in fen_codec else -1
-                self._pieces[idx] = piece
-                self._colors[idx] = 0 if game_string[i].isupper() else 1
-                self.piece_counts[piece][self._colors[idx]] += 1
-            i += 1
-
-        self.player_turn = 0 if str_parts[1] == "w" else 1
-        # castling
-        self.MoveGen.rook_moved_l_s[1][1] = 1 if "k" not in str_parts[2] else 0
-        self.MoveGen.rook_moved_l_s[1][0] = 1 if "q" not in str_parts[2] else 0
-        self.MoveGen.rook_moved_l_s[0][1] = 1 if "K" not in str_parts[2] else 0
-        self.MoveGen.rook_moved_l_s[0][0] = 1 if "Q" not in str_parts[2] else 0
-
-        self.MoveGen.allow_castling[1][1] = False if "k" not in str_parts[2] else True
-        self.MoveGen.allow_castling[1][0] = False if "q" not in str_parts[2] else True
-        self.MoveGen.allow_castling[0][1] = False if "K" not in str_parts[2] else True
-        self.MoveGen.allow_castling[0][0] = False if "Q" not in str_parts[2] else True
-
-        if "-" in str_parts[2]:
-            self.MoveGen.allow_castling_king = False
-            self.MoveGen.king_moved = [1, 1]
-        else:
-            self.MoveGen.allow_castling_king = True
-            self.MoveGen.king_moved = [0, 0]
-
-        # en passant (ep)
-        if str_parts[3] != "-":
-            # reproduce last move from ep alphanum
-            idx = self.alphanum2board(str_parts[3])
-            if idx > 32:  # white side ep
-                last_move = (idx+self._board_dim, idx-self._board_dim,
-                             move_types["pawn_double"], -1, -1)
-            else:  # black side ep
-                last_move = (idx-self._board_dim, idx+self._board_dim,
-                             move_types["pawn_double"], -1, -1)
-            self._last_moves.append((last_move))
-        self.half_moves_50_check = int(str_parts[4])
-        self.move_nr = int(str_parts[5])
+            if self._pieces[idx] > 0:
+                self.piece_squares[self._colors[idx]][self._pieces[idx]].add(idx)
+        self.hash_key = self.compute_hash()
+        self.pawn_key = compute_pawn_key(self._pieces, self._colors)
+        self.mg_score, self.eg_score = compute_scores(self._pieces, self._colors)
+        if self.move_gen == "bitboard":
+            self.MoveGen.set_board(self._pieces, self._colors)
+
+    def _set_square(self, idx, piece, color):
+        # single point of board array changes so backend state and piece lists can follow incrementally
+        old_piece = self._pieces[idx]
+        old_color = self._colors[idx]
+        bitboards = self._bitboards
+        if old_piece > 0:
+            if bitboards is not None:
+                # piece and occupancy bitboards (index 0) of the color, see BitboardMoveGen
+                bitboards[old_color][old_piece] ^= 1 << idx
+                bitboards[old_color][0] ^= 1 << idx
+            self.piece_squares[old_color][old_piece].discard(idx)
+            self.hash_key ^= ZOBRIST_PIECES[old_color][old_piece][idx]
+            self.mg_score -= PST_MG[old_color][old_piece][idx]
+            self.eg_score -= PST_EG[old_color][old_piece][idx]
+            if old_piece == 1:
+                self.pawn_key ^= ZOBRIST_PIECES[old_color][1][idx]
+        if piece > 0:
+            if bitboards is not None:
+                bitboards[color][piece] |= 1 << idx
+                bitboards[color][0] |= 1 << idx
+            self.piece_squares[color][piece].add(idx)
+            self.hash_key ^= ZOBRIST_PIECES[color][piece][idx]
+            self.mg_score += PST_MG[color][piece][idx]
+            self.eg_score += PST_EG[color][piece][idx]
+            if piece == 1:
+                self.pawn_key ^= ZOBRIST_PIECES[color][1][idx]
+        self._pieces[idx] = piece
+        self._colors[idx] = color
+
+    def castling_rights(self):
+        """Castling rights as mask with bit 2*color + side (0 long, 1 short) as written to the FEN string."""
+        return castling_mask(self.MoveGen.king_moved, self.MoveGen.rook_moved_l_s)
+
+    def ep_file(self):
+        """File of the pawn the last move pushed two squares if the player to move has a pawn next to it, else -1."""
+        return en_passant_file(self._pieces, self._colors, self.player_turn, self._last_moves[-1])
+
+    def compute_hash(self):
+        """Zobrist key of the current position calculated from scratch."""
+        return compute_key(self._pieces, self._colors, self.player_turn, self.castling_rights(), self.ep_file())
+
+    def _ep_hash(self):
+        # en passant part of the zobrist key, only a pawn double push can set it
+        if self._last_moves[-1][2] != move_types["pawn_double"]:
+            return 0
+        ep_file = self.ep_file()
+        return ZOBRIST_EP_FILE[ep_file] if ep_file >= 0 else 0
+
+    def check_hash(self):
+        assert self.hash_key == self.compute_hash(), \
+            f"zobrist key out of sync after {self._last_moves[-1]}: {self.get_fen_string()}"
+        assert self.pawn_key == compute_pawn_key(self._pieces, self._colors), \
+            f"pawn key out of sync after {self._last_moves[-1]}: {self.get_fen_string()}"
 
     def board2alphanum(self, idx):
         row, col = continous2grid(idx)
@@ -247,7 +333,7 @@ class Model:
                 self.move_piece_checked(orig, dest)
         else:
             self.move_piece_checked(
-                orig, allowed_moves[np.random.randint(0, len(allowed_moves))])
+                orig, allowed_moves[randrange(len(allowed_moves))])
 
     def move_piece_checked(self, orig, dest):
         if self._colors[orig] != self.player_turn:
@@ -258,6 +344,11 @@ class Model:
             self.play_sound("check")
         return 0
 
+    def make_move(self, move, silent=False):
+        """Make a packed 16 bit move (see misc.encode_move) without legality check, undone with unmove_piece."""
+        orig, dest, move_type = decode_move(move)
+        self.move_piece(orig, (dest, move_type), silent)
+
     def move_piece(self, orig, move, silent=False):  # unchecked physical board move
         if type(move) == tuple:
             dest, move_type = move
@@ -275,6 +366,12 @@ class Model:
         piece_col = self._colors[orig]
         if piece != None and dest != None:
             if dest != orig:
+                # castling rights only change when king or rook move or a rook is captured
+                state_hash = self._ep_hash()
+                castling_rights = self.castling_rights() if piece == 4 or piece == 6 or old_piece == 4 else -1
+                if old_piece == 4 and old_col != piece_col:
+                    # a rook captured on its home square loses its castling right, marked by the ply
+                    self.MoveGen.set_piece_moved(old_piece, old_col, dest, self._rook_capture_mark())
                 # set piece type
                 if piece == 4:
                     self.MoveGen.set_piece_moved(
@@ -292,57 +389,42 @@ class Model:
                         # long castle
                         if dest == self.MoveGen.castle_idx_l_s[piece_col][0]:
                             move_type = move_types["castle_queen"]
-                            self._pieces[orig-2] = 6
-                            self._pieces[orig-1] = 4
-                            self._colors[orig-2] = self._colors[orig]
-                            self._colors[orig-1] = self._colors[orig]
-                            self._colors[orig-4] = -1
-                            self._pieces[orig-4] = -1
+                            self._set_square(orig-2, 6, piece_col)
+                            self._set_square(orig-1, 4, piece_col)
+                            self._set_square(orig-4, -1, -1)
                             self.MoveGen.set_piece_moved(
                                 4, piece_col, self.MoveGen.rook_idx_l_s[piece_col][0], self.move_nr)
                         # short castle
                         elif dest == self.MoveGen.castle_idx_l_s[piece_col][1]:
                             move_type = move_types["castle_king"]
-                            self._pieces[orig+2] = 6
-                            self._pieces[orig+1] = 4
-                            self._colors[orig+2] = self._colors[orig]
-                            self._colors[orig+1] = self._colors[orig]
-                            self._colors[orig+3] = -1
-                            self._pieces[orig+3] = -1
+                            self._set_square(orig+2, 6, piece_col)
+                            self._set_square(orig+1, 4, piece_col)
+                            self._set_square(orig+3, -1, -1)
                             self.MoveGen.set_piece_moved(
                                 4, piece_col, self.MoveGen.rook_idx_l_s[piece_col][1], self.move_nr)
                         old_col = self._colors[orig]
-                        self._colors[orig] = -1
-                        self._pieces[orig] = -1
+                        self._set_square(orig, -1, -1)
 
                 if piece == 1:
                     # #pawn promotion
                     if is_promotion and move_type != None:
                         self.play_sound("promote", silent)
-                        self._pieces[dest] = move_promo_to_piece[move_type]
-                        self._pieces[orig] = -1
-
                         # set color
                         if not move_type & 0b0100:  # if not is capture
                             old_col = self._colors[orig]
-                        self._colors[dest] = self._colors[orig]
-                        self._colors[orig] = -1
+                        self._set_square(dest, move_promo_to_piece[move_type], piece_col)
+                        self._set_square(orig, -1, -1)
 
                     # en passant
                     if abs(orig-dest) != 8 and abs(orig-dest) != 16 and self._pieces[dest] < 0:
                         en_passant_piece_idx = self._last_moves[-1][1]
-                        self._pieces[en_passant_piece_idx] = -1
                         old_col = self._colors[en_passant_piece_idx]
-                        self._colors[en_passant_piece_idx] = -1
+                        self._set_square(en_passant_piece_idx, -1, -1)
                         is_capture = True
                         move_type = move_types["ep_capture"]
                 if not is_castling and not is_promotion:  # normal moves
-                    self._pieces[dest] = piece
-                    self._pieces[orig] = -1
-
-                    # set color
-                    self._colors[dest] = self._colors[orig]
-                    self._colors[orig] = -1
+                    self._set_square(dest, piece, piece_col)
+                    self._set_square(orig, -1, -1)
 
                     # call sound making
                     self.play_sound("capture" if is_capture else "move", silent)
@@ -353,7 +435,6 @@ class Model:
                     last_move_type = move_type
                 elif is_capture:
                     last_move_type = move_types["capture"]
-                    # if is capture of rook check castling compromised or still possible
                 self.count_piece_changes(piece_col, old_piece, last_move_type, move_dir="move")
                 self._last_moves.append(
                     (orig, dest, last_move_type, old_piece, old_col))
@@ -363,8 +444,14 @@ class Model:
                 # update player turn black->white , white -> black
                 self.move_nr += 1 if self.player_turn == 1 else 0
                 self.player_turn ^= 1
-                if (piece == 1 or is_capture or is_castling):
-                    self.old_moves_50_check = self.half_moves_50_check
+                state_hash ^= self._ep_hash()
+                if castling_rights >= 0:
+                    state_hash ^= ZOBRIST_CASTLING[castling_rights] ^ ZOBRIST_CASTLING[self.castling_rights()]
+                self.hash_key ^= ZOBRIST_SIDE ^ state_hash
+                if self.debug_hash:
+                    self.check_hash()
+                self._half_move_clocks.append(self.half_moves_50_check)
+                if piece == 1 or is_capture:
                     self.half_moves_50_check = 0
                 else:
                     self.half_moves_50_check += 1
@@ -379,96 +466,492 @@ class Model:
         print_board_string(orig, dest, self._pieces, self._colors)
 
     def unmove_piece(self):
+        state_hash = self._ep_hash()
         self.player_turn = get_opponent_color(self.player_turn)
         self.move_nr -= 1 if self.player_turn == 1 else 0
         orig, dest, move_type, old_piece, old_col = self._last_moves.pop()
+        moved_piece = self._pieces[dest]
+        castling_rights = self.castling_rights() if moved_piece == 4 or moved_piece == 6 or old_piece == 4 else -1
 
         if move_type & 0b0100:  # is_capture
             # replace captured piece
             if move_type & 0b1000:  # is_promotion
                 # replace pawn back
-                self._pieces[orig] = 1  # pawn
+                self._set_square(orig, 1, self._colors[dest])  # pawn
             else:
                 # move other piece back
-                self._pieces[orig] = self._pieces[dest]
-            self._colors[orig] = self._colors[dest]
+                self._set_square(orig, self._pieces[dest], self._colors[dest])
             if move_type == move_types["ep_capture"]:
                 ep_piece_offset = -8 if old_col == 0 else 8
-                self._colors[dest] = -1
-                self._pieces[dest] = -1
-                self._colors[dest+ep_piece_offset] = old_col
-                self._pieces[dest+ep_piece_offset] = piece_str_to_type["Pawn"]
+                self._set_square(dest, -1, -1)
+                self._set_square(dest+ep_piece_offset, piece_str_to_type["Pawn"], old_col)
             else:
-                self._colors[dest] = old_col
-                self._pieces[dest] = old_piece
+                self._set_square(dest, old_piece, old_col)
 
         elif move_type & 0b1000:  # is_promotion
-            self._colors[orig] = old_col
-            self._pieces[orig] = 1
-            self._colors[dest] = -1
-            self._pieces[dest] = -1
+            self._set_square(orig, 1, old_col)
+            self._set_square(dest, -1, -1)
         elif move_type == 2 or move_type == 3:  # castling
             if move_type == 3:  # long castle
-                self._pieces[orig-2] = -1
-                self._pieces[orig-1] = -1
-                self._colors[orig-2] = -1
-                self._colors[orig-1] = -1
-                self._colors[orig-4] = old_col
-                self._pieces[orig-4] = 4
+                self._set_square(orig-2, -1, -1)
+                self._set_square(orig-1, -1, -1)
+                self._set_square(orig-4, 4, old_col)
             elif move_type == 2:  # short castle king side
-                self._pieces[orig+2] = -1
-                self._pieces[orig+1] = -1
-                self._colors[orig+2] = -1
-                self._colors[orig+1] = -1
-                self._colors[orig+3] = old_col
-                self._pieces[orig+3] = 4
-            self._colors[orig] = old_col
-            self._pieces[orig] = 6
+                self._set_square(orig+2, -1, -1)
+                self._set_square(orig+1, -1, -1)
+                self._set_square(orig+3, 4, old_col)
+            self._set_square(orig, 6, old_col)
 
         else:  # normal
-            self._colors[orig] = self._colors[dest]
-            self._pieces[orig] = self._pieces[dest]
-            self._colors[dest] = -1
-            self._pieces[dest] = -1
+            self._set_square(orig, self._pieces[dest], self._colors[dest])
+            self._set_square(dest, -1, -1)
 
         # reset moved states if
         self.MoveGen.reset_pieces_moved(self.move_nr, self._colors[orig])
+        if old_piece == 4 and move_type & 0b0100:
+            self.MoveGen.reset_rook_captured(old_col, dest, self._rook_capture_mark())
 
         self.count_piece_changes(self._colors[orig], old_piece, move_type, move_dir="unmove")
-
-        if (self._pieces[orig] == 1 or move_type & 0b0100 or move_type == 2 or move_type == 3):
-            # assert self.half_moves_50_check == 0
-            self.half_moves_50_check = self.old_moves_50_check
+        self.half_moves_50_check = self._half_move_clocks.pop()
+        state_hash ^= self._ep_hash()
+        if castling_rights >= 0:
+            state_hash ^= ZOBRIST_CASTLING[castling_rights] ^ ZOBRIST_CASTLING[self.castling_rights()]
+        self.hash_key ^= ZOBRIST_SIDE ^ state_hash
+        if self.debug_hash:
+            self.check_hash()
+
+    def _rook_capture_mark(self):
+        # moved state of a rook captured by the next move: negative and unique per ply, so neither the move nr
+        # resets of unmove_piece nor the -1 of pieces moved before the move history can match it
+        return -2 - len(self._last_moves)
+
+    def move_null(self):
+        """Pass the turn to the opponent without moving a piece (null move pruning), undone with unmove_null.
+            The player to move must not be in check."""
+        state_hash = self._ep_hash()
+        self._last_moves.append((*_NULL_MOVE,))  # a new tuple per null move, see restore
+        self.move_nr += 1 if self.player_turn == 1 else 0
+        self.player_turn ^= 1
+        self.hash_key ^= ZOBRIST_SIDE ^ state_hash
+        self._half_move_clocks.append(self.half_moves_50_check)
+        self.half_moves_50_check += 1
+        if self.debug_hash:
+            self.check_hash()
+
+    def unmove_null(self):
+        """Take back the null move of move_null."""
+        self.player_turn ^= 1
+        self.move_nr -= 1 if self.player_turn == 1 else 0
+        self._last_moves.pop()
+        self.half_moves_50_check = self._half_move_clocks.pop()
+        self.hash_key ^= ZOBRIST_SIDE ^ self._ep_hash()
+        if self.debug_hash:
+            self.check_hash()
+
+    def snapshot(self):
+        """Copy of the current position state for restore, e.g. for copy-make search or worker processes.
+
+        Returns:
+            PositionState: immutable position state
+        """
+        move_gen = self.MoveGen
+        return PositionState(tuple(self._pieces), tuple(self._colors), self.player_turn, self.move_nr,
+                             self.half_moves_50_check, self.checkmated_color, tuple(move_gen.king_moved),
+                             (tuple(move_gen.rook_moved_l_s[0]), tuple(move_gen.rook_moved_l_s[1])),
+                             tuple(tuple(self.piece_counts[piece]) for piece in range(1, 7)),
+                             self._last_moves[-1], len(self._last_moves), self.hash_key, self._history_token)
+
+    def restore(self, state):
+        """Return to a snapshot position without unmoving the moves made since (copy-make).
+            Restoring a snapshot of this Model drops the moves made since from the move history, so earlier
+            moves can still be unmoved. A snapshot of another Model (e.g. from a different process) starts a new
+            move history at the snapshot position.
+
+        Args:
+            state (PositionState): position state of snapshot
+        """
+        history = self._last_moves
+        nr_moves = state.nr_moves
+        # history entries are unique tuples, an own snapshot still ends in the same one if no move before it
+        # was taken back
+        own = state.owner is self._history_token and nr_moves <= len(history) and \
+            history[nr_moves - 1] is state.last_move
+        squares = range(64)
+        if own:
+            made = len(history) - nr_moves
+            if made:
+                # only squares of the moves made since the snapshot can differ, duplicates are harmless
+                squares = []
+                for orig, dest, move_type, _, _ in history[nr_moves:]:
+                    squares += (orig, dest)
+                    if move_type == 2 or move_type == 3:  # castling rook
+                        squares += range(orig - 4, orig + 4)
+                    elif move_type == 5:  # en passant captured pawn
+                        squares += (dest - 8, dest + 8)
+                del history[nr_moves:]
+                del self._half_move_clocks[-made:]
         else:
-            # assert self.half_moves_50_check > 0
-            self.half_moves_50_check -= 1
-
-    def calc_attacks(self, silent=False):
+            self._last_moves = [state.last_move]
+            self._half_move_clocks = []
+            self._history_token = object()
+
+        # only changed squares go through _set_square (piece lists, bitboards)
+        pieces, colors = self._pieces, self._colors
+        if own:
+            for idx in squares:
+                piece, color = state.pieces[idx], state.colors[idx]
+                if pieces[idx] != piece or colors[idx] != color:
+                    self._set_square(idx, piece, color)
+        else:
+            for idx, piece, color, old_piece, old_color in zip(squares, state.pieces, state.colors, pieces, colors):
+                if old_piece != piece or old_color != color:
+                    self._set_square(idx, piece, color)
+
+        self.player_turn = state.player_turn
+        self.move_nr = state.move_nr
+        self.half_moves_50_check = state.half_moves_50_check
+        self.checkmated_color = state.checkmated_color
+        move_gen = self.MoveGen
+        move_gen.king_moved[:] = state.king_moved
+        move_gen.rook_moved_l_s[0][:] = state.rook_moved_l_s[0]
+        move_gen.rook_moved_l_s[1][:] = state.rook_moved_l_s[1]
+        for piece in range(1, 7):
+            self.piece_counts[piece][:] = state.piece_counts[piece - 1]
+        self.hash_key = state.hash_key
+        if not own:
+            # new move history: pieces moved before the snapshot get move nr -1, which no unmove resets
+            move_gen.king_moved[:] = [-1 if moved else 0 for moved in state.king_moved]
+            for color in range(2):
+                move_gen.rook_moved_l_s[color][:] = [-1 if moved else 0 for moved in state.rook_moved_l_s[color]]
+            move_gen.allow_castling = [[True, True], [True, True]]
+            move_gen.allow_castling_king = True
+        if self.debug_hash:
+            self.check_hash()
+
+    def calc_attacks(self, silent=False, color=None):
+        """Calculate attacks, pins, checks and legal moves into the MoveGen states.
+
+        Args:
+            silent (bool, optional): suppress sounds. Defaults to False.
+            color (int, optional): only generate legal moves of this color, opponent pieces are then only
+                scanned for the attacks, pins and checks legality needs. Defaults to None (both colors).
+        """
+        if self.move_gen == "bitboard":
+            move_possible = self.MoveGen.generate_legal_moves(self._last_moves[-1], self.player_turn, color)
+            self.analyse_checkmate(move_possible, silent)
+            return
         for i, true_val in enumerate([True, False]):
             move_possible = [False, False]
-            self._attack_map = np.zeros(64)
+            self._attack_map = [0]*64
             self.MoveGen.reset_board_states(true_val)
-            for idx in range(self._board_dim**2):
-                piece_color = self._colors[idx]
-                if self._pieces[idx] > 0:
-                    legal_moves = self.select_piece(idx)
-                    move_possible[piece_color] |= (len(legal_moves) > 0)
+            scan_colors = [0, 1]
+            if color != None:
+                # side to move only: attack pass over opponent pieces, legal move pass over own pieces
+                scan_colors = [get_opponent_color(color) if true_val else color]
+            for piece_color in scan_colors:
+                for squares in self.piece_squares[piece_color]:
+                    for idx in squares:
+                        legal_moves = self.select_piece(idx)
+                        move_possible[piece_color] |= (len(legal_moves) > 0)
             if i == 1:
                 self.analyse_checkmate(move_possible, silent)
 
-    def generate_legal_moves(self, color=None, silent=False):
-        self.calc_attacks(silent=silent)
+    def generate_legal_moves(self, color=None, silent=False, mobility=True):
+        """Legal moves per origin square, counts the moves per color into nr_allowed_moves.
+
+        Args:
+            color (int, optional): if set only the moves of the player to move are returned. Defaults to None.
+            silent (bool, optional): suppress sounds. Defaults to False.
+            mobility (bool, optional): with color set, still generate the opponent moves for its mobility count.
+                Defaults to True.
+
+        Returns:
+            dict: origin index -> set of moves
+        """
+        side_to_move_only = color != None and not mobility
+        self.calc_attacks(silent=silent, color=self.player_turn if side_to_move_only else None)
         self.nr_allowed_moves = [0, 0]
-        for key in list(self.MoveGen.allowed_moves_piece.keys()).copy():
+        for key in list(self.MoveGen.allowed_moves_piece.keys()):
+            key_color = self._colors[key]
+            self.nr_allowed_moves[key_color] += len(self.MoveGen.allowed_moves_piece[key])
             # check if move is players turn
-            if self.player_turn != self._colors[key] and color != None:
-                self.nr_allowed_moves[self._colors[key]] += 1
+            if self.player_turn != key_color and color != None:
                 del self.MoveGen.allowed_moves_piece[key]
-            else:
-                self.nr_allowed_moves[self.player_turn] += 1
-        
+
         return self.MoveGen.allowed_moves_piece
 
+    def move_list(self, ply):
+        """Reusable preallocated move list of a search ply."""
+        while len(self._move_lists) <= ply:
+            self._move_lists.append(array("H", bytes(2*MAX_MOVES)))
+        return self._move_lists[ply]
+
+    def generate_move_list(self, ply=0, silent=True, mobility=None):
+        """Legal moves of the player to move as packed 16 bit moves (see misc.encode_move).
+
+        Args:
+            ply (int, optional): search ply whose reusable move list is filled. Defaults to 0.
+            silent (bool, optional): suppress sounds. Defaults to True.
+            mobility (bool, optional): also count the opponent moves for the eval mobility term.
+                Defaults to None (eval_mobility).
+
+        Returns:
+            Tuple[array, int]: move list, number of valid moves in it
+        """
+        if mobility is None:
+            mobility = self.eval_mobility
+        move_list = self.move_list(ply)
+        if self.pseudo_legal:
+            return move_list, self.generate_pseudo_move_list(move_list, mobility)
+        if self.move_gen == "bitboard":
+            nr_moves, checkers = self.MoveGen.generate_packed(self.player_turn, self._last_moves[-1], move_list)
+            self.MoveGen.checks = set(iter_bits(checkers))
+            move_possible = [True, True]
+            move_possible[self.player_turn] = nr_moves > 0
+            self.analyse_checkmate(move_possible, silent)
+            self.nr_allowed_moves = [0, 0]
+            self.nr_allowed_moves[self.player_turn] = nr_moves
+            if mobility:
+                self.nr_allowed_moves[get_opponent_color(self.player_turn)] = self.count_opponent_moves()
+            return move_list, nr_moves
+        legal_moves = self.generate_legal_moves(self.player_turn, silent=silent, mobility=mobility)
+        return move_list, self.pack_moves(legal_moves, move_list)
+
+    def generate_pseudo_move_list(self, move_list, mobility):
+        """Pseudo legal moves of the player to move into move_list, returns the number of moves.
+            Pins and checks are not calculated, so MoveGen.checks and checkmated_color are not updated here.
+        """
+        self.nr_allowed_moves = [0, 0]
+        nr_moves = self.generate_packed_moves(self.player_turn, move_list)
+        self.nr_allowed_moves[self.player_turn] = nr_moves
+        if mobility:
+            self.nr_allowed_moves[get_opponent_color(self.player_turn)] = self.count_opponent_moves()
+        return nr_moves
+
+    def generate_packed_moves(self, color, move_list, stage="all", start=0):
+        """Packed moves of color into move_list from start on, returns the index after the last move.
+            Legal moves with the bitboard MoveGen outside pseudo legal mode, else pseudo legal moves.
+        """
+        if self.move_gen == "bitboard":
+            n, _ = self.MoveGen.generate_packed(color, self._last_moves[-1], move_list, self.pseudo_legal, stage, start)
+            return n
+        return self.MoveGen.generate_pseudo_packed(color, self._pieces, self._colors, self._last_moves[-1],
+                                                   move_list, stage, start, self.piece_squares[color])
+
+    def count_opponent_moves(self):
+        """Number of moves of the opponent of the player to move, for the eval mobility term."""
+        if self.move_gen == "bitboard" and not self.pseudo_legal:
+            return self.MoveGen.count_moves(get_opponent_color(self.player_turn), self._last_moves[-1])
+        return self.generate_packed_moves(get_opponent_color(self.player_turn), self.MoveGen.scratch_moves)
+
+    def generate_staged_moves(self, ply=0, tt_move=-1, killers=(), silent=True, mvv_lva=False, history=None):
+        """Yield the packed moves of the player to move in stages: hash move, captures and promotions,
+            killer moves, quiet moves. A stage is only generated when the search asks for more moves,
+            so a cutoff on the hash move or a capture saves generating the quiet moves.
+            The mailbox MoveGen in legal mode can only generate all moves at once, they are split into the stages.
+
+        Args:
+            ply (int, optional): search ply whose reusable move list is filled. Defaults to 0.
+            tt_move (int, optional): packed hash move, checked before it is yielded. Defaults to -1 (none).
+            killers (tuple, optional): packed killer moves of the ply, yielded if they are quiet moves
+                of this position. Defaults to ().
+            silent (bool, optional): suppress sounds. Defaults to True.
+            mvv_lva (bool, optional): sort the captures and promotions by mvv_lva_score. Defaults to False.
+            history (List[int], optional): history score of the player to move per move & 0xFFF (origin, destination),
+                quiet moves are sorted by it. Defaults to None (generation order).
+
+        Yields:
+            int: packed 16 bit move, to be performed with try_move_piece
+        """
+        if tt_move >= 0 and (self.is_pseudo_legal(tt_move) if self.pseudo_legal else self.is_legal(tt_move)):
+            yield tt_move
+        move_list = self.move_list(ply)
+        nr_captures, nr_moves = self.generate_stage(move_list, "captures", 0, silent)
+        if mvv_lva and nr_captures > 1:
+            move_list[:nr_captures] = array("H", sorted(move_list[:nr_captures], key=self.mvv_lva_score, reverse=True))
+        for i in range(nr_captures):
+            if move_list[i] != tt_move:
+                yield move_list[i]
+        if nr_moves is None:
+            nr_moves, _ = self.generate_stage(move_list, "quiets", nr_captures, silent)
+            self.nr_allowed_moves = [0, 0]
+            self.nr_allowed_moves[self.player_turn] = nr_moves
+            if self.eval_mobility:
+                self.nr_allowed_moves[get_opponent_color(self.player_turn)] = self.count_opponent_moves()
+        quiets = move_list[nr_captures:nr_moves]
+        for killer in killers:
+            if killer != tt_move and killer in quiets:
+                yield killer
+        if history is not None:
+            quiets = sorted(quiets, key=lambda move: history[move & 0xFFF], reverse=True)
+        for move in quiets:
+            if move != tt_move and move not in killers:
+                yield move
+
+    def generate_capture_moves(self, ply=0, silent=True):
+        """Captures and promotions of the player to move by mvv_lva_score, e.g. for the quiescence search.
+
+        Args:
+            ply (int, optional): search ply whose reusable move list is filled. Defaults to 0.
+            silent (bool, optional): suppress sounds. Defaults to True.
+
+        Returns:
+            List[int]: packed moves (pseudo legal in pseudo legal mode), to be performed with try_move_piece
+        """
+        move_list = self.move_list(ply)
+        nr_captures, _ = self.generate_stage(move_list, "captures", 0, silent)
+        return sorted(move_list[:nr_captures], key=self.mvv_lva_score, reverse=True)
+
+    def mvv_lva_score(self, move):
+        """Order score of a capture or promotion: most valuable victim first, then least valuable attacker,
+            promotions count the promoted piece as extra victim (piece_values)."""
+        score = 0
+        if move & 0x4000:  # capture, en passant captures a pawn on an empty destination
+            victim = self._pieces[move & 63]
+            score = 16*_ORDER_VALUES[victim if victim > 0 else 1] - _ORDER_VALUES[self._pieces[(move >> 6) & 63]]
+        if move & 0x8000:
+            score += 16*_ORDER_VALUES[move_promo_to_piece[move >> 12]]
+        return score
+
+    def generate_stage(self, move_list, stage, start, silent=True):
+        """Write the moves of a stage ("captures" or "quiets") of the player to move into move_list from start on.
+
+        Returns:
+            Tuple[int, int]: index after the last move of the stage, index after all moves if the quiet moves
+                were generated along with the captures else None
+        """
+        color = self.player_turn
+        if self.pseudo_legal:
+            return self.generate_packed_moves(color, move_list, stage, start), None
+        if self.move_gen == "bitboard":
+            n, checkers = self.MoveGen.generate_packed(color, self._last_moves[-1], move_list, False, stage, start)
+            if stage == "captures":
+                self.MoveGen.checks = set(iter_bits(checkers))
+            else:
+                move_possible = [True, True]
+                move_possible[color] = n > 0
+                self.analyse_checkmate(move_possible, silent)
+            return n, None
+        legal_moves = self.generate_legal_moves(color, silent=silent, mobility=self.eval_mobility)
+        nr_moves = self.pack_moves(legal_moves, move_list)
+        captures = [move for move in move_list[:nr_moves] if move & 0xC000]
+        quiets = [move for move in move_list[:nr_moves] if not move & 0xC000]
+        move_list[:nr_moves] = array("H", captures + quiets)
+        return len(captures), nr_moves
+
+    def is_pseudo_legal(self, move):
+        """Check a packed move, e.g. a hash or killer move from another position, is pseudo legal
+            for the player to move without generating the moves of the position."""
+        orig, dest, move_type = decode_move(move)
+        color = self.player_turn
+        piece = self._pieces[orig]
+        if orig == dest or move_type not in move_desc or self._colors[orig] != color or self._colors[dest] == color:
+            return False
+        is_capture = self._colors[dest] == get_opponent_color(color)
+        is_castling = move_type in (move_types["castle_king"], move_types["castle_queen"])
+        if piece == piece_str_to_type["Pawn"]:
+            if is_castling:
+                return False
+            forward = self.MoveGen.pawn_moves[color][0]
+            last_row = self.MoveGen.last_rows[color]
+            if bool(move_type & 0b1000) != (last_row[0] <= dest <= last_row[1]):
+                return False
+            if move_type == move_types["ep_capture"]:
+                last_orig, last_dest, _, _, _ = self._last_moves[-1]
+                return (self._pieces[last_dest] == 1 and abs(last_dest - last_orig) == 16 and
+                        dest == (last_orig + last_dest) // 2 and dest in PAWN_ATTACKS[color][orig])
+            if bool(move_type & 0b0100) != is_capture:
+                return False
+            if is_capture:
+                return dest in PAWN_ATTACKS[color][orig]
+            if move_type == move_types["pawn_double"]:
+                first_row = self.MoveGen.first_rows[color]
+                return (first_row[0] <= orig <= first_row[1] and dest == orig + 2*forward and
+                        self._pieces[orig + forward] < 0)
+            return dest == orig + forward
+        if move_type & 0b1000 or move_type in (move_types["pawn_double"], move_types["ep_capture"]):
+            return False
+        if is_castling:
+            nr_moves = self.MoveGen.castling_packed(color, orig, self._pieces, self._colors, self.MoveGen.scratch_moves, 0)
+            return piece == piece_str_to_type["King"] and move in self.MoveGen.scratch_moves[:nr_moves]
+        if bool(move_type & 0b0100) != is_capture:
+            return False
+        for ray in PIECE_RAYS[piece][orig]:
+            for idx in ray:
+                if idx == dest:
+                    return True
+                if self._pieces[idx] > 0:
+                    break
+        return False
+
+    def is_legal(self, move):
+        """Check a packed move from another position is legal for the player to move, see is_pseudo_legal."""
+        if not self.is_pseudo_legal(move):
+            return False
+        self.make_move(move, silent=True)
+        legal = not self.is_king_attacked(get_opponent_color(self.player_turn))
+        self.unmove_piece()
+        return legal
+
+    def try_move_piece(self, move, silent=True):
+        """Perform a packed move of generate_move_list, in pseudo legal mode the legality is checked here.
+
+        Args:
+            move (int): packed 16 bit move
+            silent (bool, optional): suppress sounds. Defaults to True.
+
+        Returns:
+            bool: move was performed, False if it left the own king attacked and was taken back
+        """
+        self.make_move(move, silent=silent)
+        if self.pseudo_legal and self.is_king_attacked(get_opponent_color(self.player_turn)):
+            self.unmove_piece()
+            return False
+        return True
+
+    def is_square_attacked(self, square, by_color):
+        """Check if square is attacked by by_color on the current board, works without calc_attacks."""
+        return self.MoveGen.is_square_attacked(square, by_color, self._pieces, self._colors)
+
+    def attackers_of(self, square, by_color):
+        """Board indices of all pieces of by_color attacking square, works without calc_attacks."""
+        return self.MoveGen.attackers_of(square, by_color, self._pieces, self._colors)
+
+    def is_king_attacked(self, color):
+        if not self.piece_squares[color][piece_str_to_type["King"]]:
+            return False
+        king_sq = next(iter(self.piece_squares[color][piece_str_to_type["King"]]))
+        return self.is_square_attacked(king_sq, get_opponent_color(color))
+
+    def pack_moves(self, legal_moves, move_list):
+        """Write an orig -> moves dict as packed moves into move_list, returns the number of moves."""
+        nr_moves = 0
+        for orig, all_dest in legal_moves.items():
+            for move in all_dest:
+                if type(move) == tuple:
+                    dest, move_type = move
+                else:
+                    dest, move_type = move, self.get_move_type(orig, move)
+                move_list[nr_moves] = encode_move(orig, dest, move_type)
+                nr_moves += 1
+        return nr_moves
+
+    def get_move_type(self, orig, dest):
+        """Move type code (see misc.move_desc) of a non promotion move on the current board."""
+        piece = self._pieces[orig]
+        if self._pieces[dest] > 0:
+            return move_types["capture"]
+        if piece == piece_str_to_type["Pawn"]:
+            if abs(dest - orig) == 16:
+                return move_types["pawn_double"]
+            if abs(dest - orig) != 8:
+                return move_types["ep_capture"]
+        elif piece == piece_str_to_type["King"]:
+            color = self._colors[orig]
+            if orig == self.MoveGen.king_idx[color] and dest in self.MoveGen.castle_idx_l_s[color]:
+                return move_types["castle_king"] if dest > orig else move_types["castle_queen"]
+        return move_types["quiet"]
+
     def analyse_checkmate(self, move_possible, silent):
         if len(self.MoveGen.checks) > 0 and not move_possible[self.player_turn]:
             # no legal moves for player that got checked left --> MATE
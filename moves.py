@@ -1,9 +1,63 @@
-import numpy as np
-import numpy.typing as npt
-from typing import Tuple, Dict
+from typing import Tuple, Dict, TYPE_CHECKING
 from misc import *
 from collections import defaultdict
-
+from array import array
+if TYPE_CHECKING:
+    import numpy.typing as npt  # annotations only, board arrays need not be numpy (see misc.board_array)
+
+MAILBOX = [-1, -1, -1, -1, -1, -1, -1, -1, -1, -1,
+           -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,
+           -1,  0,  1,  2,  3,  4,  5,  6,  7, -1,
+           -1,  8,  9, 10, 11, 12, 13, 14, 15, -1,
+           -1, 16, 17, 18, 19, 20, 21, 22, 23, -1,
+           -1, 24, 25, 26, 27, 28, 29, 30, 31, -1,
+           -1, 32, 33, 34, 35, 36, 37, 38, 39, -1,
+           -1, 40, 41, 42, 43, 44, 45, 46, 47, -1,
+           -1, 48, 49, 50, 51, 52, 53, 54, 55, -1,
+           -1, 56, 57, 58, 59, 60, 61, 62, 63, -1,
+           -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,
+           -1, -1, -1, -1, -1, -1, -1, -1, -1, -1]
+MAILBOX64 = [21, 22, 23, 24, 25, 26, 27, 28,
+             31, 32, 33, 34, 35, 36, 37, 38,
+             41, 42, 43, 44, 45, 46, 47, 48,
+             51, 52, 53, 54, 55, 56, 57, 58,
+             61, 62, 63, 64, 65, 66, 67, 68,
+             71, 72, 73, 74, 75, 76, 77, 78,
+             81, 82, 83, 84, 85, 86, 87, 88,
+             91, 92, 93, 94, 95, 96, 97, 98]
+
+
+def _mailbox_ray(sq, offset, slide):
+    ray = []
+    idx = MAILBOX[MAILBOX64[sq] + offset]
+    while idx != -1:
+        ray.append(idx)
+        if not slide:
+            break
+        idx = MAILBOX[MAILBOX64[idx] + offset]
+    return tuple(ray)
+
+
+KNIGHT_OFFSETS = (-21, -19, -12, -8, 8, 12, 19, 21)
+BISHOP_OFFSETS = (-11, -9, 9, 11)
+ROOK_OFFSETS = (-10, -1, 1, 10)
+QUEEN_OFFSETS = (-11, -10, -9, -1, 1, 9, 10, 11)
+
+# Precomputed once at import: per square attack sets and ordered rays (closest square first)
+KNIGHT_ATTACKS = tuple(tuple(idx for offset in KNIGHT_OFFSETS for idx in _mailbox_ray(sq, offset, False)) for sq in range(64))
+KING_ATTACKS = tuple(tuple(idx for offset in QUEEN_OFFSETS for idx in _mailbox_ray(sq, offset, False)) for sq in range(64))
+PAWN_ATTACKS = tuple(tuple(tuple(idx for offset in offsets for idx in _mailbox_ray(sq, offset, False)) for sq in range(64))
+                     for offsets in [(-9, -11), (9, 11)])  # w, b
+RAYS = {offset: tuple(_mailbox_ray(sq, offset, True) for sq in range(64)) for offset in QUEEN_OFFSETS}
+
+# rays to walk per piece type and square, non sliding pieces get single square rays
+PIECE_RAYS = {
+    2: tuple(tuple((idx,) for idx in KNIGHT_ATTACKS[sq]) for sq in range(64)),
+    3: tuple(tuple(RAYS[offset][sq] for offset in BISHOP_OFFSETS if RAYS[offset][sq]) for sq in range(64)),
+    4: tuple(tuple(RAYS[offset][sq] for offset in ROOK_OFFSETS if RAYS[offset][sq]) for sq in range(64)),
+    5: tuple(tuple(RAYS[offset][sq] for offset in QUEEN_OFFSETS if RAYS[offset][sq]) for sq in range(64)),
+    6: tuple(tuple((idx,) for idx in KING_ATTACKS[sq]) for sq in range(64)),
+}
 
 class MoveGen:
     """Handles chess move generation by calculating available moves according to FIDE chess rules.
@@ -20,33 +74,16 @@ class MoveGen:
         #    see what mailbox[60] is. In this case, it's -1, so it's out of
         #    bounds and we can forget it. You can see how mailbox[] is used
         #    in attack() in board.c. */
-        self.mailbox = np.array([-1, -1, -1, -1, -1, -1, -1, -1, -1, -1,
-                                 -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,
-                                 -1,  0,  1,  2,  3,  4,  5,  6,  7, -1,
-                                 -1,  8,  9, 10, 11, 12, 13, 14, 15, -1,
-                                 -1, 16, 17, 18, 19, 20, 21, 22, 23, -1,
-                                 -1, 24, 25, 26, 27, 28, 29, 30, 31, -1,
-                                 -1, 32, 33, 34, 35, 36, 37, 38, 39, -1,
-                                 -1, 40, 41, 42, 43, 44, 45, 46, 47, -1,
-                                 -1, 48, 49, 50, 51, 52, 53, 54, 55, -1,
-                                 -1, 56, 57, 58, 59, 60, 61, 62, 63, -1,
-                                 -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,
-                                 -1, -1, -1, -1, -1, -1, -1, -1, -1, -1])
-        self.mailbox64 = np.array([21, 22, 23, 24, 25, 26, 27, 28,
-                                   31, 32, 33, 34, 35, 36, 37, 38,
-                                   41, 42, 43, 44, 45, 46, 47, 48,
-                                   51, 52, 53, 54, 55, 56, 57, 58,
-                                   61, 62, 63, 64, 65, 66, 67, 68,
-                                   71, 72, 73, 74, 75, 76, 77, 78,
-                                   81, 82, 83, 84, 85, 86, 87, 88,
-                                   91, 92, 93, 94, 95, 96, 97, 98])
+        # plain tuples: indexing them yields Python ints instead of numpy scalars
+        self.mailbox = tuple(MAILBOX)
+        self.mailbox64 = tuple(MAILBOX64)
         self.offsets = {
-            1: [0, np.array([0,   0,  0,  0, 0,  0,  0,  0])],  # Pawn
-            2: [8, np.array([-21, -19, -12, -8, 8, 12, 19, 21])],  # Knight
-            3: [4, np.array([-11,  -9,  9, 11, 0,  0,  0,  0])],  # Bishop
-            4: [4, np.array([-10,  -1,  1, 10, 0,  0,  0,  0])],  # Rook
-            5: [8, np.array([-11, -10, -9, -1, 1,  9, 10, 11])],
-            6: [8, np.array([-11, -10, -9, -1, 1,  9, 10, 11])],
+            1: [0, (0,   0,  0,  0, 0,  0,  0,  0)],  # Pawn
+            2: [8, (-21, -19, -12, -8, 8, 12, 19, 21)],  # Knight
+            3: [4, (-11,  -9,  9, 11, 0,  0,  0,  0)],  # Bishop
+            4: [4, (-10,  -1,  1, 10, 0,  0,  0,  0)],  # Rook
+            5: [8, (-11, -10, -9, -1, 1,  9, 10, 11)],
+            6: [8, (-11, -10, -9, -1, 1,  9, 10, 11)],
         }
         # State if piece is slideable: [Empty, Pawn, Knight, Bishop, Rook, Queen, King]
         self.slide = [False, False, False, True, True, True, False]
@@ -65,11 +102,10 @@ class MoveGen:
         self.allow_castling = [[True, True], [True, True]]
         self.allow_castling_king = True
 
-        self.king_moved = [0, 0]  # move nr in which king was moved
+        self.king_moved = [0, 0]  # move nr in which king was moved, -1 if moved before the move history
         # move nr in which rook was moved
         self.rook_moved_l_s = [[0, 0], [0, 0]]
-        self.king_rook_l_s = [[np.array([57, 58, 59]), np.array([61, 62])], [
-            np.array([1, 2, 3]), np.array([5, 6])]]
+        self.king_rook_l_s = [[(57, 58, 59), (61, 62)], [(1, 2, 3), (5, 6)]]
         self.rook_idx_l_s = [[56, 63], [0, 7]]
         self.castle_idx_l_s = [[58, 62], [2, 6]]
         self.king_idx = [60, 4]
@@ -84,8 +120,9 @@ class MoveGen:
         # 0: white pins which black pieces, 1: vice versa
         self.pins = [set(), set()]
         self.checks = set()
+        self.scratch_moves = array("H", bytes(2*MAX_MOVES))  # move list for counts only, e.g. opponent mobility
 
-    def check_en_passant(self, pieces: npt.ArrayLike, colors: npt.ArrayLike, last_move: tuple):
+    def check_en_passant(self, pieces: "npt.ArrayLike", colors: "npt.ArrayLike", last_move: tuple):
         """_summary_
 
         Args:
@@ -119,7 +156,7 @@ class MoveGen:
             self.pin_indices = defaultdict(list)
             self.ep_check_indices = defaultdict(list)
 
-    def allowed_moves(self, orig: int, piece: int, pieces: npt.ArrayLike, colors: npt.ArrayLike, last_move: tuple, player_turn=None) -> Tuple[set, set]:
+    def allowed_moves(self, orig: int, piece: int, pieces: "npt.ArrayLike", colors: "npt.ArrayLike", last_move: tuple, player_turn=None) -> Tuple[set, set]:
         """Function to calculate all possible moves for piece defined as input.
             All checks are performed in this function to evaluate: pins, checks, protected squares etc.
 
@@ -148,8 +185,8 @@ class MoveGen:
             return
 
         if piece != 1:  # no pawn
-            for i in range(self.offsets[piece][0]):
-                idx = orig
+            for ray in PIECE_RAYS[piece][orig]:
+                last_idx = orig
                 expand_piece_cnt = 0
                 expand_piece_idx = None
                 ep_check_piece_idx = None
@@ -157,12 +194,11 @@ class MoveGen:
                 check_in_direction = False
                 all_idx = []
                 last_expand_same_col = False
-                while expanding or check_in_direction:
-                    all_idx.append(idx)
-                    idx = self.mailbox[self.mailbox64[idx] +
-                                       self.offsets[piece][1][i]]
-                    if idx == -1:
+                for idx in ray:
+                    if not expanding and not check_in_direction:
                         break
+                    all_idx.append(last_idx)
+                    last_idx = idx
                     if pieces[idx] >= 0:  # capture moves
                         if piece_color != colors[idx]:  # enemy field capture
                             last_expand_same_col = False
@@ -227,6 +263,9 @@ class MoveGen:
 
                     if not self.slide[piece]:
                         expanding = False
+                else:  # ray walked to the board edge
+                    if expanding or check_in_direction:
+                        all_idx.append(last_idx)
                 if check_in_direction:
                     self.check_indices[all_idx[0]][1] = all_idx
 
@@ -336,8 +375,6 @@ class MoveGen:
         promotion_move = set()
         move_1_fwrd = orig+self.pawn_moves[orig_color][0]
         move_2_fwrd = orig+self.pawn_moves[orig_color][1]
-        move_l_cptr = orig+self.pawn_captures[orig_color][0]
-        move_r_cptr = orig+self.pawn_captures[orig_color][1]
 
         if pieces[move_1_fwrd] < 0:  # check free space
             if self.last_rows[orig_color][0] <= move_1_fwrd <= self.last_rows[orig_color][1]:
@@ -354,59 +391,225 @@ class MoveGen:
         valid_en_passant_indices = set()
         pawn_protected = set()
         self.pawn_capture_indices = set()
-        for move_idx, move_type in zip([0, 1], [move_l_cptr, move_r_cptr]):
-            new_idx = self.mailbox[self.mailbox64[orig] +
-                                   self.pawn_captures64[orig_color][move_idx]]
-            if new_idx > -1:
-                self.protected[orig_color].add(new_idx)
-                # field is enemy field
-                if colors[move_type] == get_opponent_color(orig_color):
-                    if pieces[new_idx] == piece_str_to_type["King"]:  # Pawn checks
-                        self.check_indices[orig] = [orig]
-                        self.checks.add(orig)
-                    else:
-                        # capture promotion
-                        if self.last_rows[orig_color][0] <= move_type <= self.last_rows[orig_color][1]:
-                            promotion_move.update(
-                                self.promotion_moves(move_type, capture=True))
-
-                        capture_moves.add(move_type)
+        for capture_idx in PAWN_ATTACKS[orig_color][orig]:
+            self.protected[orig_color].add(capture_idx)
+            # field is enemy field
+            if colors[capture_idx] == get_opponent_color(orig_color):
+                if pieces[capture_idx] == piece_str_to_type["King"]:  # Pawn checks
+                    self.check_indices[orig] = [orig]
+                    self.checks.add(orig)
                 else:
-                    if en_passant_color is None:
-                        en_passant_indices, en_passant_color = self.check_en_passant(
-                            pieces, colors, last_move)
-                    if en_passant_color == orig_color:
-                        if move_type in en_passant_indices:
-                            # check that ep is pinned -> doesn't cause check
-                            if orig not in self.pins[get_opponent_color(orig_color)] or move_type in self.pin_indices[orig]:
-                                capture_moves.add(move_type)
-                                valid_en_passant_indices.add(move_type)
+                    # capture promotion
+                    if self.last_rows[orig_color][0] <= capture_idx <= self.last_rows[orig_color][1]:
+                        promotion_move.update(
+                            self.promotion_moves(capture_idx, capture=True))
+
+                    capture_moves.add(capture_idx)
+            else:
+                if en_passant_color is None:
+                    en_passant_indices, en_passant_color = self.check_en_passant(
+                        pieces, colors, last_move)
+                if en_passant_color == orig_color:
+                    if capture_idx in en_passant_indices:
+                        # check that ep is pinned -> doesn't cause check
+                        if orig not in self.pins[get_opponent_color(orig_color)] or capture_idx in self.pin_indices[orig]:
+                            capture_moves.add(capture_idx)
+                            valid_en_passant_indices.add(capture_idx)
         return capture_moves, other_moves, promotion_move, valid_en_passant_indices
 
     def check_castling(self, orig, pieces, colors):
         orig_color = colors[orig]
         opponent_color = get_opponent_color(orig_color)
         castle_indices = set()
+        in_check = None
         # king not moved yet
         if not self.king_moved[orig_color] and pieces[self.king_idx[orig_color]] == piece_str_to_type["King"]:
-            if len(self.checks) > 0 and colors[next(iter(self.checks))] == opponent_color:
-                return castle_indices  # if check of same color king is present -> no
             for i in range(2):
                 # check rook exists
                 if pieces[self.rook_idx_l_s[orig_color][i]] == piece_str_to_type["Rook"]:
                     # check rook not moved yet
                     if not self.rook_moved_l_s[orig_color][i]:
-                        nr_pieces_to_rook = len(
-                            self.king_rook_l_s[orig_color][i])
                         # check no pieces in castle corridor
-                        if sum(pieces[self.king_rook_l_s[orig_color][i]]) == -nr_pieces_to_rook:
-                            if all([val not in self.protected[opponent_color] for val in self.king_rook_l_s[orig_color][i][abs(i-1):]]):
+                        if all(pieces[idx] < 0 for idx in self.king_rook_l_s[orig_color][i]):
+                            # attacks are queried directly, the protected sets may be incomplete during the attack pass
+                            if in_check is None:
+                                in_check = self.is_square_attacked(orig, opponent_color, pieces, colors)
+                            if in_check:
+                                return castle_indices  # no castling out of check
+                            if not any(self.is_square_attacked(val, opponent_color, pieces, colors)
+                                       for val in self.king_rook_l_s[orig_color][i][abs(i-1):]):
                                 # castle_indices.add(self.rook_idx_l_s[orig_color][i])
                                 castle_indices.add(
                                     self.castle_idx_l_s[orig_color][i])
 
         return castle_indices
 
+    def is_square_attacked(self, square: int, by_color: int, pieces: "npt.ArrayLike", colors: "npt.ArrayLike") -> bool:
+        """Check if any piece of by_color attacks square, directly from the board without calc_attacks states.
+
+        Args:
+            square (int): board index to check
+            by_color (int): color of the attacking side
+            pieces (npt.ArrayLike): piece formation on board
+            colors (npt.ArrayLike): color formation on board
+
+        Returns:
+            bool: square is attacked
+        """
+        for idx in KNIGHT_ATTACKS[square]:
+            if pieces[idx] == 2 and colors[idx] == by_color:
+                return True
+        # a pawn of by_color attacks square from where a pawn of the other color on square would capture
+        for idx in PAWN_ATTACKS[by_color ^ 1][square]:
+            if pieces[idx] == 1 and colors[idx] == by_color:
+                return True
+        for idx in KING_ATTACKS[square]:
+            if pieces[idx] == 6 and colors[idx] == by_color:
+                return True
+        for offsets, slider in ((ROOK_OFFSETS, 4), (BISHOP_OFFSETS, 3)):
+            for offset in offsets:
+                for idx in RAYS[offset][square]:
+                    if pieces[idx] > 0:
+                        if colors[idx] == by_color and (pieces[idx] == slider or pieces[idx] == 5):
+                            return True
+                        break
+        return False
+
+    def attackers_of(self, square: int, by_color: int, pieces: "npt.ArrayLike", colors: "npt.ArrayLike") -> list:
+        """All pieces of by_color attacking square, worked outward from square without calc_attacks states.
+
+        Args:
+            square (int): board index to check
+            by_color (int): color of the attacking side
+            pieces (npt.ArrayLike): piece formation on board
+            colors (npt.ArrayLike): color formation on board
+
+        Returns:
+            list: board indices of the attacking pieces
+        """
+        attackers = [idx for idx in KNIGHT_ATTACKS[square] if pieces[idx] == 2 and colors[idx] == by_color]
+        attackers += [idx for idx in PAWN_ATTACKS[by_color ^ 1][square] if pieces[idx] == 1 and colors[idx] == by_color]
+        attackers += [idx for idx in KING_ATTACKS[square] if pieces[idx] == 6 and colors[idx] == by_color]
+        for offsets, slider in ((ROOK_OFFSETS, 4), (BISHOP_OFFSETS, 3)):
+            for offset in offsets:
+                for idx in RAYS[offset][square]:
+                    if pieces[idx] > 0:
+                        if colors[idx] == by_color and (pieces[idx] == slider or pieces[idx] == 5):
+                            attackers.append(idx)
+                        break
+        return attackers
+
+    def generate_pseudo_packed(self, color: int, pieces: "npt.ArrayLike", colors: "npt.ArrayLike", last_move: tuple, move_list,
+                               stage="all", start=0, piece_squares=None) -> int:
+        """Write pseudo legal moves of color as packed 16 bit moves (see misc.encode_move) into move_list.
+            No pin or check bookkeeping: moves may leave the own king attacked, see Model.try_move_piece.
+            Castling is fully checked as its squares passed by the king can not be verified after the move.
+
+        Args:
+            color (int): color to generate moves for
+            pieces (npt.ArrayLike): piece formation on board
+            colors (npt.ArrayLike): color formation on board
+            last_move (tuple): last move performed, used for en passant
+            move_list (array): preallocated move list of at least MAX_MOVES entries
+            stage (str, optional): "captures" (captures and promotions), "quiets" (all other moves) or "all".
+                Defaults to "all".
+            start (int, optional): index in move_list to write the first move to. Defaults to 0.
+            piece_squares (list, optional): piece list of color, per piece type the set of its board indices
+                (see Model.piece_squares). Defaults to None (scan the board).
+
+        Returns:
+            int: index after the last move written
+        """
+        captures = stage != "quiets"
+        quiets = stage != "captures"
+        pieces = pieces.tolist()  # plain list indexing is fastest for every board storage
+        colors = colors.tolist()
+        enemy_color = get_opponent_color(color)
+        forward = self.pawn_moves[color][0]
+        promo_row = self.last_rows[color]
+        double_row = self.first_rows[color]
+        ep_orig, ep_dest, _, _, _ = last_move
+        ep_square = None
+        if pieces[ep_dest] == 1 and colors[ep_dest] == enemy_color and abs(ep_dest - ep_orig) == 16:
+            ep_square = (ep_orig + ep_dest) // 2
+        n = start
+        if piece_squares is None:
+            origins = [orig for orig in range(64) if colors[orig] == color]
+        else:
+            origins = [orig for squares in piece_squares for orig in squares]
+        for orig in origins:
+            piece = pieces[orig]
+            base = orig << 6
+            if piece == 1:
+                one = orig + forward
+                if pieces[one] < 0:
+                    if promo_row[0] <= one <= promo_row[1]:
+                        if captures:
+                            for promo_type in range(8, 12):
+                                move_list[n] = (promo_type << 12) | base | one
+                                n += 1
+                    elif quiets:
+                        move_list[n] = base | one
+                        n += 1
+                        two = one + forward
+                        if double_row[0] <= orig <= double_row[1] and pieces[two] < 0:
+                            move_list[n] = 0x1000 | base | two
+                            n += 1
+                if not captures:
+                    continue
+                for dest in PAWN_ATTACKS[color][orig]:
+                    if colors[dest] == enemy_color:
+                        if promo_row[0] <= dest <= promo_row[1]:
+                            for promo_type in range(12, 16):
+                                move_list[n] = (promo_type << 12) | base | dest
+                                n += 1
+                        else:
+                            move_list[n] = 0x4000 | base | dest
+                            n += 1
+                    elif dest == ep_square:
+                        move_list[n] = 0x5000 | base | dest
+                        n += 1
+                continue
+            for ray in PIECE_RAYS[piece][orig]:
+                for dest in ray:
+                    if colors[dest] == color:
+                        break
+                    if colors[dest] == enemy_color:
+                        if captures:
+                            move_list[n] = 0x4000 | base | dest
+                            n += 1
+                        break
+                    if quiets:
+                        move_list[n] = base | dest
+                        n += 1
+            if piece == 6 and quiets:
+                n = self.castling_packed(color, orig, pieces, colors, move_list, n)
+        return n
+
+    def castling_packed(self, color, king_sq, pieces, colors, move_list, n):
+        if self.king_moved[color] or king_sq != self.king_idx[color]:
+            return n
+        enemy_color = get_opponent_color(color)
+        in_check = None
+        for i in range(2):
+            rook_idx = self.rook_idx_l_s[color][i]
+            if self.rook_moved_l_s[color][i] or pieces[rook_idx] != 4 or colors[rook_idx] != color:
+                continue
+            corridor = self.king_rook_l_s[color][i]
+            if any(pieces[idx] > 0 for idx in corridor):
+                continue
+            if in_check is None:
+                in_check = self.is_square_attacked(king_sq, enemy_color, pieces, colors)
+            if in_check:
+                return n
+            # squares passed by the king, the long castle b-file square only needs to be empty
+            if any(self.is_square_attacked(idx, enemy_color, pieces, colors) for idx in corridor[abs(i-1):]):
+                continue
+            move_type = move_types["castle_queen"] if i == 0 else move_types["castle_king"]
+            move_list[n] = (move_type << 12) | (king_sq << 6) | self.castle_idx_l_s[color][i]
+            n += 1
+        return n
+
     # keep track if rook/king moved for casteling
     def set_piece_moved(self, piece, color, board_idx, move_nr):  # 0 long, 1 short
         if piece == piece_str_to_type["King"] and self.king_moved[color] == 0:
@@ -417,6 +620,12 @@ class MoveGen:
             elif board_idx == self.rook_idx_l_s[color][1] and self.rook_moved_l_s[color][1] == 0:
                 self.rook_moved_l_s[color][1] = move_nr
 
+    # undo set_piece_moved of a rook captured on its home square, the king of its color keeps its state
+    def reset_rook_captured(self, color, board_idx, mark):
+        for side in range(2):
+            if board_idx == self.rook_idx_l_s[color][side] and self.rook_moved_l_s[color][side] == mark:
+                self.rook_moved_l_s[color][side] = 0
+
     # reset king/rook moved on undo piece move
     def reset_pieces_moved(self, move_nr, color):
         if self.king_moved[color] == move_nr and self.allow_castling_king:
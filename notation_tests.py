@@ -0,0 +1,114 @@
+# test cases for FEN/EPD and SAN/PGN notation, prints the failing cases and returns their count
+from misc import *
+from model import Model
+from position import SQUARE_NAMES, parse_fen, format_fen
+from epd import parse_epd, format_epd, read_epd
+from pgn import san_to_move, move_to_san, read_pgn, replay_game
+from testcases import fen_testcases, fen_malformed_testcases, epd_testcases, epd_file_testcases, \
+    san_testcases, san_error_testcases, pgn_testcases
+
+
+def fail(name, message):
+    print(f"\t{bcolors.WARNING}{name}: {message}{bcolors.ENDC}")
+    return 1
+
+
+def test_fen():
+    """FEN strings round-trip through parse_fen/format_fen, malformed ones raise a ValueError."""
+    failures = 0
+    for test_idx, fen in enumerate(fen_testcases):
+        formatted = format_fen(parse_fen(fen))
+        if formatted != fen:
+            failures += fail(f"FEN {test_idx}", f"{formatted} != {fen}")
+    for test_idx, fen in enumerate(fen_malformed_testcases):
+        try:
+            parse_fen(fen)
+            failures += fail(f"malformed FEN {test_idx}", f"no ValueError for {fen}")
+        except ValueError:
+            pass
+    return failures
+
+
+def test_epd():
+    """EPD operations are parsed as expected and survive format_epd, read_epd names the malformed line."""
+    failures = 0
+    for test_idx, test in enumerate(epd_testcases):
+        record = parse_epd(test["line"])
+        if record.ops != test["ops"]:
+            failures += fail(f"EPD {test_idx}", f"{record.ops} != {test['ops']}")
+        reparsed = parse_epd(format_epd(record.state, record.ops))
+        if reparsed.ops != record.ops or format_fen(reparsed.state, clocks=False) != format_fen(record.state, clocks=False):
+            failures += fail(f"EPD {test_idx}", f"format_epd does not round-trip {test['line']}")
+    for test_idx, test in enumerate(epd_file_testcases):
+        try:
+            list(read_epd(test["lines"]))
+            failures += fail(f"EPD file {test_idx}", "no ValueError")
+        except ValueError as error:
+            if not str(error).startswith(f"line {test['line_nr']}:"):
+                failures += fail(f"EPD file {test_idx}", f"expected line {test['line_nr']} in: {error}")
+    return failures
+
+
+def coordinate_move(move):
+    """Origin, destination and promotion piece of a packed move, e.g. "b7b8q"."""
+    orig, dest, move_type = decode_move(move)
+    promo = fen_codec_reverse[move_promo_to_piece[move_type]] if move_type & 0b1000 else ""
+    return SQUARE_NAMES[orig] + SQUARE_NAMES[dest] + promo
+
+
+def test_san(move_gen="mailbox"):
+    """san_to_move finds the expected move and move_to_san gives back the SAN, illegal or ambiguous SAN
+        raises a ValueError."""
+    failures = 0
+    for test_idx, test in enumerate(san_testcases):
+        model = Model(None, sounds=False, fen_init=test["fen"], move_gen=move_gen)
+        try:
+            move = san_to_move(model, test["san"])
+        except ValueError as error:
+            failures += fail(f"SAN {test_idx}", error)
+            continue
+        if coordinate_move(move) != test["move"]:
+            failures += fail(f"SAN {test_idx}", f"{test['san']} gives {coordinate_move(move)} not {test['move']}")
+        san = move_to_san(model, move)
+        if san != test["san"]:
+            failures += fail(f"SAN {test_idx}", f"{test['move']} gives {san} not {test['san']}")
+    for test_idx, test in enumerate(san_error_testcases):
+        model = Model(None, sounds=False, fen_init=test["fen"], move_gen=move_gen)
+        try:
+            move = san_to_move(model, test["san"])
+            failures += fail(f"SAN error {test_idx}", f"{test['san']} gives {coordinate_move(move)}")
+        except ValueError:
+            pass
+    return failures
+
+
+def test_pgn(move_gen="mailbox"):
+    """The games of the PGN files replay to the expected final positions, every SAN of the file is the one
+        move_to_san gives."""
+    failures = 0
+    model = Model(None, sounds=False, eval_mobility=False, move_gen=move_gen)
+    for test in pgn_testcases:
+        games = list(read_pgn(test["path"]))
+        if len(games) != len(test["games"]):
+            failures += fail(test["path"], f"{len(games)} games instead of {len(test['games'])}")
+        for game_idx, (game, (plies, fen)) in enumerate(zip(games, test["games"])):
+            name = f"{test['path']} game {game_idx}"
+            nr_moves = 0
+            try:
+                for san, move in replay_game(game, model):
+                    model.unmove_piece()
+                    if move_to_san(model, move) != san.rstrip("!?"):
+                        failures += fail(name, f"{san} is written as {move_to_san(model, move)}")
+                    model.make_move(move, silent=True)
+                    nr_moves += 1
+            except ValueError as error:
+                failures += fail(name, error)
+                continue
+            if nr_moves != plies or model.get_fen_string() != fen:
+                failures += fail(name, f"{nr_moves} plies to {model.get_fen_string()}, expected {plies} to {fen}")
+    return failures
+
+
+if __name__ == "__main__":
+    for name, test_func in (("FEN", test_fen), ("EPD", test_epd), ("SAN", test_san), ("PGN", test_pgn)):
+        print(f"{name}: {test_func()} failures")
@@ -0,0 +1,76 @@
+# fixed-size pawn hash table: caches the pawn structure evaluation by the pawn-only zobrist key (Model.pawn_key)
+
+
+class PawnHashTable:
+    """Fixed number of slots indexed by the low bits of the pawn key.
+
+    Replacement policies:
+        "always": one slot per key, a new entry always overwrites it.
+        "two_way": buckets of two slots, a hit in the second slot moves it to the front and a new entry goes
+            to the front, pushing the older entry into the second slot (least recently used one is replaced).
+    """
+    def __init__(self, nr_entries=2**14, policy="always"):
+        """Empty table with statistics reset.
+
+        Args:
+            nr_entries (int, optional): number of slots, rounded down to a power of two. Defaults to 2**14.
+            policy (str, optional): replacement policy "always" or "two_way". Defaults to "always".
+
+        Raises:
+            ValueError: unknown policy or less than two slots
+        """
+        if policy not in ("always", "two_way"):
+            raise ValueError(f"unknown pawn hash replacement policy: {policy}")
+        if nr_entries < 2:
+            raise ValueError(f"pawn hash table needs at least 2 entries, got {nr_entries}")
+        self.nr_entries = 1 << (nr_entries.bit_length() - 1)
+        self.policy = policy
+        self._mask = self.nr_entries - 1 if policy == "always" else self.nr_entries - 2  # bucket start
+        self.clear()
+
+    def clear(self):
+        """Empty all slots and reset the statistics."""
+        self._keys = [-1]*self.nr_entries  # -1: empty, pawn keys are non negative
+        self._entries = [None]*self.nr_entries
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0  # stores replacing the entry of another pawn key
+
+    def probe(self, key):
+        """Cached entry of a pawn key, None on a miss."""
+        self.probes += 1
+        idx = key & self._mask
+        keys = self._keys
+        if keys[idx] == key:
+            self.hits += 1
+            return self._entries[idx]
+        if self.policy == "two_way" and keys[idx + 1] == key:
+            self.hits += 1
+            entries = self._entries
+            keys[idx], keys[idx + 1] = key, keys[idx]
+            entries[idx], entries[idx + 1] = entries[idx + 1], entries[idx]
+            return entries[idx]
+        return None
+
+    def store(self, key, entry):
+        """Cache the entry of a pawn key according to the replacement policy."""
+        self.stores += 1
+        idx = key & self._mask
+        keys, entries = self._keys, self._entries
+        if self.policy == "two_way" and keys[idx] >= 0:
+            if keys[idx + 1] >= 0:
+                self.overwrites += 1
+            keys[idx + 1], entries[idx + 1] = keys[idx], entries[idx]
+        elif keys[idx] >= 0:
+            self.overwrites += 1
+        keys[idx], entries[idx] = key, entry
+
+    def hit_rate(self):
+        """Share of probes answered from the table."""
+        return self.hits / self.probes if self.probes else 0.0
+
+    def stats(self):
+        """Usage statistics: probes, hits, hit rate, stores, overwrites and the number of filled slots."""
+        return {"probes": self.probes, "hits": self.hits, "hit_rate": self.hit_rate(), "stores": self.stores,
+                "overwrites": self.overwrites, "filled": self.nr_entries - self._keys.count(-1)}
@@ -1,11 +1,10 @@
-# test cases for move generation
-from view import Board
+# test cases for move generation, run "python perft.py hash snapshot" for the headless zobrist key and
+# snapshot/restore checks only
 from model import Model
-import pygame
+import sys
 import time
 from misc import *
-from stockfish import Stockfish
-from testcases import perft_testcases, perft_manual_test
+from testcases import perft_testcases, perft_manual_test, perft_hash_testcases
 
 
 class PerftTest:
@@ -14,22 +13,34 @@ class PerftTest:
     Divide is possible to recurse down the tree of possible moves.
     """
 
-    def __init__(self, draw_board=True):
+    def __init__(self, draw_board=True, move_gen="mailbox", move_list=False, pseudo_legal=False):
         """_summary_
 
         Args:
-            draw_board (bool, optional): Flag to trigger board draw when testing. Defaults to False.
+            draw_board (bool, optional): Flag to trigger board draw when testing, only then pygame is imported
+                and the window opened. Defaults to True.
+            move_gen (str, optional): Move generation backend "mailbox" or "bitboard". Defaults to "mailbox".
+            move_list (bool, optional): Iterate packed 16 bit move lists instead of the legal moves dict. Defaults to False.
+            pseudo_legal (bool, optional): Pseudo legal move lists with legality checked on make, implies move_list.
+                Defaults to False.
         """
+        from stockfish import Stockfish
         self.nodes = 0
         self.last_node_cnt = 0
         self.stockfish = Stockfish(
             path=r"C:\Users\kicke\Downloads\stockfish_15.1_win_x64_avx2\stockfish_15.1_win_x64_avx2\stockfish-windows-2022-x86-64-avx2.exe")
-        self.GameBoard = Board(square_dim=64)
-        self.GameModel = Model(self.GameBoard, sounds=False)
+        self.GameBoard = None
+        if draw_board:
+            # the pygame window is only opened when drawing, else perft runs headless
+            import pygame
+            from view import Board
+            self.GameBoard = Board(square_dim=64)
+            pygame.init()
+        self.GameModel = Model(self.GameBoard, sounds=False, move_gen=move_gen, pseudo_legal=pseudo_legal)
         self.draw_board = draw_board
+        self.move_list = move_list or pseudo_legal
         self.draw_depth_1 = False
         self.current_fen = ""
-        pygame.init()
 
     def test_stockfish(self, fen: str, depth: int):
         """Calculate available moves via Stockfish engine for comparison.
@@ -82,7 +93,8 @@ class PerftTest:
             pass
 
     def draw(self, depth=None, delay=0.001):
-        if self.draw_board or (self.draw_depth_1 and depth == 1):
+        if self.GameBoard is not None and (self.draw_board or (self.draw_depth_1 and depth == 1)):
+            import pygame
             time.sleep(delay)
             self.GameModel.draw()
             pygame.display.update()
@@ -111,51 +123,220 @@ class PerftTest:
             self.draw(depth=1)  # force draw at 1
             pass
 
-        legal_moves = self.GameModel.generate_legal_moves()
-
-        for orig, all_dest in legal_moves.items():
+        if self.move_list:
+            move_list, nr_moves = self.GameModel.generate_move_list(self.current_depth - depth)
+            # packed moves carry their origin, unpack for the division output only
+            moves = [(move, None) for move in move_list[:nr_moves]]
+        else:
+            legal_moves = self.GameModel.generate_legal_moves()
             # check if move is players turn
-            if self.GameModel.player_turn != self.GameModel._colors[orig]:
-                continue
-            for dest in all_dest:
-                len_last_move = len(self.GameModel._last_moves)
+            moves = [(orig, dest) for orig, all_dest in legal_moves.items()
+                     if self.GameModel.player_turn == self.GameModel._colors[orig] for dest in all_dest]
+
+        for orig, dest in moves:
+            len_last_move = len(self.GameModel._last_moves)
+            if dest is None:
+                if not self.GameModel.try_move_piece(orig, silent=False):
+                    continue
+            else:
                 self.GameModel.move_piece(orig, dest)
-                if depth == self.current_depth:
-                    dbg_fen = self.GameModel.get_fen_string()
-                    moves_before_recurse = nodes
-                    pass
-
-                # actual recursive move execution
-                self.draw()
-                nodes += self.perft(depth - 1, nodes)
-                self.GameModel.unmove_piece()
-
-                self.draw()
-
-                # print intermediate division step results
-                if depth == self.current_depth:
-                    if type(dest) == tuple:
-                        dest_idx = dest[0]
-                        dest_promo = str(move_desc[dest[1]])[-1]
-                    else:
-                        dest_idx = dest
-                        dest_promo = ""
-                    o = self.GameModel.board2alphanum(orig)
-                    d = self.GameModel.board2alphanum(dest_idx)
-                    comb_move_str = str(o)+str(d)+dest_promo
-                    res_nodes = nodes-moves_before_recurse
-                    self.res_detailed[comb_move_str] = res_nodes
-                    res_expected = self.result_stockfish[comb_move_str]
-
-                    if print_intermediate:
-                        dbg_print = "" if res_nodes == res_expected else "-> DBG FEN:" + dbg_fen
-                        print(
-                            f"\t {comb_move_str}: {res_nodes} / {res_expected} {dbg_print}")
-
-                    if dbg_down and res_nodes != res_expected:
-                        self.test(dbg_fen, depth-1, name="###DBG DOWN###", nodes_expected=res_expected)
+            if depth == self.current_depth:
+                dbg_fen = self.GameModel.get_fen_string()
+                moves_before_recurse = nodes
+                pass
+
+            # actual recursive move execution
+            self.draw()
+            nodes += self.perft(depth - 1, nodes)
+            self.GameModel.unmove_piece()
+
+            self.draw()
+
+            # print intermediate division step results
+            if depth == self.current_depth:
+                if dest is None:
+                    orig, dest_idx, move_type = decode_move(orig)
+                    dest_promo = str(move_desc[move_type])[-1] if move_type & 0b1000 else ""
+                elif type(dest) == tuple:
+                    dest_idx = dest[0]
+                    dest_promo = str(move_desc[dest[1]])[-1]
+                else:
+                    dest_idx = dest
+                    dest_promo = ""
+                o = self.GameModel.board2alphanum(orig)
+                d = self.GameModel.board2alphanum(dest_idx)
+                comb_move_str = str(o)+str(d)+dest_promo
+                res_nodes = nodes-moves_before_recurse
+                self.res_detailed[comb_move_str] = res_nodes
+                res_expected = self.result_stockfish[comb_move_str]
+
+                if print_intermediate:
+                    dbg_print = "" if res_nodes == res_expected else "-> DBG FEN:" + dbg_fen
+                    print(
+                        f"\t {comb_move_str}: {res_nodes} / {res_expected} {dbg_print}")
+
+                if dbg_down and res_nodes != res_expected:
+                    self.test(dbg_fen, depth-1, name="###DBG DOWN###", nodes_expected=res_expected)
         return nodes
 
 
-MoveGenTests = PerftTest()
-MoveGenTests.test_all()
+def check_castling_rights(model: Model, rights: int, orig: int, dest: int):
+    """A move adds no castling right and keeps none of a king or rook leaving its home square or of a rook
+        captured on it. The keys themselves cannot show a right left behind, they follow the same rights."""
+    move_gen = model.MoveGen
+    piece, color = model._pieces[dest], model._colors[dest]
+    _, _, _, captured, captured_color = model._last_moves[-1]
+    for side in range(2):
+        if orig == move_gen.king_idx[color] and piece == 6 or orig == move_gen.rook_idx_l_s[color][side] and piece == 4:
+            rights &= ~(1 << (2*color + side))
+        if captured == 4 and dest == move_gen.rook_idx_l_s[captured_color][side]:
+            rights &= ~(1 << (2*captured_color + side))
+    assert model.castling_rights() & ~rights == 0, \
+        f"castling rights {model.castling_rights()} instead of {rights} after {model._last_moves[-1]}: " \
+        f"{model.get_fen_string()}"
+
+
+def hash_perft(model: Model, depth: int):
+    """Perft node count of a model with debug_hash, every move and unmove checks the zobrist keys and every move
+        the castling rights."""
+    if depth == 0:
+        return 1
+    nodes = 0
+    rights = model.castling_rights()
+    legal_moves = model.generate_legal_moves()
+    for orig, all_dest in list(legal_moves.items()):
+        if model.player_turn != model._colors[orig]:
+            continue
+        for dest in all_dest:
+            model.move_piece(orig, dest, silent=True)
+            check_castling_rights(model, rights, orig, dest[0] if type(dest) == tuple else dest)
+            nodes += hash_perft(model, depth - 1)
+            model.unmove_piece()
+    return nodes
+
+
+def test_hash(max_nodes=200000, move_gen="mailbox"):
+    """Zobrist key check over the perft test cases up to max_nodes expected nodes: the incremental hash and pawn
+        keys must match a recomputation after every move and unmove, no move may keep a castling right it takes
+        away (see check_castling_rights) and the root key and FEN must be restored. Works without Stockfish and
+        pygame.
+
+    Returns:
+        int: number of failing test cases
+    """
+    failures = 0
+    for test_idx, test in enumerate(perft_testcases + perft_hash_testcases):
+        if test["nodes"] > max_nodes:
+            continue
+        model = Model(None, sounds=False, fen_init=test["fen"], move_gen=move_gen, debug_hash=True)
+        hash_key, fen = model.hash_key, model.get_fen_string()
+        error = ""
+        try:
+            nodes = hash_perft(model, test["depth"])
+            if nodes != test["nodes"]:
+                error = f"{nodes}/{test['nodes']} nodes"
+            elif model.hash_key != hash_key or model.get_fen_string() != fen:
+                error = f"root not restored: {model.get_fen_string()}"
+        except AssertionError as drift:
+            error = str(drift)
+        if error:
+            failures += 1
+            print(f"\t{bcolors.WARNING}HASH TC {test_idx}: {error}{bcolors.ENDC}")
+    return failures
+
+
+def snapshot_perft(model: Model, depth: int):
+    """Perft node count taking moves back by restoring a snapshot, each restore has to give back the FEN and
+        zobrist key of the snapshot position."""
+    if depth == 0:
+        return 1
+    nodes = 0
+    state = model.snapshot()
+    fen, hash_key = model.get_fen_string(), model.hash_key
+    move_list, nr_moves = model.generate_move_list(depth)
+    for move in list(move_list[:nr_moves]):
+        if not model.try_move_piece(move):
+            continue
+        nodes += snapshot_perft(model, depth - 1)
+        model.restore(state)
+        assert model.get_fen_string() == fen and model.hash_key == hash_key, \
+            f"restore after {decode_move(move)} gives {model.get_fen_string()} instead of {fen}"
+    return nodes
+
+
+def check_restore(model: Model, state, fen, hash_key, name):
+    """Restore state into model and compare FEN and zobrist key, returns the number of failures (0 or 1)."""
+    model.restore(state)
+    if model.get_fen_string() == fen and model.hash_key == hash_key:
+        return 0
+    print(f"\t{bcolors.WARNING}SNAPSHOT {name}: {model.get_fen_string()} instead of {fen}{bcolors.ENDC}")
+    return 1
+
+
+def test_snapshot(max_nodes=50000, move_gen="mailbox"):
+    """Snapshot -> moves -> restore round trips: copy-make perft over the perft test cases up to max_nodes
+        expected nodes, restores into another Model and restores after the move history of the snapshot was
+        replaced (set_fen_string) or taken back and made differently (incl. null moves). Works without Stockfish
+        and pygame.
+
+    Returns:
+        int: number of failures
+    """
+    failures = 0
+    for test_idx, test in enumerate(perft_testcases + perft_hash_testcases):
+        if test["nodes"] > max_nodes:
+            continue
+        model = Model(None, sounds=False, fen_init=test["fen"], move_gen=move_gen, debug_hash=True)
+        try:
+            nodes = snapshot_perft(model, test["depth"])
+            if nodes != test["nodes"]:
+                failures += 1
+                print(f"\t{bcolors.WARNING}SNAPSHOT TC {test_idx}: {nodes}/{test['nodes']} nodes{bcolors.ENDC}")
+        except AssertionError as error:
+            failures += 1
+            print(f"\t{bcolors.WARNING}SNAPSHOT TC {test_idx}: {error}{bcolors.ENDC}")
+
+    model = Model(None, sounds=False, move_gen=move_gen)
+    moves = [encode_move(52, 36, move_types["pawn_double"]), encode_move(12, 28, move_types["pawn_double"]),
+             encode_move(62, 45, move_types["quiet"]), encode_move(1, 18, move_types["quiet"])]  # e4 e5 Nf3 Nc6
+    for move in moves[:2]:
+        model.make_move(move, silent=True)
+    state, fen, hash_key = model.snapshot(), model.get_fen_string(), model.hash_key
+    for move in moves[2:]:
+        model.make_move(move, silent=True)
+    failures += check_restore(Model(None, sounds=False, move_gen=move_gen), state, fen, hash_key, "other Model")
+    failures += check_restore(model, state, fen, hash_key, "own moves")
+    # replaced move history: the snapshot position has to be restored completely
+    for snapshot_fen in [None, perft_testcases[2]["fen"]]:
+        if snapshot_fen is not None:
+            model.set_fen_string(snapshot_fen)
+            state, fen, hash_key = model.snapshot(), model.get_fen_string(), model.hash_key
+        model.set_fen_string(perft_testcases[1]["fen"])
+        model.make_move(model.generate_move_list(0)[0][0], silent=True)
+        failures += check_restore(model, state, fen, hash_key, "after set_fen_string")
+    # null move at the end of the snapshot history, taken back and made again after a different move
+    model = Model(None, sounds=False, move_gen=move_gen)
+    for move in moves[:3]:
+        model.make_move(move, silent=True)
+    model.move_null()
+    state, fen, hash_key = model.snapshot(), model.get_fen_string(), model.hash_key
+    model.unmove_null()
+    model.unmove_piece()
+    model.make_move(encode_move(57, 42, move_types["quiet"]), silent=True)  # Nc3 instead of Nf3
+    model.move_null()
+    model.make_move(encode_move(51, 43, move_types["quiet"]), silent=True)  # d3
+    failures += check_restore(model, state, fen, hash_key, "after a different null move history")
+    return failures
+
+
+if __name__ == "__main__":
+    checks = {"hash": test_hash, "snapshot": test_snapshot}
+    if sys.argv[1:] and all(arg in checks for arg in sys.argv[1:]):
+        failures = 0
+        for arg in sys.argv[1:]:
+            for move_gen in ["mailbox", "bitboard"]:
+                failures += checks[arg](move_gen=move_gen)
+            print(f"{arg}: {failures} failures")
+        sys.exit(1 if failures else 0)
+    MoveGenTests = PerftTest()
+    MoveGenTests.test_all()
@@ -0,0 +1,203 @@
+# streaming PGN reader and SAN move conversion on top of the packed move generation of Model
+import re
+from array import array
+from typing import NamedTuple, Dict, List, Iterator
+from misc import *
+from position import SQUARE_NAMES, SQUARE_INDEX
+
+_HEADER = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# movetext tokens: comments, variation brackets, NAGs and everything else separated by whitespace
+_TOKEN = re.compile(r"\{[^}]*\}|;[^\n]*|\$\d+|[()]|[^\s{}();]+")
+_MOVE_NR = re.compile(r"\d+\.*")
+_RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+_SAN = re.compile(r"([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?")
+_CASTLING_SAN = {"O-O": move_types["castle_king"], "O-O-O": move_types["castle_queen"],
+                 "0-0": move_types["castle_king"], "0-0-0": move_types["castle_queen"]}
+_candidates = array("H", bytes(2*MAX_MOVES))  # move buffer of the SAN conversions
+
+
+class PgnGame(NamedTuple):
+    """Tag pairs and main line of one PGN game, variations and comments are dropped."""
+    headers: Dict[str, str]
+    moves: List[str]  # SAN moves of the main line
+    result: str
+
+
+def parse_movetext(movetext):
+    """Main line SAN moves and result of PGN movetext (comments, NAGs and variations skipped).
+
+    Returns:
+        Tuple[List[str], str]: SAN moves, game termination marker ("*" if missing)
+    """
+    moves, result, depth = [], "*", 0
+    for token in _TOKEN.findall(movetext):
+        first = token[0]
+        if first == "(":
+            depth += 1
+        elif first == ")":
+            depth -= 1
+        elif depth or first in "{;$":
+            continue
+        elif token in _RESULTS:
+            result = token
+        else:
+            # move numbers may be glued to the move, e.g. "1.e4" or "12...Nf6"
+            number = _MOVE_NR.match(token)
+            if number and (number.end() == len(token) or token[number.end() - 1] == "."):
+                token = token[number.end():]
+            if token:
+                moves.append(token)
+    return moves, result
+
+
+def read_pgn(source) -> Iterator[PgnGame]:
+    """Lazily yield the games of a PGN file.
+
+    Args:
+        source (str or Iterable[str]): file path or already opened file / iterable of lines
+
+    Yields:
+        PgnGame: tag pairs, main line SAN moves and result per game
+    """
+    if isinstance(source, str):
+        with open(source, encoding="utf-8-sig") as file:
+            yield from read_pgn(file)
+        return
+    headers, movetext = {}, []
+    for line in source:
+        if line.startswith("%"):  # escape mechanism, line is ignored
+            continue
+        stripped = line.strip()
+        header = _HEADER.match(stripped) if stripped.startswith("[") else None
+        if header:
+            if movetext:
+                yield PgnGame(headers, *parse_movetext("\n".join(movetext)))
+                headers, movetext = {}, []
+            headers[header.group(1)] = header.group(2).replace('\\"', '"').replace("\\\\", "\\")
+        elif stripped:
+            movetext.append(stripped)
+    if headers or movetext:
+        yield PgnGame(headers, *parse_movetext("\n".join(movetext)))
+
+
+def san_to_move(model, san):
+    """Packed move of a SAN string for the player to move, resolved with the move generator of model.
+
+    Args:
+        model (Model): position
+        san (str): move in standard algebraic notation, check marks and annotations are ignored
+
+    Raises:
+        ValueError: no legal move or more than one match the SAN
+
+    Returns:
+        int: packed 16 bit move
+    """
+    token = san.rstrip("+#!?")
+    color = model.player_turn
+    nr_moves = model.generate_packed_moves(color, _candidates)
+    matches = []
+    if token in _CASTLING_SAN:
+        castle_type = _CASTLING_SAN[token]
+        matches = [move for move in _candidates[:nr_moves] if move >> 12 == castle_type]
+    else:
+        parsed = _SAN.fullmatch(token)
+        if parsed is None:
+            raise ValueError(f"invalid SAN move: {san}")
+        letter, from_file, from_rank, dest_name, promo = parsed.groups()
+        piece = fen_codec[letter.lower()] if letter else piece_str_to_type["Pawn"]
+        dest = SQUARE_INDEX[dest_name]
+        promo_piece = fen_codec[promo.lower()] if promo else 0
+        pieces = model._pieces
+        for move in _candidates[:nr_moves]:
+            if move & 63 != dest:
+                continue
+            orig, move_type = (move >> 6) & 63, move >> 12
+            if pieces[orig] != piece:
+                continue
+            name = SQUARE_NAMES[orig]
+            if (from_file and name[0] != from_file) or (from_rank and name[1] != from_rank):
+                continue
+            if (move_promo_to_piece[move_type] if move_type & 0b1000 else 0) != promo_piece:
+                continue
+            matches.append(move)
+    # the generated moves may be pseudo legal
+    if len(matches) > 1 or model.pseudo_legal or model.move_gen != "bitboard":
+        matches = [move for move in matches if model.is_legal(move)]
+    if len(matches) != 1:
+        raise ValueError(f"{'ambiguous' if matches else 'illegal'} SAN move {san} in {model.get_fen_string()}")
+    return matches[0]
+
+
+def has_legal_move(model):
+    """Check if the player to move has any legal move."""
+    nr_moves = model.generate_packed_moves(model.player_turn, _candidates)
+    return any(model.is_legal(move) for move in _candidates[:nr_moves])
+
+
+def move_to_san(model, move):
+    """SAN string of a legal packed move of the player to move, with "+"/"#" check marks.
+
+    Args:
+        model (Model): position before the move
+        move (int): packed 16 bit move
+
+    Returns:
+        str: move in standard algebraic notation
+    """
+    orig, dest, move_type = decode_move(move)
+    if move_type == move_types["castle_king"]:
+        san = "O-O"
+    elif move_type == move_types["castle_queen"]:
+        san = "O-O-O"
+    else:
+        piece = model._pieces[orig]
+        capture = "x" if move_type & 0b0100 else ""
+        if piece == piece_str_to_type["Pawn"]:
+            san = (SQUARE_NAMES[orig][0] + capture if capture else "") + SQUARE_NAMES[dest]
+            if move_type & 0b1000:
+                san += "=" + fen_codec_reverse[move_promo_to_piece[move_type]].upper()
+        else:
+            # other legal moves of the same piece type to dest need the origin file, rank or both
+            nr_moves = model.generate_packed_moves(model.player_turn, _candidates)
+            others = [SQUARE_NAMES[(other >> 6) & 63] for other in _candidates[:nr_moves]
+                      if other & 63 == dest and (other >> 6) & 63 != orig and
+                      model._pieces[(other >> 6) & 63] == piece and model.is_legal(other)]
+            name = SQUARE_NAMES[orig]
+            if not others:
+                origin = ""
+            elif all(other[0] != name[0] for other in others):
+                origin = name[0]
+            elif all(other[1] != name[1] for other in others):
+                origin = name[1]
+            else:
+                origin = name
+            san = fen_codec_reverse[piece].upper() + origin + capture + SQUARE_NAMES[dest]
+    model.make_move(move, silent=True)
+    if model.is_king_attacked(model.player_turn):
+        san += "+" if has_legal_move(model) else "#"
+    model.unmove_piece()
+    return san
+
+
+def replay_game(game, model=None):
+    """Replay the main line of a game, yields after every move so the caller can inspect the position.
+
+    Args:
+        game (PgnGame): game of read_pgn, a FEN tag sets the start position
+        model (Model, optional): model to replay on, its position is replaced. Defaults to None (new Model).
+
+    Raises:
+        ValueError: illegal or ambiguous SAN move
+
+    Yields:
+        Tuple[str, int]: SAN and packed move just made on model
+    """
+    if model is None:
+        from model import Model
+        model = Model(None, sounds=False, eval_mobility=False)
+    model.set_fen_string(game.headers.get("FEN", fen_string["start"]))
+    for san in game.moves:
+        move = san_to_move(model, san)
+        model.make_move(move, silent=True)
+        yield san, move
@@ -0,0 +1,163 @@
+# position state of a Model and its fast FEN parse/serialize, see Model.snapshot and Model.restore
+from typing import NamedTuple
+from misc import *
+from zobrist import compute_key
+
+
+class PositionState(NamedTuple):
+    """Immutable copy of the Model state a position needs, see Model.snapshot and Model.restore.
+        Only holds plain ints, tuples and the owner token, so it can be pickled and sent to worker processes
+        (an unpickled token belongs to no Model).
+    """
+    pieces: tuple
+    colors: tuple
+    player_turn: int
+    move_nr: int
+    half_moves_50_check: int
+    checkmated_color: int
+    king_moved: tuple  # MoveGen.king_moved per color
+    rook_moved_l_s: tuple  # MoveGen.rook_moved_l_s per color and side
+    piece_counts: tuple  # per piece type 1..6 the (white, black) count
+    last_move: tuple  # last entry of Model._last_moves, holds the en passant state
+    nr_moves: int  # length of Model._last_moves
+    hash_key: int
+    owner: object  # move history token of the snapshot Model (Model._history_token), None for none
+
+
+SQUARE_NAMES = tuple(file + rank for rank in "87654321" for file in "abcdefgh")  # board index -> "a8".."h1"
+SQUARE_INDEX = {name: idx for idx, name in enumerate(SQUARE_NAMES)}
+
+# FEN placement char <-> (piece, color), "1" is an empty square before the run length encoding
+_FEN_SQUARE = {"1": (-1, -1)}
+for _piece, _letter in fen_codec_reverse.items():
+    _FEN_SQUARE[_letter.upper()] = (_piece, 0)
+    _FEN_SQUARE[_letter] = (_piece, 1)
+_FEN_CHAR = {square: char for char, square in _FEN_SQUARE.items()}
+_FEN_PIECE = {char: square[0] for char, square in _FEN_SQUARE.items()}
+_FEN_COLOR = {char: square[1] for char, square in _FEN_SQUARE.items()}
+_PIECE_LETTERS = tuple(fen_codec_reverse[piece] for piece in range(1, 7))
+# digits expand to runs of empty squares, 8 ranks of 8 squares are 71 chars with the "/" at every 9th
+_EXPAND_EMPTY = str.maketrans({str(run): "1"*run for run in range(2, 9)})
+_EMPTY_RUNS = tuple(("1"*run, str(run)) for run in range(8, 1, -1))
+_CASTLING_CHARS = ((0, 1, "K"), (0, 0, "Q"), (1, 1, "k"), (1, 0, "q"))  # FEN order: color, side (1 short)
+
+
+def castling_mask(king_moved, rook_moved_l_s):
+    """Castling right mask with bit 2*color + side (0 long, 1 short), see Model.castling_rights."""
+    rights = 0
+    for color in range(2):
+        if not king_moved[color]:
+            for side in range(2):
+                if not rook_moved_l_s[color][side]:
+                    rights |= 1 << (2*color + side)
+    return rights
+
+
+def en_passant_file(pieces, colors, player_turn, last_move):
+    """File of the pawn the last move pushed two squares if the player to move has a pawn next to it, else -1.
+
+    Args:
+        pieces (npt.ArrayLike): piece formation on board
+        colors (npt.ArrayLike): color formation on board
+        player_turn (int): color to move
+        last_move (tuple): last entry of Model._last_moves
+
+    Returns:
+        int: file 0..7 or -1
+    """
+    if last_move[2] != move_types["pawn_double"]:
+        return -1
+    dest = last_move[1]
+    col = dest % 8
+    for neighbour, on_board in ((dest - 1, col > 0), (dest + 1, col < 7)):
+        if on_board and pieces[neighbour] == 1 and colors[neighbour] == player_turn:
+            return col
+    return -1
+
+
+def parse_fen(fen):
+    """Parse a FEN string (the first four fields are enough, as in EPD) into a position state.
+        Castling rights are stored as move nr 1 in king_moved/rook_moved_l_s like Model.set_fen_string did,
+        an en passant square as the pawn double push leading to it.
+
+    Args:
+        fen (str): FEN game notation string
+
+    Raises:
+        ValueError: malformed placement, side to move, square or clocks
+
+    Returns:
+        PositionState: position state with an empty move history (no owner)
+    """
+    fields = fen.split()
+    if len(fields) < 4:
+        raise ValueError(f"FEN needs at least 4 fields: {fen}")
+    board = fields[0].translate(_EXPAND_EMPTY)
+    if len(board) != 71 or board[8::9] != "///////":
+        raise ValueError(f"FEN placement is not 8 ranks of 8 squares: {fen}")
+    board = board.replace("/", "")
+    try:
+        pieces, colors = tuple(map(_FEN_PIECE.__getitem__, board)), tuple(map(_FEN_COLOR.__getitem__, board))
+    except KeyError as error:
+        raise ValueError(f"unknown FEN piece {error}: {fen}") from None
+    if fields[1] not in ("w", "b"):
+        raise ValueError(f"FEN side to move must be w or b: {fen}")
+    player_turn = 0 if fields[1] == "w" else 1
+
+    castling = fields[2]
+    rook_moved_l_s = [[1, 1], [1, 1]]
+    for color, side, char in _CASTLING_CHARS:
+        if char in castling:
+            rook_moved_l_s[color][side] = 0
+    rook_moved_l_s = tuple(map(tuple, rook_moved_l_s))
+    king_moved = (1, 1) if castling == "-" else (0, 0)
+
+    last_move = (35, 35, False, -1, -1)
+    if fields[3] != "-":
+        if fields[3] not in SQUARE_INDEX:
+            raise ValueError(f"unknown FEN en passant square: {fen}")
+        # reproduce last move from ep square
+        idx = SQUARE_INDEX[fields[3]]
+        if idx > 32:  # white side ep
+            last_move = (idx + 8, idx - 8, move_types["pawn_double"], -1, -1)
+        else:  # black side ep
+            last_move = (idx - 8, idx + 8, move_types["pawn_double"], -1, -1)
+    try:
+        half_moves = int(fields[4]) if len(fields) > 4 else 0
+        move_nr = int(fields[5]) if len(fields) > 5 else 1
+    except ValueError:
+        raise ValueError(f"FEN clocks must be numbers: {fen}") from None
+
+    piece_counts = tuple((board.count(letter.upper()), board.count(letter)) for letter in _PIECE_LETTERS)
+    hash_key = compute_key(pieces, colors, player_turn, castling_mask(king_moved, rook_moved_l_s),
+                           en_passant_file(pieces, colors, player_turn, last_move))
+    return PositionState(pieces, colors, player_turn, move_nr, half_moves, -1, king_moved, rook_moved_l_s,
+                         piece_counts, last_move, 1, hash_key, None)
+
+
+def format_fen(state, clocks=True):
+    """FEN string of a position state, the en passant square is only written if a pawn can capture there
+        (same rule as the en passant part of the zobrist key).
+
+    Args:
+        state (PositionState): position state
+        clocks (bool, optional): append half move clock and move nr, False gives the four EPD fields.
+            Defaults to True.
+
+    Returns:
+        str: FEN game notation string
+    """
+    board = "".join([_FEN_CHAR[square] for square in zip(state.pieces, state.colors)])
+    placement = "/".join([board[row:row + 8] for row in range(0, 64, 8)])
+    for run, digit in _EMPTY_RUNS:
+        placement = placement.replace(run, digit)
+    rights = castling_mask(state.king_moved, state.rook_moved_l_s)
+    castling = "".join([char for color, side, char in _CASTLING_CHARS if rights >> (2*color + side) & 1]) or "-"
+    ep = "-"
+    if en_passant_file(state.pieces, state.colors, state.player_turn, state.last_move) >= 0:
+        orig, dest = state.last_move[0], state.last_move[1]
+        ep = SQUARE_NAMES[(orig + dest) // 2]
+    fen = f"{placement} {'w' if state.player_turn == 0 else 'b'} {castling} {ep}"
+    if clocks:
+        fen += f" {state.half_moves_50_check} {state.move_nr}"
+    return fen
@@ -1,80 +1,664 @@
-import numpy as np
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Tuple
+from misc import *
+from pgn import move_to_san
+from transposition import TranspositionTable, BOUND_EXACT, BOUND_LOWER, BOUND_UPPER
+from evaluation import MATERIAL_MG, MATERIAL_EG
+
+MAX_SEARCH_DEPTH = 64  # iterative deepening bound when only time or nodes limit the search
+LIMIT_CHECK_NODES = 256  # nodes between clock checks
+MATE_SCORE = 100000  # centipawns of checkmate at the root, a mate in n plies scores MATE_SCORE - n
+NULL_MOVE_MIN_DEPTH = 3  # remaining depth from which null move pruning is tried
+LMR_MIN_DEPTH = 3  # remaining depth from which late quiet moves are reduced
+LMR_FULL_MOVES = 3  # legal moves searched to full depth before reducing
+# material a capture or promotion can win at most per piece type in centipawns, for delta pruning
+_DELTA_VALUES = tuple(max(mg, eg) for mg, eg in zip(MATERIAL_MG, MATERIAL_EG))
+
+
+class IterationStats(NamedTuple):
+    """Result and effort of one completed iteration of the iterative deepening."""
+    depth: int
+    score: float
+    best_move: int  # packed move
+    pv: Tuple[int, ...]  # principal variation as packed moves, starts with best_move
+    nodes: int  # nodes of this iteration (incl. quiescence nodes and aspiration re-searches)
+    seconds: float  # time of this iteration
+
+
+class SearchStats:
+    """Statistics of a TreeSearch search, filled after every iteration (see TreeSearch.on_iteration)."""
+    def __init__(self):
+        self.nodes = 0  # all nodes incl. the quiescence nodes and the ones of an unfinished last iteration
+        self.qnodes = 0  # quiescence search nodes
+        self.cutoffs = 0  # beta cutoffs of the alpha-beta search (without quiescence search)
+        self.first_move_cutoffs = 0  # beta cutoffs by the first searched move
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.seconds = 0.0
+        self.iterations = []  # IterationStats per completed iteration
+
+    def nps(self):
+        """Nodes per second."""
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    def first_move_cutoff_rate(self):
+        """Share of the beta cutoffs caused by the first move, a measure of the move ordering."""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def tt_hit_rate(self):
+        """Share of transposition table probes finding their key."""
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    def branching_factors(self):
+        """Effective branching factor per iteration from depth 2: its nodes over the nodes of the iteration before."""
+        return [iteration.nodes / previous.nodes if previous.nodes else 0.0
+                for previous, iteration in zip(self.iterations, self.iterations[1:])]
+
+    def pv(self):
+        """Principal variation of the last completed iteration as packed moves."""
+        return self.iterations[-1].pv if self.iterations else ()
+
+    def as_dict(self):
+        """All statistics as plain dict, e.g. for logging."""
+        return {"nodes": self.nodes, "qnodes": self.qnodes, "nps": self.nps(), "cutoffs": self.cutoffs,
+                "first_move_cutoff_rate": self.first_move_cutoff_rate(), "tt_probes": self.tt_probes,
+                "tt_hits": self.tt_hits, "tt_hit_rate": self.tt_hit_rate(),
+                "branching_factors": self.branching_factors(), "pv": self.pv(), "seconds": self.seconds,
+                "iterations": [iteration._asdict() for iteration in self.iterations]}
+
+
+# (config, TreeSearch) of a parallel search worker process, kept so its transposition table lasts across searches
+_worker_search = None
+
+
+def search_root_moves(config, state, root_moves, depth, movetime, nodes):
+    """Iterative deepening search of a subset of the root moves in a worker process, see TreeSearch.parallel_search.
+
+    Args:
+        config (Tuple[dict, dict]): Model and TreeSearch keyword arguments of TreeSearch.worker_config
+        state (PositionState): root position
+        root_moves (List[int]): packed root moves to search
+        depth (int): maximum depth
+        movetime (float): time limit in ms, None for none
+        nodes (int): node limit, None for none
+
+    Returns:
+        SearchStats: statistics of the worker search
+    """
+    global _worker_search
+    if _worker_search is None or _worker_search[0] != config:
+        from model import Model
+        model_config, search_config = config
+        _worker_search = (config, TreeSearch(Model(None, sounds=False, **model_config), **search_config))
+    tree_search = _worker_search[1]
+    tree_search.GameModel.restore(state)
+    tree_search.root_moves = set(root_moves)
+    tree_search.iterative_deepening(depth, movetime, nodes)
+    return tree_search.stats
+
 
 class TreeSearch:
-    def __init__(self, model, depth = 4):
+    def __init__(self, model, depth = 4, move_gen=None, mobility=None, pseudo_legal=None, staged=True,
+                 copy_make=False, tt_size_mb=16, movetime=None, nodes=None, ordering=True, quiescence=True,
+                 quiescence_plies=8, delta_margin=200, null_move=True, null_move_reduction=2, lmr=True,
+                 check_extension=True, aspiration=True, aspiration_window=50, workers=1, on_iteration=None):
         self.GameModel = model
-        self.depth = depth
+        self.depth = depth  # depth limit of a search without time or node limit
+        # default limits of search(): time per move in ms and number of nodes, None is unlimited
+        self.movetime = movetime
+        self.max_nodes = nodes
+        self.max_nodes_search = None  # node limit of the running search
+        self.root_depth = depth  # depth of the running iteration
+        self.nodes = 0  # nodes (incl. leaves) of the last search
+        self.completed_depth = 0  # depth of the last completed iteration
+        self.best_score = 0
+        self.stopped = False  # set when a limit is hit, the running iteration unwinds and is discarded
+        self._deadline = None
+        self._next_check = 0
+        self.staged = staged  # alpha-beta iterates staged moves (captures first), else the plain move list
+        self.copy_make = copy_make  # take moves back by restoring a snapshot per node instead of unmove_piece
+        self.best_move = -1  # packed best move of the last search
+        # transposition table of the alpha-beta search, kept across searches (e.g. Controller turns), 0 disables it
+        self.tt_size_mb = tt_size_mb
+        self.tt = TranspositionTable(tt_size_mb) if tt_size_mb else None
+        # move order after the hash move: captures by MVV-LVA, two killer moves per ply, quiet moves by history,
+        # else captures and quiet moves in generation order
+        self.ordering = ordering
+        # quiet moves with a cutoff per ply, check extensions search up to twice the iteration depth
+        self.killers = [[-1, -1] for _ in range(2*MAX_SEARCH_DEPTH + 2)]
+        self.history = [[0]*4096 for _ in range(2)]  # per color and move & 0xFFF: sum of depth^2 of quiet cutoffs
+        # quiescence search of captures and promotions at depth 0 instead of the static evaluation, at most
+        # quiescence_plies deep, captures that cannot raise the score by delta_margin (centipawns) are pruned
+        self.quiescence = quiescence
+        self.quiescence_plies = quiescence_plies
+        self.delta_margin = delta_margin
+        # selectivity of the principal variation search, each switchable to measure its savings:
+        # null move pruning searched null_move_reduction plies shallower, late move reductions of quiet moves,
+        # one ply more when in check and iterations of depth >= 3 started in a window of +-aspiration_window
+        # centipawns around the last score
+        self.null_move = null_move
+        self.null_move_reduction = null_move_reduction
+        self.lmr = lmr
+        self.check_extension = check_extension
+        self.aspiration = aspiration
+        self.aspiration_window = aspiration_window
+        self._centipawn = 1  # centipawns to evaluation units, the shannon evaluation counts in pawns
+        self._mate = MATE_SCORE
+        self._mate_bound = MATE_SCORE // 2  # scores beyond are mate scores
+        self._root_move = -1  # best move of the running root search
+        self.root_moves = None  # set of packed moves the root search is restricted to, None for all
+        self.stats = SearchStats()  # statistics of the last search
+        # called with stats after every completed iteration, e.g. to stream the progress of a search,
+        # the parallel search calls it for all iterations once the workers are done
+        self.on_iteration = on_iteration
+        self.qnodes = 0  # search counters of stats
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        # principal variation per ply (triangular): best line found from the ply in the running search
+        self.pv_table = [()]*(2*MAX_SEARCH_DEPTH + 3)
+        # worker processes of the alpha-beta search, more than one splits the root moves among them,
+        # each worker has a transposition table of tt_size_mb
+        self.workers = workers
+        self._pool = None
+        if move_gen != None:
+            self.GameModel.set_move_gen(move_gen)
+        if mobility != None:
+            # False: only the player to move is generated, eval drops the opponent mobility term
+            self.GameModel.eval_mobility = mobility
+        if pseudo_legal != None:
+            # True: pseudo legal move lists, legality only checked for the moves the search actually makes
+            self.GameModel.pseudo_legal = pseudo_legal
         pass
 
-    def search(self, search_type="alphabeta"):
+    def search(self, search_type="alphabeta", depth=None, movetime=None, nodes=None):
+        """Search the best move of the player to move. Alpha-beta deepens iteratively until a limit is hit,
+            minimax searches the fixed depth.
+
+        Args:
+            search_type (str, optional): "alphabeta" or "minimax". Defaults to "alphabeta".
+            depth (int, optional): maximum depth. Defaults to None (self.depth without time and node limit,
+                else MAX_SEARCH_DEPTH).
+            movetime (float, optional): time limit in ms. Defaults to None (self.movetime).
+            nodes (int, optional): node limit. Defaults to None (self.max_nodes).
+
+        Returns:
+            Tuple[int, Union[int, Tuple[int, int]]]: best move in the format of Model.move_piece_checked
+        """
         if search_type == "minimax":
-            best_score, best_move = self.maxi(self.depth)
+            self.root_depth = self.depth
+            self.set_score_units()
+            best_score, best_move = self.minimax(self.depth)
+        elif search_type == "alphabeta" and self.workers > 1:
+            best_score, best_move = self.parallel_search(depth, movetime, nodes)
         elif search_type == "alphabeta":
-            best_score, best_move = self.alphaMax(-float("inf"), float("inf"), self.depth)
-        return best_move
-    
-    def alphaMax(self, alpha, beta, depth):
-        max_move = (-1, -1)
-        if depth == 0:
-            return self.GameModel.eval_board_shannon(), max_move
-        legal_moves = self.GameModel.generate_legal_moves(self.GameModel.player_turn, silent=True)
-        for orig, all_dest in legal_moves.items():
-            for dest in all_dest:
-                self.GameModel.move_piece(orig, dest, silent=True)
-                score, _ = self.alphaMin(alpha, beta, depth - 1)
-                self.GameModel.unmove_piece()
-                if score >= beta: # score too good -> enemy will never allow this move, return
-                    return beta, max_move
-                if score > alpha: # new best score that is not "too" good
-                    alpha = score # alpha is max
-                    max_move = (orig, dest)
-        return alpha, max_move       
+            best_score, best_move = self.iterative_deepening(depth, movetime, nodes)
+        self.best_score = best_score
+        self.best_move = best_move
+        return self.unpack_move(best_move)
+
+    def set_score_units(self):
+        """Centipawn and mate scores in the units of the evaluation of the model, set before each search."""
+        self._centipawn = 0.01 if self.GameModel.evaluation == "shannon" else 1
+        self._mate = MATE_SCORE*self._centipawn
+        self._mate_bound = self._mate / 2
+
+    def iterative_deepening(self, depth=None, movetime=None, nodes=None):
+        """Alpha-beta searches of depth 1, 2, ... until the depth, time or node limit. A search hitting the time
+            or node limit stops in the middle of the iteration, the result of the last completed iteration counts.
+            Earlier iterations order the moves of later ones through the hash moves of the transposition table
+            (without one the best root move of the last iteration is searched first).
+            Depth 1 is always completed so there is a move.
+
+        Returns:
+            Tuple[float, int]: score and packed best move of the last completed iteration
+        """
+        depth, movetime, max_nodes = self.limits(depth, movetime, nodes)
+        start = time.perf_counter()
+        self._deadline = None if movetime is None else start + movetime / 1000
+        self.max_nodes_search = max_nodes
+        self._next_check = LIMIT_CHECK_NODES if max_nodes is None else min(LIMIT_CHECK_NODES, max_nodes)
+        self.nodes = 0
+        self.qnodes = self.cutoffs = self.first_move_cutoffs = 0
+        self.stopped = False
+        self.completed_depth = 0
+        self.best_move = -1
+        self.stats = stats = SearchStats()
+        if self.tt is not None:
+            tt_probes, tt_hits = self.tt.probes, self.tt.hits
+            self.tt.new_search()
+        self.age_move_order()
+        self.set_score_units()
+        best_score, best_move = 0, -1
+        for iteration in range(1, depth + 1):
+            self.root_depth = iteration
+            iteration_start, iteration_nodes = time.perf_counter(), self.nodes
+            score, move = self.aspiration_search(iteration, best_score)
+            now = time.perf_counter()
+            stats.nodes, stats.qnodes, stats.seconds = self.nodes, self.qnodes, now - start
+            stats.cutoffs, stats.first_move_cutoffs = self.cutoffs, self.first_move_cutoffs
+            if self.tt is not None:
+                stats.tt_probes, stats.tt_hits = self.tt.probes - tt_probes, self.tt.hits - tt_hits
+            if self.stopped:
+                break
+            best_score, best_move = score, move
+            self.best_move = move
+            self.completed_depth = iteration
+            pv = self.pv_table[0] if self.pv_table[0][:1] == (move,) else (move,)
+            stats.iterations.append(IterationStats(iteration, score, move, pv, self.nodes - iteration_nodes,
+                                                   now - iteration_start))
+            if self.on_iteration is not None:
+                self.on_iteration(stats)
+            if self.mate_within(score, iteration):
+                break
+            # an iteration takes longer than all before it, do not start one that cannot finish in time
+            if self._deadline is not None and time.perf_counter() - start > (self._deadline - start) / 2:
+                break
+        self._deadline = None
+        return best_score, best_move
+
+    def mate_within(self, score, depth):
+        """Check if score is a mate in at most depth plies. A search of that depth sees all shorter mates, deeper
+            iterations cannot change it."""
+        return abs(score) > self._mate_bound and round((self._mate - abs(score))/self._centipawn) <= depth
+
+    def limits(self, depth=None, movetime=None, nodes=None):
+        """Depth, time and node limit of a search, the TreeSearch defaults for the ones not given.
+
+        Returns:
+            Tuple[int, float, int]: depth, movetime in ms (None for none) and node limit (None for none)
+        """
+        movetime = self.movetime if movetime is None else movetime
+        max_nodes = self.max_nodes if nodes is None else nodes
+        if depth is None:
+            depth = self.depth if movetime is None and max_nodes is None else MAX_SEARCH_DEPTH
+        return depth, movetime, max_nodes
+
+    def parallel_search(self, depth=None, movetime=None, nodes=None):
+        """Root splitting over worker processes: the legal root moves (in search order) are dealt round robin to
+            the workers, each deepens iteratively on its moves with its own transposition table, all with the
+            full time limit and an equal share of the node limit. The best move is the best one of the deepest
+            iteration all workers completed.
+
+        Returns:
+            Tuple[float, int]: score and packed best move
+        """
+        model = self.GameModel
+        root_moves = [move for move in list(self.moves(0, self.best_move)) if model.is_legal(move)]
+        nr_workers = min(self.workers, len(root_moves))
+        if nr_workers <= 1:
+            return self.iterative_deepening(depth, movetime, nodes)
+        depth, movetime, max_nodes = self.limits(depth, movetime, nodes)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers)
+        config = self.worker_config()
+        state = model.snapshot()
+        worker_nodes = None if max_nodes is None else max(max_nodes // nr_workers, 1)
+        futures = [self._pool.submit(search_root_moves, config, state, root_moves[i::nr_workers], depth, movetime,
+                                     worker_nodes) for i in range(nr_workers)]
+        results = [future.result() for future in futures]
+        # counters add up, the iterations are the best ones of the workers with the nodes of all
+        self.stats = stats = SearchStats()
+        for result in results:
+            stats.nodes += result.nodes
+            stats.qnodes += result.qnodes
+            stats.cutoffs += result.cutoffs
+            stats.first_move_cutoffs += result.first_move_cutoffs
+            stats.tt_probes += result.tt_probes
+            stats.tt_hits += result.tt_hits
+            stats.seconds = max(stats.seconds, result.seconds)
+        self.nodes = stats.nodes
+        # a worker that stopped at a mate within its depth keeps its last iteration for the deeper ones
+        self.set_score_units()
+        final = [self.mate_within(result.iterations[-1].score, result.iterations[-1].depth) for result in results]
+        self.completed_depth = min((len(result.iterations) for result, done in zip(results, final) if not done),
+                                   default=max(len(result.iterations) for result in results))
+        for depth in range(self.completed_depth):
+            iterations = [result.iterations[min(depth, len(result.iterations) - 1)] for result in results]
+            best = max(iterations, key=lambda iteration: iteration.score)
+            stats.iterations.append(best._replace(depth=depth + 1,
+                                                  nodes=sum(iteration.nodes for iteration in iterations),
+                                                  seconds=max(iteration.seconds for iteration in iterations)))
+            if self.on_iteration is not None:
+                self.on_iteration(stats)
+        best = stats.iterations[-1]
+        self.best_move = best.best_move
+        return best.score, best.best_move
+
+    def worker_config(self):
+        """Model and TreeSearch keyword arguments of the parallel search workers, the settings of this search.
+
+        Returns:
+            Tuple[dict, dict]: Model and TreeSearch keyword arguments
+        """
+        model = self.GameModel
+        model_config = {"move_gen": model.move_gen, "eval_mobility": model.eval_mobility,
+                        "pseudo_legal": model.pseudo_legal, "board_storage": model.board_storage,
+                        "evaluation": model.evaluation}
+        search_config = {"staged": self.staged, "copy_make": self.copy_make, "tt_size_mb": self.tt_size_mb,
+                         "ordering": self.ordering, "quiescence": self.quiescence,
+                         "quiescence_plies": self.quiescence_plies, "delta_margin": self.delta_margin,
+                         "null_move": self.null_move, "null_move_reduction": self.null_move_reduction,
+                         "lmr": self.lmr, "check_extension": self.check_extension, "aspiration": self.aspiration,
+                         "aspiration_window": self.aspiration_window}
+        return model_config, search_config
+
+    def close(self):
+        """Shut down the worker processes of the parallel search."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def aspiration_search(self, depth, score):
+        """Root search of an iteration. With aspiration on, iterations from depth 3 start in a narrow window around
+            the score of the last iteration and open the failing side if the score falls outside.
+
+        Returns:
+            Tuple[float, int]: score and packed best move
+        """
+        alpha, beta = -float("inf"), float("inf")
+        if self.aspiration and depth >= 3 and abs(score) < self._mate_bound:
+            window = self.aspiration_window*self._centipawn
+            alpha, beta = score - window, score + window
+        while True:
+            self._root_move = -1
+            score = self.pvs(alpha, beta, depth, 0)
+            if self.stopped:
+                return score, self._root_move
+            if score <= alpha:
+                alpha = -float("inf")
+            elif score >= beta:
+                beta = float("inf")
+            else:
+                return score, self._root_move
+
+    def check_limits(self):
+        """Set stopped if the time or node limit of the running search is hit, called every LIMIT_CHECK_NODES nodes."""
+        self._next_check = self.nodes + LIMIT_CHECK_NODES
+        if self.completed_depth == 0:
+            return  # depth 1 always completes
+        if self.max_nodes_search is not None:
+            if self.nodes >= self.max_nodes_search:
+                self.stopped = True
+            self._next_check = min(self._next_check, self.max_nodes_search)
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            self.stopped = True
+
+    def best_move_san(self):
+        """Best move of the last search in standard algebraic notation, empty if there was none."""
+        return move_to_san(self.GameModel, self.best_move) if self.best_move >= 0 else ""
+
+    def pv_san(self):
+        """Principal variation of the last search in standard algebraic notation, moves separated by spaces."""
+        model = self.GameModel
+        sans = []
+        for move in self.stats.pv():
+            if not model.is_legal(move):  # a hash collision in the table
+                break
+            sans.append(move_to_san(model, move))
+            model.make_move(move, silent=True)
+        for _ in sans:
+            model.unmove_piece()
+        return " ".join(sans)
+
+    def unpack_move(self, move):
+        """Packed search move to the (orig, dest) format of Model.move_piece_checked."""
+        if move < 0:
+            return (-1, -1)
+        orig, dest, move_type = decode_move(move)
+        return orig, (dest, move_type) if move_type & 0b1000 else dest
     
-    def alphaMin(self, alpha, beta, depth):
-        min_move = (-1, -1)
-        if depth == 0:
-            return -self.GameModel.eval_board_shannon(), min_move
-        legal_moves = self.GameModel.generate_legal_moves(self.GameModel.player_turn, silent=True)
-        for orig, all_dest in legal_moves.items():
-            for dest in all_dest:
-                self.GameModel.move_piece(orig, dest, silent=True)
-                score, _ = self.alphaMax(alpha, beta, depth - 1)
-                self.GameModel.unmove_piece()
-                if score <= alpha: # score too bad -> do not consider rest as I will not blunder
-                    return alpha, min_move
-                if score < beta: # new bad score that is not "too" bad but still bad
-                    beta = score # beta is min
-                    min_move = (orig, dest)
-        return beta, min_move 
-
-    def maxi(self, depth):
+    def moves(self, ply, tt_move=-1):
+        """Packed moves of the player to move for the alpha-beta search at ply, the hash move first."""
+        model = self.GameModel
+        if self.staged:
+            if not self.ordering:
+                return model.generate_staged_moves(ply, tt_move)
+            return model.generate_staged_moves(ply, tt_move, self.killers[ply], mvv_lva=True,
+                                               history=self.history[model.player_turn])
+        move_list, nr_moves = model.generate_move_list(ply)
+        moves = move_list[:nr_moves]
+        if self.ordering:
+            # same order as the staged moves: captures and promotions, killers, quiet moves
+            history = self.history[model.player_turn]
+            killers = self.killers[ply]
+            captures = sorted([move for move in moves if move & 0xC000], key=model.mvv_lva_score, reverse=True)
+            quiets = sorted([move for move in moves if not move & 0xC000 and move not in killers],
+                            key=lambda move: history[move & 0xFFF], reverse=True)
+            moves = captures + [killer for killer in killers if killer in moves] + quiets
+        if tt_move >= 0 and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
+
+    def store_cutoff(self, move, ply, depth):
+        """Remember a quiet move causing a cutoff as killer of the ply and in the history of the player to move."""
+        if move & 0xC000:  # captures and promotions are ordered by MVV-LVA
+            return
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[self.GameModel.player_turn][move & 0xFFF] += depth*depth
+
+    def age_move_order(self):
+        """Start a search: killers are cleared, history scores halved so the recent cutoffs weigh more."""
+        for killers in self.killers:
+            killers[:] = [-1, -1]
+        for history in self.history:
+            history[:] = [score >> 1 for score in history]
+
+    def snapshot(self):
+        """Position state to take back the moves of a node with in copy-make mode, else None."""
+        return self.GameModel.snapshot() if self.copy_make else None
+
+    def take_back(self, state):
+        """Take back the last made move, restores state in copy-make mode."""
+        if state is None:
+            self.GameModel.unmove_piece()
+        else:
+            self.GameModel.restore(state)
+
+    def delta(self, move):
+        """Largest score gain of a capture or promotion in evaluation units, incl. the delta_margin."""
+        victim = self.GameModel._pieces[move & 63]
+        gain = _DELTA_VALUES[victim] if move & 0x4000 and victim > 0 else _DELTA_VALUES[1] if move & 0x4000 else 0
+        if move & 0x8000:
+            gain += _DELTA_VALUES[move_promo_to_piece[move >> 12]] - _DELTA_VALUES[1]
+        return (gain + self.delta_margin)*self._centipawn
+
+
+    def mate_to_tt(self, score, ply):
+        """Mate scores count the plies from the root, the transposition table stores them from the node."""
+        if score > self._mate_bound:
+            return score + ply*self._centipawn
+        if score < -self._mate_bound:
+            return score - ply*self._centipawn
+        return score
+
+    def mate_from_tt(self, score, ply):
+        """Inverse of mate_to_tt."""
+        if score > self._mate_bound:
+            return score - ply*self._centipawn
+        if score < -self._mate_bound:
+            return score + ply*self._centipawn
+        return score
+
+    def null_move_allowed(self):
+        """A null move is only safe to try with pieces besides pawns and king, else zugzwang is likely."""
+        color = self.GameModel.player_turn
+        counts = self.GameModel.piece_counts
+        return any(counts[piece][color] for piece in range(2, 6))
+
+    def quiesce(self, alpha, beta, qply, ply):
+        """Quiescence search: stand pat on the evaluation or improve it with captures and promotions until the
+            position is quiet or quiescence_plies are searched.
+
+        Args:
+            alpha (float): lower search bound
+            beta (float): upper search bound
+            qply (int): plies searched in the quiescence search
+            ply (int): plies from the root
+
+        Returns:
+            float: fail-soft score from the view of the player to move
+        """
+        model = self.GameModel
+        best_score = model.evaluate()
+        if best_score >= beta or qply >= self.quiescence_plies:
+            return best_score
+        stand_pat = best_score
+        if stand_pat > alpha:
+            alpha = stand_pat
+        state = self.snapshot()
+        for move in model.generate_capture_moves(ply):
+            if stand_pat + self.delta(move) <= alpha:  # delta pruning: even winning the piece does not raise alpha
+                continue
+            if not model.try_move_piece(move):
+                continue
+            self.nodes += 1
+            self.qnodes += 1
+            if self.nodes >= self._next_check:
+                self.check_limits()
+            score = -self.quiesce(-beta, -alpha, qply + 1, ply + 1)
+            self.take_back(state)
+            if self.stopped:
+                return 0
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if score >= beta:
+                        break
+        return best_score
+
+    def pvs(self, alpha, beta, depth, ply, null_move=True):
+        """Principal variation search in negamax form: the first move gets the full window, later moves a null
+            window and are searched again when they beat alpha. Selectivity when switched on: check extensions,
+            null move pruning, late move reductions of quiet moves.
+
+        Args:
+            alpha (float): lower search bound
+            beta (float): upper search bound
+            depth (int): remaining search depth
+            ply (int): plies from the root
+            null_move (bool, optional): a null move may be tried, False right after one. Defaults to True.
+
+        Returns:
+            float: fail-soft score from the view of the player to move, 0 if the search was stopped
+        """
+        model = self.GameModel
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self.check_limits()
+        pv_table = self.pv_table
+        pv_table[ply] = ()
+        in_check = (depth > 0 or self.check_extension) and model.is_king_attacked(model.player_turn)
+        if in_check and self.check_extension and ply < 2*self.root_depth:
+            depth += 1  # a check is searched one ply deeper, the quiescence search would stand pat in check
+        if depth <= 0:
+            if self.quiescence:
+                return self.quiesce(alpha, beta, 0, ply)
+            return model.evaluate()
+        unit = self._centipawn
+        tt_move = -1
+        if self.tt is not None:
+            entry = self.tt.probe(model.hash_key)
+            if entry is not None:
+                tt_score, tt_depth, bound, tt_move = entry
+                # no cutoff at the root, the search has to return a move
+                if tt_depth >= depth and ply > 0:
+                    tt_score = self.mate_from_tt(tt_score, ply)
+                    if bound == BOUND_EXACT or (bound == BOUND_LOWER and tt_score >= beta) or \
+                            (bound == BOUND_UPPER and tt_score <= alpha):
+                        return tt_score
+        if ply == 0 and tt_move < 0:
+            tt_move = self.best_move  # best root move of the last iteration
+        # null move pruning: if passing the turn still fails high, a real move will as well
+        if self.null_move and null_move and not in_check and ply > 0 and depth >= NULL_MOVE_MIN_DEPTH and \
+                beta < self._mate_bound and self.null_move_allowed() and model.evaluate() >= beta:
+            model.move_null()
+            score = -self.pvs(-beta, -beta + unit, depth - 1 - self.null_move_reduction, ply + 1, False)
+            model.unmove_null()
+            if self.stopped:
+                return 0
+            if score >= beta:
+                return beta if score > self._mate_bound else score
+        alpha_orig = alpha
+        best_score, best_move = -float("inf"), -1
+        killers = self.killers[ply]
+        nr_legal = 0
+        state = self.snapshot()
+        root_moves = self.root_moves if ply == 0 else None
+        for move in self.moves(ply, tt_move):
+            if root_moves is not None and move not in root_moves:
+                continue
+            if not model.try_move_piece(move):
+                continue
+            nr_legal += 1
+            if nr_legal == 1:
+                score = -self.pvs(-beta, -alpha, depth - 1, ply + 1)
+            else:
+                reduction = 0
+                # late move reductions: late quiet moves rarely raise alpha, search them shallower first
+                if self.lmr and depth >= LMR_MIN_DEPTH and nr_legal > LMR_FULL_MOVES and not in_check and \
+                        not move & 0xC000 and move not in killers:
+                    reduction = 1 if nr_legal <= 2*LMR_FULL_MOVES else 2
+                score = -self.pvs(-alpha - unit, -alpha, depth - 1 - reduction, ply + 1)
+                if reduction and score > alpha:
+                    score = -self.pvs(-alpha - unit, -alpha, depth - 1, ply + 1)
+                if alpha < score < beta:
+                    score = -self.pvs(-beta, -alpha, depth - 1, ply + 1)
+            self.take_back(state)
+            if self.stopped:
+                return 0
+            if score > best_score:
+                best_score, best_move = score, move
+                if ply == 0:
+                    self._root_move = move
+                if score > alpha:
+                    alpha = score
+                    pv_table[ply] = (move,) + pv_table[ply + 1]
+                    if score >= beta:
+                        self.cutoffs += 1
+                        if nr_legal == 1:
+                            self.first_move_cutoffs += 1
+                        if self.ordering:
+                            self.store_cutoff(move, ply, depth)
+                        break
+        if not nr_legal:
+            return -self._mate + ply*unit if in_check else 0  # checkmate or stalemate
+        if self.tt is not None:
+            bound = BOUND_LOWER if best_score >= beta else BOUND_EXACT if best_score > alpha_orig else BOUND_UPPER
+            self.tt.store(model.hash_key, depth, bound, self.mate_to_tt(best_score, ply), best_move)
+        return best_score
+
+    def minimax(self, depth, ply=0):
+        """Plain minimax in negamax form without pruning, the reference of the alpha-beta search.
+            Checkmate and stalemate score as in pvs.
+
+        Returns:
+            Tuple[float, int]: score from the view of the player to move and packed best move
+        """
+        model = self.GameModel
         if depth == 0:
-            return self.GameModel.eval_board_shannon(), (-1, -1)
+            return model.evaluate(), -1
+        state = self.snapshot()
         max_score = -float("inf")
-        max_move = (-1, -1)
-        legal_moves = self.GameModel.generate_legal_moves(self.GameModel.player_turn, silent=True)
-        for orig, all_dest in legal_moves.items():
-            for dest in all_dest:
-                self.GameModel.move_piece(orig, dest, silent=True)
-                score, _ = self.mini(depth - 1)
-                self.GameModel.unmove_piece()
-                if score > max_score:
-                    max_score = score
-                    max_move = (orig, dest)
+        max_move = -1
+        nr_legal = 0
+        move_list, nr_moves = model.generate_move_list(ply)
+        for i in range(nr_moves):
+            move = move_list[i]
+            if not model.try_move_piece(move):
+                continue
+            nr_legal += 1
+            score = -self.minimax(depth - 1, ply + 1)[0]
+            self.take_back(state)
+            if score > max_score:
+                max_score = score
+                max_move = move
+        if not nr_legal:
+            # checkmate or stalemate
+            return (-self._mate + ply*self._centipawn if model.is_king_attacked(model.player_turn) else 0), -1
         return max_score, max_move
-    
-    def mini(self, depth):
-        if depth == 0:
-            return -self.GameModel.eval_board_shannon(), (-1, -1)
-        min_score = float("inf")
-        min_move = (-1, -1)
-        legal_moves = self.GameModel.generate_legal_moves(self.GameModel.player_turn)
-        for orig, all_dest in legal_moves.items():
-            for dest in all_dest:
-                self.GameModel.move_piece(orig, dest, silent=True)
-                score, _ = self.maxi(depth - 1)
-                self.GameModel.unmove_piece()
-                if score < min_score:
-                    min_score = score
-                    min_move = (orig, dest)
-        return min_score, min_move
@@ -49,9 +49,9 @@ perft_testcases = [
         "nodes": 1486,
         "fen": "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8"
     },
-    {  # 10
+    {  # 10, 1607 confirmed with python-chess (the black king on f8 has no castling rights despite "kq")
         "depth": 2,
-        "nodes": 1652,
+        "nodes": 1607,
         "fen": "rnNq1k1r/pp2bppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R b KQkq - 0 8"
     },
     {
@@ -137,6 +137,17 @@ perft_testcases = [
 ]
 
 
+# perft positions of the zobrist key check (perft.test_hash) on top of perft_testcases: both colors can capture
+# the rooks on a1, h1, a8 and h8, which takes away the castling rights of the captured rook
+perft_hash_testcases = [
+    {
+        "depth": 3,
+        "nodes": 46970,
+        "fen": "r3k2r/1B4B1/8/8/8/8/1b4b1/R3K2R w KQkq - 0 1"
+    },
+]
+
+
 perft_manual_test = [
     {
         "depth": 1,
@@ -145,3 +156,118 @@ perft_manual_test = [
     },
 
 ]
+
+
+# FEN strings that parse_fen/format_fen must round-trip unchanged
+fen_testcases = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "rnbqkbnr/ppp1pppp/8/8/3pP3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 3",  # capturable en passant square
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r3k2r/8/8/8/8/8/8/R3K2b w Qkq - 0 2",
+    "4k2r/8/8/8/8/8/8/R3K3 b Qk - 12 40",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "8/k1P5/8/1K6/8/8/8/8 w - - 99 120",
+]
+
+# malformed FEN strings that parse_fen must reject with a ValueError
+fen_malformed_testcases = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq",  # missing en passant field
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1",  # 7 ranks
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBN w KQkq - 0 1",  # rank of 7 squares
+    "rnbqkbnrp/ppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",  # 64 squares in ranks of 9 and 7
+    "rnbqkbnr/pppppppp/9/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",  # run of 9 empty squares
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNX w KQkq - 0 1",  # unknown piece
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1",  # side to move
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e9 0 1",  # en passant square
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - x 1",  # half move clock
+]
+
+# EPD lines and their expected operations
+epd_testcases = [
+    {
+        "line": 'r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - bm Qxf7#; id "Scholar\'s mate";',
+        "ops": {"bm": ["Qxf7#"], "id": "Scholar's mate"}
+    },
+    {  # several best moves, quoted operand with ";" and a comment operand list
+        "line": 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - bm e4 d4 Nf3; id "start; main lines"; c0 "1" "2";',
+        "ops": {"bm": ["e4", "d4", "Nf3"], "id": "start; main lines", "c0": ["1", "2"]}
+    },
+    {  # clocks as operations
+        "line": "4k3/8/8/8/8/8/8/4K3 b - - hmvc 12; fmvn 40; am Kd7 Kf7;",
+        "ops": {"hmvc": 12, "fmvn": 40, "am": ["Kd7", "Kf7"]}
+    },
+    {  # perft suite line, FEN with clocks and ";"-separated counts
+        "line": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1 ;D1 20 ;D2 400 ;D3 8902",
+        "ops": {"D1": 20, "D2": 400, "D3": 8902}
+    },
+]
+
+# EPD files with a malformed line, read_epd must name its line number in the error
+epd_file_testcases = [
+    {
+        "lines": ["# perft", "", "4k3/8/8/8/8/8/8/4K3 w - - D1 5;", "4k3/8/8/8/8/8/8 w - - D1 5;"],
+        "line_nr": 4
+    },
+    {
+        "lines": ["4k3/8/8/8/8/8/8/4K3 w - - D1 5;", "4k3/8/8/8/8/8/8/4K3 w - e9 D1 5;"],
+        "line_nr": 2
+    },
+]
+
+# SAN moves and the coordinate move (origin, destination, promotion piece) they stand for, move_to_san
+# must give back the same SAN
+san_testcases = [
+    # file and rank disambiguation
+    {"fen": "4k3/8/8/8/8/8/8/1N2KN2 w - - 0 1", "san": "Nbd2", "move": "b1d2"},
+    {"fen": "4k3/8/8/8/8/8/8/1N2KN2 w - - 0 1", "san": "Nfd2", "move": "f1d2"},
+    {"fen": "4k3/8/8/6N1/8/8/8/4K1N1 w - - 0 1", "san": "N1f3", "move": "g1f3"},
+    {"fen": "4k3/8/8/6N1/8/8/8/4K1N1 w - - 0 1", "san": "N5f3", "move": "g5f3"},
+    {"fen": "3k4/8/8/8/8/8/4K3/R6R w - - 0 1", "san": "Rad1+", "move": "a1d1"},
+    {"fen": "3k4/8/8/8/8/8/4K3/R6R w - - 0 1", "san": "Rhd1+", "move": "h1d1"},
+    {"fen": "4k3/8/8/R7/8/8/8/R3K3 w - - 0 1", "san": "R1a3", "move": "a1a3"},
+    {"fen": "4k3/8/8/R7/8/8/8/R3K3 w - - 0 1", "san": "R5a3", "move": "a5a3"},
+    {"fen": "4k3/8/8/8/8/Q7/8/Q1Q1K3 w - - 0 1", "san": "Qa1b2", "move": "a1b2"},
+    # promotions
+    {"fen": "7k/1P6/8/8/8/8/8/4K3 w - - 0 1", "san": "b8=Q+", "move": "b7b8q"},
+    {"fen": "7k/1P6/8/8/8/8/8/4K3 w - - 0 1", "san": "b8=N", "move": "b7b8n"},
+    {"fen": "r5k1/1P3ppp/8/8/8/8/8/4K3 w - - 0 1", "san": "bxa8=Q#", "move": "b7a8q"},
+    {"fen": "4k3/8/8/8/8/8/1p6/2B1K3 b - - 0 1", "san": "bxc1=R+", "move": "b2c1r"},
+    # castling
+    {"fen": "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "san": "O-O", "move": "e1g1"},
+    {"fen": "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "san": "O-O-O", "move": "e1c1"},
+    {"fen": "r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1", "san": "O-O", "move": "e8g8"},
+    {"fen": "r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1", "san": "O-O-O", "move": "e8c8"},
+    # en passant
+    {"fen": "4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1", "san": "exd6", "move": "e5d6"},
+    {"fen": "4k3/8/8/8/3Pp3/8/8/4K3 b - d3 0 1", "san": "exd3", "move": "e4d3"},
+]
+
+# SAN moves that san_to_move must reject with a ValueError
+san_error_testcases = [
+    {"fen": "4k3/8/8/8/8/8/8/1N2KN2 w - - 0 1", "san": "Nd2"},  # ambiguous
+    {"fen": "4k3/8/8/R7/8/8/8/R3K3 w - - 0 1", "san": "Ra3"},  # ambiguous
+    {"fen": "4k3/8/8/8/8/Q7/8/Q1Q1K3 w - - 0 1", "san": "Qab2"},  # ambiguous by file
+    {"fen": "4k3/4r3/8/8/8/8/4N3/4K3 w - - 0 1", "san": "Nc3"},  # pinned
+    {"fen": "7k/1P6/8/8/8/8/8/4K3 w - - 0 1", "san": "b8"},  # promotion piece missing
+    {"fen": "r3k2r/8/8/8/8/8/8/R3K2R w - - 0 1", "san": "O-O"},  # no castling right
+    {"fen": "r3k2r/8/8/8/8/8/5r2/R3K2R w KQkq - 0 1", "san": "O-O"},  # through check
+    {"fen": "4k3/8/8/3pP3/8/8/8/4K3 w - - 0 1", "san": "exd6"},  # en passant right expired
+    {"fen": "4k3/8/8/8/8/8/8/4K3 w - - 0 1", "san": "Kz9"},  # no SAN
+]
+
+# games of a PGN file with their number of plies and final position after the replay
+pgn_testcases = [
+    {
+        "path": "mat/games/sample.pgn",
+        "games": [
+            (33, "1n1Rkb1r/p4ppp/4q3/4p1B1/4P3/8/PPP2PPP/2K5 b k - 1 17"),
+            (45, "r1bk3r/p2pBpNp/n4n2/1p1NP2P/6P1/3P4/P1P1K3/q5b1 b - - 1 23"),
+            (47, "1r3kr1/pbpBBp1p/1b3P2/8/8/2P2q2/P4PPP/3R2K1 b - - 0 24"),
+            (82, "1Q6/5pk1/2p3p1/1p2N2p/1b5P/1bn5/2r3P1/2K5 w - - 16 42"),
+            (87, "8/Q6p/6p1/5p2/5P2/2p3P1/3r3P/2K1k3 b - - 3 44"),
+            (20, "r3k1nr/ppp2ppp/2n5/4P3/2P3bq/2B5/PP1K2PP/RN1Q1BnR w kq - 6 11"),
+            (14, "r1bq1rk1/pp2ppbp/2np1np1/8/3P4/5N2/PPP1BPPP/RNBQ1RK1 w - - 6 8"),
+            (13, "2k5/1Q1R4/8/8/8/8/8/2K5 b - - 12 7"),  # FEN tag start position
+        ]
+    },
+]
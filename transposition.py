@@ -0,0 +1,122 @@
+# transposition table of TreeSearch: preallocated arrays of buckets with a depth-preferred and an always-replace slot
+from array import array
+
+# bound type of a stored score, 0 marks an empty slot
+BOUND_UPPER = 1  # score <= stored score (no move raised alpha)
+BOUND_LOWER = 2  # score >= stored score (beta cutoff)
+BOUND_EXACT = 3
+
+_SLOT_BYTES = 8 + 8 + 8  # key, packed data and score per slot
+# packed data word: move (16 bits, 0 none) | depth << 16 (8 bits) | bound << 24 (2 bits) | age << 26 (6 bits)
+_AGE_MASK = 63
+
+
+class TranspositionTable:
+    """Search results by zobrist key (Model.hash_key) with a fixed memory budget.
+        Every bucket has two slots: the first keeps the deepest result of the current search, the second
+        always takes what the first rejects. Results of earlier searches (older age) are replaced first.
+        Scores are stored from the view of the player to move.
+    """
+    def __init__(self, size_mb=16):
+        """Empty table with statistics reset.
+
+        Args:
+            size_mb (float, optional): memory budget in MB, the number of buckets is rounded down to a power of two.
+                Defaults to 16.
+        """
+        nr_buckets = max(int(size_mb*2**20) // (2*_SLOT_BYTES), 1)
+        self.nr_buckets = 1 << (nr_buckets.bit_length() - 1)
+        self.nr_slots = 2*self.nr_buckets
+        self._mask = self.nr_buckets - 1
+        self.age = 0
+        self.clear()
+
+    def clear(self):
+        """Empty all slots and reset age and statistics."""
+        self._keys = array("Q", bytes(8*self.nr_slots))
+        self._data = array("Q", bytes(8*self.nr_slots))
+        self._scores = array("d", bytes(8*self.nr_slots))
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset the usage statistics, e.g. per search."""
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0  # probes finding the bucket filled with other keys only
+        self.stores = 0
+        self.overwrites = 0  # stores replacing the entry of another key of the current search
+
+    def new_search(self):
+        """Start a new search: entries of earlier searches become replaceable before deeper ones of this search."""
+        self.age = (self.age + 1) & _AGE_MASK
+
+    def size_mb(self):
+        """Memory of the slot arrays in MB."""
+        return self.nr_slots*_SLOT_BYTES / 2**20
+
+    def probe(self, key):
+        """Stored result of a position.
+
+        Args:
+            key (int): zobrist key
+
+        Returns:
+            Tuple[float, int, int, int]: score, depth, bound type and packed move (-1 none), None on a miss
+        """
+        self.probes += 1
+        idx = (key & self._mask) << 1
+        keys = self._keys
+        if keys[idx] != key:
+            idx += 1
+            if keys[idx] != key:
+                if self._data[idx - 1] and self._data[idx]:
+                    self.collisions += 1
+                return None
+        data = self._data[idx]
+        if not data:  # empty slot of key 0
+            return None
+        self.hits += 1
+        move = data & 0xFFFF
+        return self._scores[idx], (data >> 16) & 0xFF, (data >> 24) & 3, move if move else -1
+
+    def store(self, key, depth, bound, score, move=-1):
+        """Store a search result, a missing move keeps the move of an earlier result of the same key.
+
+        Args:
+            key (int): zobrist key
+            depth (int): remaining search depth of the result
+            bound (int): BOUND_EXACT, BOUND_LOWER or BOUND_UPPER
+            score (float): score from the view of the player to move
+            move (int, optional): packed best move. Defaults to -1 (none).
+        """
+        self.stores += 1
+        idx = (key & self._mask) << 1
+        keys, data = self._keys, self._data
+        first = data[idx]
+        # depth-preferred slot unless it holds a deeper result of the current search of another key
+        if first and keys[idx] != key and ((first >> 16) & 0xFF) > depth and (first >> 26) == self.age:
+            idx += 1
+        old = data[idx]
+        if old and keys[idx] == key:
+            if move < 0:
+                move = old & 0xFFFF
+        elif old and (old >> 26) == self.age:
+            self.overwrites += 1
+        keys[idx] = key
+        data[idx] = (move if move > 0 else 0) | min(depth, 255) << 16 | bound << 24 | self.age << 26
+        self._scores[idx] = score
+
+    def fill_rate(self):
+        """Share of slots holding an entry."""
+        return 1 - self._data.count(0) / self.nr_slots
+
+    def hit_rate(self):
+        """Share of probes finding their key."""
+        return self.hits / self.probes if self.probes else 0.0
+
+    def stats(self):
+        """Usage statistics: probes, hits, hit rate, collisions, stores, overwrites and fill rate."""
+        return {"probes": self.probes, "hits": self.hits, "hit_rate": self.hit_rate(), "collisions": self.collisions,
+                "stores": self.stores, "overwrites": self.overwrites, "fill_rate": self.fill_rate(),
+                "size_mb": self.size_mb()}
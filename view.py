@@ -48,11 +48,11 @@ class Board:
 
         self._rects = []
 
-    def draw(self, pieces, colors, attacks):
+    def draw(self, piece_squares, attacks):
         self.draw_board(self.display, attacks=attacks)
         if self.draw_numbers:
             self.draw_numbers(self.display)
-        self.draw_pieces(self.display, pieces, colors)
+        self.draw_pieces(self.display, piece_squares)
 
     def piece_to_image(self, piece_num, color):
         if 0 < piece_num < len(piece_types)+1:
@@ -81,15 +81,18 @@ class Board:
             self.display, player_colors[col_int_to_str[color]], rectangle, 0)
         self.display.blit(img, (self._square_dim, self._board_dim+1))
 
-    def draw_pieces(self, display, pieces, colors):
-        for pos in range(self._board_dim**2):
-            piece_num = pieces[pos]
-            if piece_num > 0:
-                img = self.piece_to_image(piece_num, colors[pos])
+    def draw_pieces(self, display, piece_squares):
+        # piece_squares[color][piece] holds the board indices of the piece type, see Model.piece_squares
+        for color in range(2):
+            for piece_num in range(1, len(piece_types)+1):
+                if not piece_squares[color][piece_num]:
+                    continue
+                img = self.piece_to_image(piece_num, color)
                 if img:
-                    display.blit(img, ((pos % self._board_dim) *
-                                       self._square_dim, (pos//self._board_dim) *
-                                       self._square_dim))
+                    for pos in piece_squares[color][piece_num]:
+                        display.blit(img, ((pos % self._board_dim) *
+                                           self._square_dim, (pos//self._board_dim) *
+                                           self._square_dim))
 
     def draw_numbers(self, display):
         for pos in range(self._board_dim**2):
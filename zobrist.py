@@ -0,0 +1,58 @@
+# Zobrist hashing: 64 bit random keys xor-ed together per position feature, see Model.hash_key
+import random
+
+_rng = random.Random(0x5EED)  # fixed seed so keys are equal across runs and processes
+
+# ZOBRIST_PIECES[color][piece][square], piece index 0 unused
+ZOBRIST_PIECES = [[[_rng.getrandbits(64) for _ in range(64)] for _ in range(7)] for _ in range(2)]
+ZOBRIST_SIDE = _rng.getrandbits(64)  # xor-ed in when black is to move
+# one key per castling right, combined for all 16 right masks (bit 2*color + side, side 0 long, 1 short)
+_castling_keys = [_rng.getrandbits(64) for _ in range(4)]
+ZOBRIST_CASTLING = [0]*16
+for _rights in range(16):
+    for _bit in range(4):
+        if _rights >> _bit & 1:
+            ZOBRIST_CASTLING[_rights] ^= _castling_keys[_bit]
+ZOBRIST_EP_FILE = [_rng.getrandbits(64) for _ in range(8)]
+
+
+def compute_key(pieces, colors, player_turn, castling_rights, ep_file):
+    """Zobrist key of a position from scratch.
+
+    Args:
+        pieces (npt.ArrayLike): piece formation on board
+        colors (npt.ArrayLike): color formation on board
+        player_turn (int): color to move
+        castling_rights (int): castling right mask, see Model.castling_rights
+        ep_file (int): file of a capturable en passant pawn, -1 if none
+
+    Returns:
+        int: 64 bit key
+    """
+    key = 0
+    for idx, piece, color in zip(range(64), pieces, colors):
+        if piece > 0:
+            key ^= ZOBRIST_PIECES[color][piece][idx]
+    if player_turn == 1:
+        key ^= ZOBRIST_SIDE
+    key ^= ZOBRIST_CASTLING[castling_rights]
+    if ep_file >= 0:
+        key ^= ZOBRIST_EP_FILE[ep_file]
+    return key
+
+
+def compute_pawn_key(pieces, colors):
+    """Pawn-only zobrist key from scratch, the xor of the pawn keys of ZOBRIST_PIECES (see Model.pawn_key).
+
+    Args:
+        pieces (npt.ArrayLike): piece formation on board
+        colors (npt.ArrayLike): color formation on board
+
+    Returns:
+        int: 64 bit key
+    """
+    key = 0
+    for idx, piece, color in zip(range(64), pieces, colors):
+        if piece == 1:
+            key ^= ZOBRIST_PIECES[color][1][idx]
+    return key